@@ -1,27 +1,45 @@
 from flask import (Flask, request, jsonify, Response,
-                   send_from_directory, make_response, current_app)
+                   send_from_directory, make_response, current_app, stream_with_context)
 from flask_cors import CORS
+from werkzeug.exceptions import RequestEntityTooLarge
 from typing import List, Dict, Optional
 from stock_in import *
+from bulk_import import import_stock_in_file
 from export import *
 from lend_return import *
 from image import *
 from get_last_address_info import  get_last_address_info
 from image2 import *
 import logging
+from datetime import timezone
 from flask import Flask, request, send_file, jsonify, abort
 from undo_last_change import *
+from json_response import FastJSONProvider, compress_response, negotiate_encoding
+from response_cache import response_cache
+from idempotency import (IDEMPOTENCY_HEADER, IDEMPOTENCY_KEY_MAX_LENGTH, IDEMPOTENCY_REPLAYED_HEADER,
+                         idempotency_store, request_fingerprint)
+from search import search_inventory
+from facets import FACET_FIELDS, get_inventory_facets
+from location_tree import get_location_tree
+from reports import ROLLUP_DIMENSIONS, get_movement_report
+from manufacturer_index import suggest_manufacturers
+from change_feed import get_changes
+from event_stream import broker, stream_events
+from get import parse_inventory_id_param, parse_list_param
 
 
 # ========== 初始化Flask应用 ==========
 app = Flask(__name__)
 # 允许跨域（覆盖所有接口）
-CORS(app, resources=r"/*", supports_credentials=True)
+CORS(app, resources=r"/*", supports_credentials=True, expose_headers=["ETag", "Last-Modified", IDEMPOTENCY_REPLAYED_HEADER])
 
 
 # ========== 全局配置 ==========
 # 1. 图片上传大小限制
 app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+# JSON序列化使用orjson（未安装时回退标准库），大响应按Accept-Encoding压缩
+app.json = FastJSONProvider(app)
+app.after_request(compress_response)
 # 2. 配置日志：统一异常日志的输出格式
 logging.basicConfig(
     level=logging.INFO,
@@ -40,20 +58,27 @@ def skip_delete_json_parse():
         return None
 
 
+# 入库文件导入单独放宽大小上限（须在解析表单之前设置；幂等键指纹会先于接口读取上传文件）
+@app.before_request
+def raise_import_size_limit():
+    if request.path == "/api/import":
+        request.max_content_length = IMPORT_MAX_FILE_SIZE
+    return None
+
 
 # ========== 统一API异常处理装饰器 ==========
 def api_exception_handler(func):
     """
     统一处理API的异常和请求格式校验：
-    1. 自动校验POST/PUT/DELETE请求的JSON格式（图片上传接口除外）
+    1. 自动校验POST/PUT/DELETE请求的JSON格式（图片上传、入库文件导入接口除外）
     2. 捕获所有未处理的异常，返回标准化错误响应
     3. 自动记录异常日志（含栈信息）
     """
 
     def wrapper(*args, **kwargs):
         try:
-            # 图片上传接口是multipart/form-data，跳过JSON校验
-            skip_json_check = request.path in ["/api/upload-image"]
+            # 图片上传、入库文件导入接口是multipart/form-data，跳过JSON校验
+            skip_json_check = request.path in ["/api/upload-image", "/api/import"]
             if not skip_json_check and request.method in ["POST", "PUT", "DELETE"] and not request.is_json:
                 app.logger.warning(f"请求体非JSON格式 - 路径：{request.path}，方法：{request.method}")
                 return jsonify({
@@ -75,6 +100,119 @@ def api_exception_handler(func):
     wrapper.__name__ = func.__name__
     return wrapper
 
+# ========== 读接口条件请求（ETag/Last-Modified + 304） ==========
+def conditional_get(func):
+    """
+    读接口条件请求装饰器：
+    1. ETag由进程启动标识+全局数据版本号组成，任何写入都会改变
+    2. 客户端携带的If-None-Match仍有效时直接返回304，不再查询和序列化
+    3. 仅为200响应附加ETag/Last-Modified；Last-Modified只精确到秒，同一秒内的多次写入无法区分，
+       因此只作参考信息，不据If-Modified-Since返回304
+    """
+
+    def wrapper(*args, **kwargs):
+        version = get_data_version()
+        etag = f"{DATA_VERSION_BOOT_ID}-{version}"
+        last_modified = get_data_version_time().astimezone(timezone.utc).replace(microsecond=0)
+
+        if request.if_none_match and request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = make_response(func(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag, weak=True)
+        response.last_modified = last_modified
+        # 浏览器每次使用缓存前都需重新验证
+        response.headers["Cache-Control"] = "no-cache"
+        return response
+
+    # 保留原函数的名称，避免Flask路由注册冲突
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+# ========== 读接口渲染结果缓存 ==========
+def cached_response(func):
+    """
+    读接口响应缓存装饰器（置于conditional_get之内）：
+    1. 以 路径+查询参数+协商的压缩算法 为键，缓存编码并压缩后的响应字节
+    2. 条目记录生成时的数据版本号，版本变化即视为失效；写入时由invalidate_cache回调整体清空
+    3. 仅缓存200响应
+    """
+
+    def wrapper(*args, **kwargs):
+        key = (request.path, tuple(sorted(request.args.items(multi=True))), negotiate_encoding())
+        cached = response_cache.get(key)
+        if cached is not None:
+            body, headers = cached
+            return Response(body, status=200, headers=headers)
+
+        # 先取版本号再计算，计算期间发生写入时该条目自然失效
+        version = get_data_version()
+        response = make_response(func(*args, **kwargs))
+        if response.status_code != 200:
+            return response
+        # 在此完成压缩，缓存的就是最终发送的字节（after_request不会重复压缩）
+        response = compress_response(response)
+        response_cache.put(key, version, response.get_data(), list(response.headers.items()))
+        return response
+
+    # 保留原函数的名称，避免Flask路由注册冲突
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
+# ========== 写接口幂等键 ==========
+def idempotent(func):
+    """
+    写接口幂等装饰器（置于api_exception_handler之内）：
+    1. 请求携带Idempotency-Key时，以 方法+路径+幂等键 登记，首次执行后保存响应
+    2. 相同键的重试直接返回保存的响应（附Idempotent-Replayed: true），不再执行写入
+    3. 同一键仍在处理中返回409，请求体不同返回422；5xx响应不保存，可用同一键重试
+    未携带该请求头的请求照常执行
+    """
+
+    def wrapper(*args, **kwargs):
+        idempotency_key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not idempotency_key or request.method not in ["POST", "PUT", "DELETE"]:
+            return func(*args, **kwargs)
+        if len(idempotency_key) > IDEMPOTENCY_KEY_MAX_LENGTH:
+            return jsonify({"status": "error",
+                            "message": f"Idempotency-Key长度不能超过{IDEMPOTENCY_KEY_MAX_LENGTH}"}), 400
+
+        key = (request.method, request.path, idempotency_key)
+        try:
+            fingerprint = request_fingerprint(request)
+        except RequestEntityTooLarge:
+            return jsonify({"status": "error", "message": "上传内容超过大小限制"}), 413
+        state, saved = idempotency_store.begin(key, fingerprint)
+        if state == "replay":
+            status_code, body, content_type = saved
+            app.logger.info(f"幂等键重放 - 路径：{request.path}，键：{idempotency_key}")
+            return Response(body, status=status_code, content_type=content_type,
+                            headers={IDEMPOTENCY_REPLAYED_HEADER: "true"})
+        if state == "in_progress":
+            return jsonify({"status": "error", "message": "相同Idempotency-Key的请求正在处理中，请稍后重试"}), 409
+        if state == "mismatch":
+            return jsonify({"status": "error", "message": "Idempotency-Key已用于内容不同的请求"}), 422
+
+        try:
+            response = make_response(func(*args, **kwargs))
+        except Exception:
+            idempotency_store.release(key)
+            raise
+        if response.status_code >= 500:
+            idempotency_store.release(key)
+        else:
+            idempotency_store.finish(key, response.status_code, response.get_data(), response.content_type)
+        return response
+
+    # 保留原函数的名称，避免Flask路由注册冲突
+    wrapper.__name__ = func.__name__
+    return wrapper
+
+
 # ========== 原有业务接口（统一异常处理） ==========
 # 1. 健康检查
 @app.route("/api/health", methods=["GET"])
@@ -109,32 +247,108 @@ def api_floors():
 # 4. 批量入库
 @app.route("/api/batch-stock-in", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_batch_stock_in():
     data = request.get_json()
-    app.logger.info(f"批量入库请求 - 数据：{data}")
+    item_count = len(data.get("stock_in_items") or []) if isinstance(data, dict) else 0
+    app.logger.info(f"批量入库请求 - 明细数：{item_count}")
     result, status_code = batch_stock_in(data)
     return jsonify(result), status_code
 
 
+# 4.1 入库文件导入（CSV/XLSX，multipart：file、入库时间、chunk_size）
+@app.route("/api/import", methods=["POST"])
+@api_exception_handler
+@idempotent
+def api_import_stock_in_file():
+    # 大小上限已在raise_import_size_limit中放宽
+    if "file" not in request.files:
+        return jsonify({"status": "error", "message": "请上传文件（字段名：file）"}), 400
+    file = request.files["file"]
+    app.logger.info(f"入库文件导入请求 - 文件：{file.filename}")
+    result, status_code = import_stock_in_file(file, request.form.get("入库时间"), request.form.get("chunk_size"))
+    return jsonify(result), status_code
+
+
 # 5. 查询库存列表
 @app.route("/api/inventory", methods=["GET"])
 @api_exception_handler
+@conditional_get
+@cached_response
 def api_get_inventory():
-    app.logger.info("查询库存列表请求")
-    result, status_code = get_inventory_list()
+    # fields：返回的库存字段（逗号分隔）；expand：展开的关联对象（product,feature,location,manufacturer）
+    fields = request.args.get("fields")
+    expand = request.args.get("expand")
+    app.logger.info(f"查询库存列表请求 - 字段：{fields}，展开：{expand}")
+    result, status_code = get_inventory_list(fields=fields, expand=expand)
+    return jsonify(result), status_code
+
+
+# 5.0 库存增量同步：返回版本since之后变更的库存行/删除的库存ID/新增操作记录，无法增量时返回resync
+@app.route("/api/changes", methods=["GET"])
+@api_exception_handler
+def api_get_changes():
+    since = request.args.get("since")
+    boot_id = request.args.get("boot_id")
+    fields = request.args.get("fields")
+    expand = request.args.get("expand")
+    app.logger.info(f"增量同步请求 - since：{since}，boot_id：{boot_id}")
+    result, status_code = get_changes(since, boot_id=boot_id, fields=fields, expand=expand)
+    return jsonify(result), status_code
+
+
+# 5.0.1 库存变更事件推送（SSE）：写入提交后推送 库存ID/最新库存数量/操作汇总
+@app.route("/api/events", methods=["GET"])
+@api_exception_handler
+def api_inventory_events():
+    subscriber = broker.subscribe()
+    if subscriber is None:
+        app.logger.warning(f"事件订阅已达上限（{SSE_MAX_SUBSCRIBERS}），拒绝新连接")
+        return jsonify({"status": "error", "message": "事件订阅连接数已达上限，请稍后重试"}), 503
+
+    app.logger.info(f"新增事件订阅 - 当前连接数：{broker.subscriber_count()}")
+    response = Response(stream_with_context(stream_events(subscriber)), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"  # 禁止反向代理缓冲事件流
+    # 连接关闭（含事件流尚未开始迭代时）确保退订
+    response.call_on_close(lambda: broker.unsubscribe(subscriber))
+    return response
+
+
+# 5.1 库存分面统计（类型/楼层/材质/颜色/厂家），查询参数即筛选条件，同一字段多选用逗号分隔或重复传参
+@app.route("/api/inventory/facets", methods=["GET"])
+@api_exception_handler
+@conditional_get
+def api_get_inventory_facets():
+    filters = {}
+    for field in FACET_FIELDS:
+        values = request.args.getlist(field)
+        if values:
+            filters[field] = parse_list_param(",".join(values))
+    app.logger.info(f"查询库存分面统计 - 筛选条件：{filters}")
+    result, status_code = get_inventory_facets(filters)
     return jsonify(result), status_code
 
 
 # 6. 查询操作记录
 @app.route("/api/get_operation_records", methods=["GET"])
 @api_exception_handler
+@conditional_get
 def api_get_operation_records():
     operation_type = request.args.get("operation_type")
-    inventory_id = request.args.get("inventory_id")
+    try:
+        inventory_id = parse_inventory_id_param(request.args.get("inventory_id"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
     start_date = request.args.get("start_date")
     end_date = request.args.get("end_date")
-    app.logger.info(f"查询操作记录 - 类型：{operation_type}，库存ID：{inventory_id}，时间范围：{start_date}~{end_date}")
-    result, status_code = get_operation_records(operation_type, inventory_id, start_date, end_date)
+    # 游标分页：after=<操作时间,操作ID>（取上一页返回的next_cursor），limit=每页条数
+    after = request.args.get("after")
+    limit = request.args.get("limit")
+    app.logger.info(f"查询操作记录 - 类型：{operation_type}，库存ID：{inventory_id}，时间范围：{start_date}~{end_date}，"
+                    f"游标：{after}，条数：{limit}")
+    result, status_code = get_operation_records(operation_type, inventory_id, start_date, end_date,
+                                                after=after, limit=limit)
     return jsonify(result), status_code
 
 
@@ -142,8 +356,15 @@ def api_get_operation_records():
 @app.route("/api/export_operation_records", methods=["GET"])
 @api_exception_handler
 def api_export_operation_records():
-    app.logger.info("导出操作记录为CSV")
-    csv_data = export_operation_records()
+    operation_type = request.args.get("operation_type")
+    try:
+        inventory_id = parse_inventory_id_param(request.args.get("inventory_id"))
+    except ValueError as e:
+        return jsonify({"status": "error", "message": str(e)}), 400
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    app.logger.info(f"导出操作记录为CSV - 类型：{operation_type}，库存ID：{inventory_id}，时间：{start_date} ~ {end_date}")
+    csv_data = export_operation_records(operation_type, inventory_id, start_date, end_date)
     if csv_data:
         response = Response(
             csv_data,
@@ -156,9 +377,52 @@ def api_export_operation_records():
         return jsonify({"status": "error", "message": "导出失败"}), 500
 
 
+# 7.2 库位层级树（楼层→架号→框号→包号，含各节点库存条数/总数量）
+@app.route("/api/locations/tree", methods=["GET"])
+@api_exception_handler
+@conditional_get
+def api_get_location_tree():
+    floor = request.args.get("floor")
+    result, status_code = get_location_tree(floor)
+    return jsonify(result), status_code
+
+
+# 7.3 出入库汇总报表（按日/周/月 × 操作类型/类型/楼层/厂家），维度筛选同分面统计，分组维度用group_by逗号分隔
+@app.route("/api/reports/movements", methods=["GET"])
+@api_exception_handler
+@conditional_get
+def api_get_movement_report():
+    start_date = request.args.get("start_date")
+    end_date = request.args.get("end_date")
+    granularity = request.args.get("granularity", "day")
+    group_by = parse_list_param(request.args.get("group_by"))
+    filters = {}
+    for field in ROLLUP_DIMENSIONS:
+        values = request.args.getlist(field)
+        if values:
+            filters[field] = parse_list_param(",".join(values))
+    app.logger.info(f"查询出入库汇总报表 - 时间范围：{start_date}~{end_date}，周期：{granularity}，"
+                    f"分组：{group_by}，筛选条件：{filters}")
+    result, status_code = get_movement_report(start_date, end_date, granularity, group_by, filters)
+    return jsonify(result), status_code
+
+
+# 7.4 厂家联想（入库/编辑表单输入框），q为输入前缀，field可限定只匹配 厂家/电话/厂家地址
+@app.route("/api/manufacturers/suggest", methods=["GET"])
+@api_exception_handler
+@conditional_get
+def api_suggest_manufacturers():
+    query = request.args.get("q", "")
+    field = request.args.get("field")
+    limit = request.args.get("limit")
+    result, status_code = suggest_manufacturers(query, field, limit)
+    return jsonify(result), status_code
+
+
 # 8. 查看库存详情
 @app.route("/api/inventory/<int:inventory_id>", methods=["GET"])
 @api_exception_handler
+@conditional_get
 def api_get_inventory_detail(inventory_id):
     page = request.args.get("page", 1, type=int)
     page_size = request.args.get("page_size", 50, type=int)
@@ -167,9 +431,32 @@ def api_get_inventory_detail(inventory_id):
     return jsonify(result), status_code
 
 
+# 8.0 批量查看库存详情（多选场景一次请求，基于同一数据快照）
+@app.route("/api/inventory/batch-detail", methods=["POST"])
+@api_exception_handler
+def api_batch_get_inventory_detail():
+    data = request.get_json()
+    app.logger.info(f"批量查询库存详情 - 数据：{data}")
+    result, status_code = batch_get_inventory_detail(data)
+    return jsonify(result), status_code
+
+
+# 8.1 全文检索库存（货号/厂家/颜色/材质/形状等）
+@app.route("/api/search", methods=["GET"])
+@api_exception_handler
+def api_search_inventory():
+    query = request.args.get("q", "")
+    page = request.args.get("page", 1, type=int)
+    page_size = request.args.get("page_size", DEFAULT_PAGE_SIZE, type=int)
+    app.logger.info(f"检索库存 - 关键词：{query}，页码：{page}，页大小：{page_size}")
+    result, status_code = search_inventory(query, page, page_size)
+    return jsonify(result), status_code
+
+
 # 9. 编辑库存记录
 @app.route('/api/inventory/<int:inventory_id>/edit', methods=['POST'])
 @api_exception_handler
+@idempotent
 def api_edit_inventory(inventory_id):
     edit_data = request.get_json()
     app.logger.info(f"编辑库存记录 - 库存ID：{inventory_id}，数据：{edit_data}")
@@ -177,8 +464,21 @@ def api_edit_inventory(inventory_id):
     return jsonify(result), status_code
 
 
+# 9.1 批量编辑库存（edits逐条编辑 或 filter+patch按条件批量修改，一次写入）
+@app.route("/api/inventory/bulk-edit", methods=["POST"])
+@api_exception_handler
+@idempotent
+def api_bulk_edit_inventory():
+    data = request.get_json()
+    edit_count = len(data.get("edits") or []) if isinstance(data, dict) else 0
+    app.logger.info(f"批量编辑库存请求 - 逐条编辑数：{edit_count}，筛选条件：{data.get('filter') if isinstance(data, dict) else None}")
+    result, status_code = bulk_edit_inventory(data)
+    return jsonify(result), status_code
+
+
 # 10. 删除库存记录
 @app.route("/api/inventory/<inventory_id>", methods=["DELETE", "OPTIONS"])
+@idempotent
 def api_delete_inventory(inventory_id):
     """
     库存删除接口（核心：不解析DELETE请求体）
@@ -188,7 +488,7 @@ def api_delete_inventory(inventory_id):
         response = jsonify({"status": "success", "message": "预检通过"})
         response.headers["Access-Control-Allow-Origin"] = "*"
         response.headers["Access-Control-Allow-Methods"] = "DELETE, OPTIONS"
-        response.headers["Access-Control-Allow-Headers"] = "Content-Type"
+        response.headers["Access-Control-Allow-Headers"] = f"Content-Type, {IDEMPOTENCY_HEADER}"
         return response
 
     # 2. 处理DELETE请求（核心：不调用request.get_json()）
@@ -208,9 +508,22 @@ def api_delete_inventory(inventory_id):
         return response, 500
 
 
+# 10.1 批量删除库存记录（逐条校验，孤立的特征/位置/厂家一并清理，一次写入）
+@app.route("/api/inventory/batch-delete", methods=["POST"])
+@api_exception_handler
+@idempotent
+def api_batch_delete_inventory():
+    data = request.get_json()
+    delete_count = len(data.get("inventory_ids") or []) if isinstance(data, dict) else 0
+    app.logger.info(f"批量删除库存请求 - 库存数：{delete_count}")
+    result, status_code = batch_delete_inventory(data)
+    return jsonify(result), status_code
+
+
 # 11. 批量出库
 @app.route("/api/batch-stock-out", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_batch_stock_out():
     data = request.get_json()
     app.logger.info(f"批量出库请求 - 数据：{data}")
@@ -221,6 +534,7 @@ def api_batch_stock_out():
 # 12. 批量更新状态
 @app.route("/api/batch-update-status", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_batch_update_status():
     data = request.get_json()
     app.logger.info(f"批量更新库存状态 - 数据：{data}")
@@ -240,6 +554,7 @@ def handle_last_address_info():
 # 14. 商品借出
 @app.route("/api/inventory/lend", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_product_lend():
     data = request.get_json()
     app.logger.info(f"商品借出请求 - 数据：{data}")
@@ -250,6 +565,7 @@ def api_product_lend():
 # 15. 商品归还
 @app.route("/api/inventory/return", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_product_return():
     data = request.get_json()
     app.logger.info(f"商品归还请求 - 数据：{data}")
@@ -259,6 +575,7 @@ def api_product_return():
 
 @app.route("/api/undo-last-change", methods=["POST"])
 @api_exception_handler
+@idempotent
 def api_undo_last_change():
     """撤销操作API：默认恢复所有有备份的表（回退上一操作修改的所有表）"""
     current_app.logger.info("执行撤销最后一次操作请求（恢复所有有备份的表）")
@@ -282,6 +599,7 @@ def api_undo_last_change():
 # ========== 图片相关接口（优化版） ==========
 @app.route("/api/upload-image", methods=["POST"])
 @api_exception_handler
+@idempotent
 def upload_image():
     """适配修改后的图片工具函数"""
     # 1. 获取参数（新增featureId）
@@ -383,6 +701,7 @@ def get_product_images(product_code):
 
 @app.route("/api/batch_delete_image", methods=["POST"])
 @api_exception_handler
+@idempotent
 def batch_delete_image_route():
     """
     批量图片删除接口路由
@@ -428,6 +747,8 @@ if __name__ == "__main__":
     # 启动时初始化Excel文件
     app.logger.info("启动服务，初始化Excel文件...")
     init_or_fix_excel_file()
+    # 历史操作时间统一为标准格式（仅首次启动时实际改写）
+    migrate_operation_times()
 
     # 打印关键配置信息
     app.logger.info(f"[服务配置] 图片上传目录: {UPLOAD_FOLDER}")
@@ -0,0 +1,191 @@
+"""
+入库文件导入（CSV/XLSX）：
+1. 上传文件由Werkzeug落盘缓存，按块（IMPORT_CHUNK_SIZE行）读取，内存占用只与块大小有关，与文件大小无关
+2. 每块明细交给批量入库流程校验并单独提交（一块一次写入），某块失败不影响其他块
+3. 表头即入库字段名（货号/类型/地址类型/楼层/入库数量/架号/框号/包号/厂家/...），空单元格视为未填写，整行为空的行跳过；
+   逐行错误信息中的序号为文件中的行号（表头为第1行），最多返回IMPORT_MAX_ERROR_DETAILS条
+"""
+import os
+import time
+from itertools import chain
+from datetime import datetime
+
+import pandas as pd
+
+from config import *
+from stock_in import STOCK_IN_REQUIRED_FIELDS, batch_stock_in
+from utils import normalize_operation_time
+
+try:
+    import openpyxl
+except ImportError:  # 未安装openpyxl时仅支持CSV导入
+    openpyxl = None
+
+IMPORT_FILE_TYPES = (".csv", ".xlsx")
+
+
+def _detect_csv_encoding(stream):
+    """按文件开头判断编码：UTF-8（含BOM）或 GB18030（Excel另存的中文CSV）"""
+    head = stream.read(65536)
+    stream.seek(0)
+    try:
+        head.decode("utf-8-sig")
+    except UnicodeDecodeError as e:
+        # 末尾被截断的多字节字符不算解码失败
+        if e.start < len(head) - 3:
+            return "gb18030"
+    return "utf-8-sig"
+
+
+def _csv_chunks(stream, chunk_size):
+    """CSV分块：返回 (表头, 块迭代器)，每块为 (首行行号, DataFrame)"""
+    reader = pd.read_csv(stream, dtype=str, encoding=_detect_csv_encoding(stream), chunksize=chunk_size,
+                         keep_default_na=False, na_values=[""], skip_blank_lines=False)
+    first_chunk = next(reader, None)
+    if first_chunk is None:
+        return [], iter(())
+
+    def chunks():
+        first_row = 2  # 表头为第1行（空行保留为全空行，行号与文件一致）
+        for chunk in chain([first_chunk], reader):
+            yield first_row, chunk
+            first_row += len(chunk)
+
+    return [str(column).strip() for column in first_chunk.columns], chunks()
+
+
+def _xlsx_chunks(stream, chunk_size):
+    """XLSX分块（只读模式逐行读取第一个工作表）：返回 (表头, 块迭代器)"""
+    workbook = openpyxl.load_workbook(stream, read_only=True, data_only=True)
+    rows = workbook.worksheets[0].iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        workbook.close()
+        return [], iter(())
+    header = ["" if value is None else str(value).strip() for value in header]
+    width = len(header)
+
+    def chunks():
+        try:
+            first_row, buffer = 2, []
+            for row in rows:
+                buffer.append(tuple(row[:width]) + (None,) * (width - len(row)))
+                if len(buffer) >= chunk_size:
+                    yield first_row, pd.DataFrame(buffer, columns=header, dtype=object)
+                    first_row, buffer = first_row + len(buffer), []
+            if buffer:
+                yield first_row, pd.DataFrame(buffer, columns=header, dtype=object)
+        finally:
+            workbook.close()
+
+    return header, chunks()
+
+
+def _chunk_items(chunk, header, first_row):
+    """块 → (入库明细列表, 各明细的文件行号)：空单元格视为未填写，整行为空的行跳过"""
+    chunk = chunk.copy()
+    chunk.columns = header
+    chunk = chunk.loc[:, [column for column in header if column]]
+    blank = chunk.apply(lambda column: column.astype(str).str.strip() == "")
+    chunk = chunk.mask(blank).reset_index(drop=True).dropna(how="all")
+    return chunk.to_dict("records"), (chunk.index + first_row).tolist()
+
+
+def import_stock_in_file(file, in_time=None, chunk_size=None):
+    """
+    导入入库文件
+    :param file: 上传的文件（werkzeug FileStorage）
+    :param in_time: 入库时间（整份文件统一，未传时取导入开始时间）
+    :param chunk_size: 每块行数（默认IMPORT_CHUNK_SIZE，最多IMPORT_MAX_CHUNK_SIZE）
+    """
+    try:
+        start_time = time.time()
+        filename = file.filename or ""
+        extension = os.path.splitext(filename)[1].lower()
+        if extension not in IMPORT_FILE_TYPES:
+            return {"status": "error", "message": f"不支持的文件类型，仅支持：{', '.join(IMPORT_FILE_TYPES)}"}, 400
+        if extension == ".xlsx" and openpyxl is None:
+            return {"status": "error", "message": "服务器未安装openpyxl，暂不支持XLSX导入，请另存为CSV后上传"}, 400
+
+        if chunk_size in (None, ""):
+            chunk_size = IMPORT_CHUNK_SIZE
+        try:
+            chunk_size = max(1, min(int(chunk_size), IMPORT_MAX_CHUNK_SIZE))
+        except (ValueError, TypeError):
+            return {"status": "error", "message": "chunk_size必须为整数"}, 400
+
+        if not in_time:
+            in_time = datetime.now().strftime(OPERATION_TIME_FORMAT)
+        else:
+            in_time = normalize_operation_time(in_time)
+            if in_time is None:
+                return {"status": "error",
+                        "message": "时间格式不正确，请使用 YYYY-MM-DD HH:MM:SS 或 YYYY-MM-DD HH"}, 400
+
+        try:
+            if extension == ".csv":
+                header, chunks = _csv_chunks(file.stream, chunk_size)
+            else:
+                header, chunks = _xlsx_chunks(file.stream, chunk_size)
+        except Exception as e:
+            return {"status": "error", "message": f"文件解析失败：{str(e)}"}, 400
+        missing_columns = [field for field in STOCK_IN_REQUIRED_FIELDS if field not in header]
+        if missing_columns:
+            return {"status": "error", "message": f"文件缺少必需的列：{', '.join(missing_columns)}"}, 400
+
+        total_rows = success_count = 0
+        errors = []
+        chunk_results = []
+        aborted = False
+        for first_row, chunk in chunks:
+            items, row_numbers = _chunk_items(chunk, header, first_row)
+            if not items:
+                continue
+            total_rows += len(items)
+            result, status_code = batch_stock_in({"stock_in_items": items, "入库时间": in_time},
+                                                 row_numbers=row_numbers, error_limit=None)
+            chunk_success = result["data"]["success_count"] if status_code == 200 else 0
+            # 整块失败时为逐行错误（全部记录校验不通过）或块级错误（如楼层容量不足、写入失败）
+            chunk_errors = result.get("error_details") or \
+                ([] if status_code == 200 else [f"第{row_numbers[0]}-{row_numbers[-1]}行：{result.get('message')}"])
+            success_count += chunk_success
+            errors.extend(chunk_errors[:max(0, IMPORT_MAX_ERROR_DETAILS - len(errors))])
+            chunk_results.append({
+                "start_row": row_numbers[0],
+                "end_row": row_numbers[-1],
+                "success_count": chunk_success,
+                "error_count": len(items) - chunk_success,
+                "status": "success" if status_code == 200 else "error",
+            })
+            print(f"[导入] {filename} 第{row_numbers[0]}-{row_numbers[-1]}行：成功{chunk_success}条，"
+                  f"失败{len(items) - chunk_success}条", flush=True)
+            if status_code >= 500:
+                # 写入失败等系统异常时停止导入，已提交的块保留
+                aborted = True
+                break
+
+        if total_rows == 0:
+            return {"status": "error", "message": "文件中没有入库数据"}, 400
+
+        error_count = total_rows - success_count
+        return {
+            "status": "success" if success_count else "error",
+            "message": f"导入{'中止' if aborted else '完成'}！成功: {success_count} 条，失败: {error_count} 条",
+            "data": {
+                "filename": filename,
+                "total_rows": total_rows,
+                "success_count": success_count,
+                "error_count": error_count,
+                "aborted": aborted,
+                "chunks": chunk_results,
+                "errors": errors,
+                "errors_truncated": len(errors) < sum(chunk["error_count"] for chunk in chunk_results),
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200 if success_count else 400
+
+    except Exception as e:
+        print(f"入库文件导入异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"导入失败：{str(e)}"}, 500
@@ -0,0 +1,146 @@
+"""
+库存变更日志（客户端增量同步）：
+1. 每次通过commit_write成功写入后，按写入后的数据版本号记录写入事件（涉及的库存ID/操作ID等）
+2. /api/changes?since=N 返回版本N之后变更的库存行（与 /api/inventory 列表行格式一致）、已删除的库存ID及新增的操作记录
+3. 删除同样经commit_write记录（事件类型delete），已删除的库存ID在deleted中返回
+4. 日志只保留最近CHANGE_LOG_MAX_ENTRIES次写入；版本过旧、服务重启或期间有未记录的写入（撤销、直接改写CSV）时返回resync，
+   客户端需重新获取完整列表
+"""
+import threading
+import time
+from collections import deque
+
+import pandas as pd
+
+from config import *
+from get import get_inventory_list
+from index_manager import index_manager
+from utils import DATA_VERSION_BOOT_ID, get_data_version, read_csv_data, df_to_serializable_list
+
+# 事件中的ID列表字段
+CHANGE_ID_FIELDS = ["inventory_ids", "operation_ids", "product_ids", "location_ids", "manufacturer_ids"]
+
+
+class ChangeLog:
+    """按版本号顺序记录的最近写入事件"""
+
+    def __init__(self, max_entries):
+        self._entries = deque(maxlen=max_entries)  # (版本号, 事件)
+        self._lock = threading.Lock()
+
+    def record(self, version, event, csv_data=None):
+        entry = {"type": event.get("type")}
+        for field in CHANGE_ID_FIELDS:
+            entry[field] = [int(value) for value in event.get(field, []) if pd.notna(value)]
+        with self._lock:
+            self._entries.append((version, entry))
+
+    def since(self, since_version, current_version):
+        """返回 (since_version, current_version] 内的全部事件；日志不能完整覆盖该区间时返回None"""
+        with self._lock:
+            entries = [(version, event) for version, event in self._entries if since_version < version <= current_version]
+        if [version for version, _ in entries] != list(range(since_version + 1, current_version + 1)):
+            return None
+        return entries
+
+
+change_log = ChangeLog(CHANGE_LOG_MAX_ENTRIES)
+index_manager.add_write_listener(change_log.record)
+
+
+def _affected_inventory_ids(csv_data, changed):
+    """事件涉及的库存ID：直接变更的库存 + 关联了被编辑商品/位置/厂家的库存（列表行中包含这些关联信息）"""
+    inventory_ids = set(changed["inventory_ids"])
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    if inventory_df.empty:
+        return inventory_ids
+
+    if changed["product_ids"]:
+        feature_df = csv_data.get("feature", pd.DataFrame())
+        if not feature_df.empty and {"商品特征ID", "关联商品ID"}.issubset(feature_df.columns):
+            feature_ids = feature_df.loc[pd.to_numeric(feature_df["关联商品ID"], errors="coerce")
+                                         .isin(changed["product_ids"]), "商品特征ID"]
+            matched = pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce").isin(
+                pd.to_numeric(feature_ids, errors="coerce"))
+            inventory_ids.update(inventory_df.loc[matched, "库存ID"].astype(int).tolist())
+    for column, field in [("关联位置ID", "location_ids"), ("关联厂家ID", "manufacturer_ids")]:
+        if changed[field] and column in inventory_df.columns:
+            matched = pd.to_numeric(inventory_df[column], errors="coerce").isin(changed[field])
+            inventory_ids.update(inventory_df.loc[matched, "库存ID"].astype(int).tolist())
+    return inventory_ids
+
+
+def get_changes(since, boot_id=None, fields=None, expand=None):
+    """
+    增量同步：返回数据版本since之后的库存变更
+    :param since: 客户端上次同步到的版本号（未传时直接返回resync及当前版本号，用于初始化）
+    :param boot_id: 客户端记录的服务启动标识，与当前不一致（服务已重启）时需全量同步
+    :param fields/expand: 与 /api/inventory 相同，控制返回的库存行字段
+    """
+    try:
+        start_time = time.time()
+        current_version = get_data_version()
+        result = {
+            "status": "success",
+            "boot_id": DATA_VERSION_BOOT_ID,
+            "version": current_version,
+        }
+
+        entries = None
+        if since not in (None, ""):
+            try:
+                since = int(since)
+            except (ValueError, TypeError):
+                return {"status": "error", "message": "since必须为整数版本号"}, 400
+            if (not boot_id or boot_id == DATA_VERSION_BOOT_ID) and 0 <= since <= current_version:
+                entries = change_log.since(since, current_version)
+
+        if entries is None:
+            result.update({"resync": True, "message": "无法从该版本增量同步，请重新获取完整库存列表"})
+            return result, 200
+
+        changed = {field: set() for field in CHANGE_ID_FIELDS}
+        for _, event in entries:
+            for field in CHANGE_ID_FIELDS:
+                changed[field].update(event[field])
+
+        csv_data = read_csv_data()
+        inventory_ids = _affected_inventory_ids(csv_data, changed)
+        inventory_df = csv_data.get("inventory", pd.DataFrame())
+        existing_ids = set(pd.to_numeric(inventory_df["库存ID"], errors="coerce").dropna().astype(int)) \
+            if not inventory_df.empty else set()
+        upsert_ids = sorted(inventory_ids & existing_ids)
+        deleted_ids = sorted(inventory_ids - existing_ids)
+
+        upserted = []
+        if upsert_ids:
+            list_result, status_code = get_inventory_list(fields=fields, expand=expand,
+                                                          inventory_ids=upsert_ids, csv_data=csv_data)
+            if status_code != 200:
+                return list_result, status_code
+            upserted = list_result["data"]
+
+        operations = []
+        operation_df = csv_data.get("operation_record", pd.DataFrame())
+        if changed["operation_ids"] and not operation_df.empty:
+            matched = pd.to_numeric(operation_df["操作ID"], errors="coerce").isin(changed["operation_ids"])
+            operations = df_to_serializable_list(operation_df[matched])
+
+        result.update({
+            "resync": False,
+            "since": since,
+            "upserted": upserted,
+            "deleted": deleted_ids,
+            "operations": operations,
+            "performance": {
+                "changes": len(entries),
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        })
+        return result, 200
+
+    except Exception as e:
+        print(f"增量同步查询异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"增量同步失败：{str(e)}"}, 500
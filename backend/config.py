@@ -14,6 +14,9 @@ FLOOR_CAPACITY = 100  # 每层楼100框容量
 
 # 必需的工作表名称
 REQUIRED_TABLES = ['capacity', 'feature', 'inventory', 'location', 'manufacturer','operation_record','product']
+# 操作时间标准格式（加载与写入时统一为该格式）
+OPERATION_TIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
 # 缓存配置
 CACHE_TTL = 60  # 1分钟
 MAX_CACHE_SIZE = 100
@@ -22,4 +25,37 @@ CACHE_TIMEOUT = 30  # 缓存30秒
 # 分页配置
 DEFAULT_PAGE_SIZE = 50
 MAX_PAGE_SIZE = 100
+MAX_BATCH_DETAIL_SIZE = 200  # 批量库存详情单次最多查询的库存数
+MAX_BULK_EDIT_SIZE = 1000  # 批量编辑单次最多编辑的库存数
+MAX_BATCH_DELETE_SIZE = 1000  # 批量删除单次最多删除的库存数
+LAST_ADDRESS_RECENT_MAX = 10  # 最后地址信息接口最多返回的最近地址数
+MANUFACTURER_SUGGEST_LIMIT = 10  # 厂家联想默认返回条数
+MANUFACTURER_SUGGEST_MAX = 50  # 厂家联想单次最多返回条数
+
+# 入库文件导入配置
+IMPORT_CHUNK_SIZE = 2000  # 默认每块行数（一块校验并写入一次）
+IMPORT_MAX_CHUNK_SIZE = 10000  # 每块最多行数
+IMPORT_MAX_ERROR_DETAILS = 1000  # 响应中最多返回的逐行错误数
+IMPORT_MAX_FILE_SIZE = 200 * 1024 * 1024  # 导入文件大小上限（其他上传接口仍为MAX_CONTENT_LENGTH）
+
+# 响应压缩配置
+COMPRESS_MIN_SIZE = 1024  # 超过该字节数的响应才压缩
+COMPRESS_LOG_MIN_SIZE = 1024 * 1024  # 超过该字节数的响应打印压缩日志
+GZIP_COMPRESS_LEVEL = 5
+BROTLI_COMPRESS_QUALITY = 4
+
+# 响应缓存配置
+RESPONSE_CACHE_MAX_BYTES = 64 * 1024 * 1024  # 响应缓存占用内存上限（按编码后字节数计）
+
+# 幂等键配置（写接口 Idempotency-Key 请求头）
+IDEMPOTENCY_TTL = 24 * 60 * 60  # 保存的响应保留时长（秒）
+IDEMPOTENCY_MAX_BYTES = 32 * 1024 * 1024  # 保存的响应占用内存上限（按响应体字节数计）
+
+# 变更日志配置（/api/changes 增量同步）
+CHANGE_LOG_MAX_ENTRIES = 1000  # 保留的最近写入次数，客户端版本早于此范围时需全量同步
 
+# 事件推送配置（/api/events SSE）
+SSE_MAX_SUBSCRIBERS = 20  # 同时在线的订阅连接上限
+SSE_QUEUE_SIZE = 100  # 每个连接待发送的事件上限，积压超过后丢弃并通知客户端重新同步
+SSE_HEARTBEAT_SECONDS = 15  # 无事件时的心跳间隔（防止代理断开空闲连接）
+SSE_MAX_INVENTORY_IDS = 200  # 单条事件携带的库存余额条数上限，超出时只通知重新同步
@@ -0,0 +1,160 @@
+"""
+库存变更事件推送（Server-Sent Events）：
+1. 每次通过commit_write成功写入后，生成精简的变更通知（库存ID + 最新库存数量 + 操作汇总，删除时附已删除的库存ID）
+   推送给所有订阅连接；数据版本在commit_write之外推进（如撤销）时推送resync事件
+2. 每个连接有独立的有界队列，写入方只做非阻塞投递，慢连接不会拖慢写接口；
+   队列积压满时丢弃后续事件，并在恢复后先推送一条resync事件，客户端据此重新同步（如调用 /api/changes）
+3. 同时在线的订阅数有上限，超出时返回503
+"""
+import json
+import queue
+import threading
+import time
+
+import pandas as pd
+
+from config import *
+from index_manager import index_manager
+from location_tree import current_stock_quantities
+from utils import DATA_VERSION_BOOT_ID, get_data_version
+
+
+class Subscriber:
+    """单个订阅连接：有界事件队列 + 溢出标记"""
+
+    def __init__(self, queue_size):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.overflowed = False
+
+    def offer(self, message):
+        """非阻塞投递，队列已满时标记溢出并丢弃"""
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            self.overflowed = True
+
+
+class EventBroker:
+    """订阅连接注册表（线程安全）"""
+
+    def __init__(self, max_subscribers, queue_size):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        """新建订阅，达到上限时返回None"""
+        with self._lock:
+            if len(self._subscribers) >= self.max_subscribers:
+                return None
+            subscriber = Subscriber(self.queue_size)
+            self._subscribers.add(subscriber)
+            return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, message):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+
+broker = EventBroker(SSE_MAX_SUBSCRIBERS, SSE_QUEUE_SIZE)
+
+
+def build_change_message(version, event, csv_data):
+    """
+    生成精简变更通知：{"version", "type", "inventory": [{"库存ID", "库存数量"}], "operations": {类型: {"次数", "数量"}}}，
+    删除事件另附 "deleted": [已删除的库存ID]
+    """
+    message = {"version": version, "type": event.get("type"), "inventory": [], "operations": {}}
+
+    inventory_ids = [int(value) for value in event.get("inventory_ids", []) if pd.notna(value)]
+    if len(inventory_ids) > SSE_MAX_INVENTORY_IDS:
+        # 变更过多时不逐条携带余额，客户端按resync处理
+        message["resync"] = True
+        return message
+
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    if event.get("type") == "delete":
+        existing = set(pd.to_numeric(inventory_df["库存ID"], errors="coerce").dropna().astype(int)) \
+            if not inventory_df.empty and "库存ID" in inventory_df.columns else set()
+        message["deleted"] = sorted(set(inventory_ids) - existing)
+    if inventory_ids and not inventory_df.empty:
+        rows = inventory_df[pd.to_numeric(inventory_df["库存ID"], errors="coerce").isin(inventory_ids)]
+        related_operations = operation_df[pd.to_numeric(operation_df["关联库存ID"], errors="coerce").isin(inventory_ids)] \
+            if not operation_df.empty and "关联库存ID" in operation_df.columns else operation_df
+        balances = current_stock_quantities(rows, related_operations)
+        message["inventory"] = [{"库存ID": int(inventory_id), "库存数量": round(float(quantity), 2)}
+                                for inventory_id, quantity in balances.items()]
+
+    operation_ids = event.get("operation_ids", [])
+    if operation_ids and not operation_df.empty:
+        operations = operation_df[pd.to_numeric(operation_df["操作ID"], errors="coerce").isin(operation_ids)]
+        quantities = pd.to_numeric(operations["操作数量"], errors="coerce").fillna(0.0)
+        for op_type, group in quantities.groupby(operations["操作类型"].astype(str)):
+            message["operations"][op_type] = {"次数": int(len(group)), "数量": round(float(group.sum()), 2)}
+    return message
+
+
+def publish_write_event(version, event, csv_data):
+    """写入监听器：有订阅连接时才生成并推送变更通知"""
+    if broker.subscriber_count() == 0:
+        return
+    broker.publish(("change", version, build_change_message(version, event, csv_data)))
+
+
+def publish_resync(version):
+    """未记录写入监听器：无法生成变更通知，通知客户端重新同步"""
+    if broker.subscriber_count() == 0:
+        return
+    broker.publish(("resync", version, {"version": version, "boot_id": DATA_VERSION_BOOT_ID}))
+
+
+index_manager.add_write_listener(publish_write_event)
+index_manager.add_gap_listener(publish_resync)
+
+
+def format_sse(event_name, data, event_id=None):
+    """按SSE协议格式化一条事件"""
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_name}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False)}")
+    return "\n".join(lines) + "\n\n"
+
+
+def stream_events(subscriber):
+    """
+    订阅连接的事件流：先推送hello（当前版本号与服务启动标识），之后推送change事件；
+    空闲时发送心跳注释，连接断开时自动退订
+    """
+    try:
+        yield format_sse("hello", {"version": get_data_version(), "boot_id": DATA_VERSION_BOOT_ID})
+        while True:
+            if subscriber.overflowed:
+                # 积压期间丢弃的事件无法补发，清空队列后通知客户端重新同步
+                while not subscriber.queue.empty():
+                    subscriber.queue.get_nowait()
+                subscriber.overflowed = False
+                yield format_sse("resync", {"version": get_data_version(), "boot_id": DATA_VERSION_BOOT_ID})
+                continue
+            try:
+                event_name, version, data = subscriber.queue.get(timeout=SSE_HEARTBEAT_SECONDS)
+            except queue.Empty:
+                yield f": ping {int(time.time())}\n\n"
+                continue
+            yield format_sse(event_name, data, event_id=version)
+    finally:
+        broker.unsubscribe(subscriber)
@@ -40,35 +40,29 @@ def export_operation_records(operation_type=None, inventory_id=None, start_date=
 
         print(f"操作记录总数: {len(operation_df)}")
 
-        # 【关键修改2】确保操作记录中的关联库存ID是数值类型
-        operation_df = operation_df.copy()
+        # 【关键修改2】按时间有序索引二分定位导出窗口，窗口内再按操作类型/库存ID过滤，按原始行顺序导出
+        time_index = get_operation_time_index(operation_df)
+        matched = match_operation_window(time_index, operation_type, inventory_id, start_date, end_date)
+        operation_df = operation_df.iloc[np.sort(time_index["positions"][matched])].copy()
         operation_df["关联库存ID"] = pd.to_numeric(operation_df["关联库存ID"], errors="coerce").fillna(-1).astype(int)
+        print(f"过滤后操作记录数: {len(operation_df)}")
 
-        # 过滤操作记录
-        if operation_type:
-            operation_df = operation_df[operation_df["操作类型"] == operation_type]
-            print(f"按操作类型过滤后: {len(operation_df)}")
-
-        if inventory_id:
-            operation_df = operation_df[operation_df["关联库存ID"] == int(inventory_id)]
-            print(f"按库存ID过滤后: {len(operation_df)}")
-
-        if start_date:
-            try:
-                operation_df["操作时间"] = pd.to_datetime(operation_df["操作时间"], errors="coerce")
-                operation_df = operation_df[operation_df["操作时间"] >= pd.to_datetime(start_date)]
-                print(f"按开始时间过滤后: {len(operation_df)}")
-            except Exception as e:
-                print(f"起始时间过滤异常: {str(e)}")
-
-        if end_date:
-            try:
-                if "操作时间" not in operation_df.columns:
-                    operation_df["操作时间"] = pd.to_datetime(operation_df["操作时间"], errors="coerce")
-                operation_df = operation_df[operation_df["操作时间"] <= pd.to_datetime(end_date)]
-                print(f"按结束时间过滤后: {len(operation_df)}")
-            except Exception as e:
-                print(f"结束时间过滤异常: {str(e)}")
+        # 仅保留导出记录涉及的关联数据，后续构建字典的开销与导出规模一致
+        if not inventory_df.empty:
+            inventory_df = inventory_df[
+                pd.to_numeric(inventory_df["库存ID"], errors="coerce").isin(operation_df["关联库存ID"])]
+        if not feature_df.empty and "关联商品特征ID" in inventory_df.columns:
+            feature_df = feature_df[pd.to_numeric(feature_df["商品特征ID"], errors="coerce").isin(
+                pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce"))]
+        if not product_df.empty and "关联商品ID" in feature_df.columns:
+            product_df = product_df[pd.to_numeric(product_df["商品ID"], errors="coerce").isin(
+                pd.to_numeric(feature_df["关联商品ID"], errors="coerce"))]
+        if not location_df.empty and "关联位置ID" in inventory_df.columns:
+            location_df = location_df[pd.to_numeric(location_df["地址ID"], errors="coerce").isin(
+                pd.to_numeric(inventory_df["关联位置ID"], errors="coerce"))]
+        if not manufacturer_df.empty and "关联厂家ID" in inventory_df.columns:
+            manufacturer_df = manufacturer_df[pd.to_numeric(manufacturer_df["厂家ID"], errors="coerce").isin(
+                pd.to_numeric(inventory_df["关联厂家ID"], errors="coerce"))]
 
         # 【关键修改3】确保所有数据表都有正确的数据类型
         # 处理库存表
@@ -298,29 +292,10 @@ def export_operation_records_simple(operation_type=None, inventory_id=None, star
             output.seek(0)
             return output.getvalue()
 
-        # 过滤操作记录
-        if operation_type:
-            operation_df = operation_df[operation_df["操作类型"] == operation_type]
-
-        if inventory_id:
-            operation_df["关联库存ID"] = pd.to_numeric(operation_df["关联库存ID"], errors="coerce").fillna(-1).astype(
-                int)
-            operation_df = operation_df[operation_df["关联库存ID"] == int(inventory_id)]
-
-        if start_date:
-            try:
-                operation_df["操作时间"] = pd.to_datetime(operation_df["操作时间"], errors="coerce")
-                operation_df = operation_df[operation_df["操作时间"] >= pd.to_datetime(start_date)]
-            except:
-                pass
-
-        if end_date:
-            try:
-                if "操作时间" not in operation_df.columns:
-                    operation_df["操作时间"] = pd.to_datetime(operation_df["操作时间"], errors="coerce")
-                operation_df = operation_df[operation_df["操作时间"] <= pd.to_datetime(end_date)]
-            except:
-                pass
+        # 按时间有序索引定位窗口后过滤，按原始行顺序导出
+        time_index = get_operation_time_index(operation_df)
+        matched = match_operation_window(time_index, operation_type, inventory_id, start_date, end_date)
+        operation_df = operation_df.iloc[np.sort(time_index["positions"][matched])]
 
         # 导出所有记录
         for _, row in operation_df.iterrows():
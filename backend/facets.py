@@ -0,0 +1,145 @@
+"""
+库存分面统计：
+1. 按数据版本构建库存关联视图（库存→特征→商品/位置/厂家），各分面字段预先编码为整数类别码
+2. 查询时对类别码做向量化过滤与bincount计数，单次统计在毫秒级
+3. 统计某一分面时不应用该分面自身的筛选条件（同一分面内多选为“或”，不同分面之间为“且”）
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from index_manager import index_manager
+
+# 分面字段 -> (来源表, 列名)
+FACET_FIELDS = {
+    "类型": ("product", "类型"),
+    "楼层": ("location", "楼层"),
+    "材质": ("feature", "材质"),
+    "颜色": ("feature", "颜色"),
+    "厂家": ("manufacturer", "厂家"),
+}
+# 不影响分面字段的写入事件（无需重建）
+FACET_NEUTRAL_EVENTS = {"stock_out", "lend", "return"}
+
+
+def _facet_values(series):
+    """分面取值统一为字符串：缺失值为空字符串，整数型数字去掉小数部分（如楼层 3.0 → "3"）"""
+    numeric = pd.to_numeric(series, errors="coerce")
+    is_int = numeric.notna() & (numeric == numeric.round())
+    values = series.astype(object).where(series.notna(), "").astype(str).str.strip()
+    values[is_int] = numeric[is_int].astype("int64").astype(str)
+    return values
+
+
+def _lookup(ids, table_df, id_column, value_column):
+    """按ID向量化映射关联表的列（ID缺失或无对应记录时为NaN）"""
+    if table_df.empty or id_column not in table_df.columns or value_column not in table_df.columns:
+        return pd.Series(np.nan, index=ids.index, dtype=object)
+    table = table_df[[id_column, value_column]].copy()
+    table[id_column] = pd.to_numeric(table[id_column], errors="coerce")
+    mapping = table.dropna(subset=[id_column]).drop_duplicates(id_column).set_index(id_column)[value_column]
+    return ids.map(mapping)
+
+
+class FacetIndex:
+    """库存分面索引：分面字段 -> (类别码数组, 类别取值列表)"""
+
+    def __init__(self, size):
+        self.size = size
+        self.codes = {}
+        self.categories = {}
+
+    def add_facet(self, field, values):
+        codes, categories = pd.factorize(values, sort=True)
+        self.codes[field] = codes.astype(np.int32)
+        self.categories[field] = list(categories)
+
+    def match_mask(self, filters, exclude=None):
+        """计算满足筛选条件的行掩码，exclude为统计时忽略的分面"""
+        mask = np.ones(self.size, dtype=bool)
+        for field, values in filters.items():
+            if field == exclude or not values:
+                continue
+            lookup = {value: code for code, value in enumerate(self.categories[field])}
+            selected = [lookup[value] for value in values if value in lookup]
+            mask &= np.isin(self.codes[field], selected)
+        return mask
+
+    def count(self, filters):
+        """返回 (满足全部条件的行数, {分面: [{"value", "count"}]})"""
+        facets = {}
+        for field in self.codes:
+            mask = self.match_mask(filters, exclude=field)
+            counts = np.bincount(self.codes[field][mask], minlength=len(self.categories[field]))
+            nonzero = np.flatnonzero(counts)
+            # 按数量降序，同数量按取值升序（类别已排序，稳定排序即可）
+            order = nonzero[np.argsort(-counts[nonzero], kind="stable")]
+            facets[field] = [{"value": self.categories[field][code], "count": int(counts[code])} for code in order]
+        total = int(self.match_mask(filters).sum())
+        return total, facets
+
+
+def build_facet_index(csv_data):
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    index = FacetIndex(len(inventory_df))
+    if inventory_df.empty:
+        for field in FACET_FIELDS:
+            index.add_facet(field, pd.Series([], dtype=object))
+        return index
+
+    feature_df = csv_data.get("feature", pd.DataFrame())
+    feature_ids = pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce")
+    product_ids = pd.to_numeric(_lookup(feature_ids, feature_df, "商品特征ID", "关联商品ID"), errors="coerce")
+    source_ids = {
+        "feature": feature_ids,
+        "product": product_ids,
+        "location": pd.to_numeric(inventory_df["关联位置ID"], errors="coerce"),
+        "manufacturer": pd.to_numeric(inventory_df["关联厂家ID"], errors="coerce"),
+    }
+    id_columns = {"feature": "商品特征ID", "product": "商品ID", "location": "地址ID", "manufacturer": "厂家ID"}
+
+    for field, (table, column) in FACET_FIELDS.items():
+        table_df = csv_data.get(table, pd.DataFrame())
+        values = _lookup(source_ids[table], table_df, id_columns[table], column)
+        index.add_facet(field, _facet_values(values))
+    return index
+
+
+def patch_facet_index(index, event, csv_data):
+    """出库/借还不改变分面字段；入库、编辑等由下次查询时重建（向量化构建，开销很小）"""
+    return event.get("type") in FACET_NEUTRAL_EVENTS
+
+
+index_manager.register("facets", build_facet_index, patch_facet_index)
+
+
+def get_inventory_facets(filters=None):
+    """
+    库存分面统计
+    :param filters: {分面字段: [取值, ...]}，未传或空列表表示不筛选
+    """
+    try:
+        start_time = time.time()
+        filters = {field: values for field, values in (filters or {}).items() if values}
+        unknown = [field for field in filters if field not in FACET_FIELDS]
+        if unknown:
+            return {"status": "error", "message": f"不支持的筛选字段: {', '.join(unknown)}"}, 400
+
+        index = index_manager.get("facets")
+        total, facets = index.count(filters)
+        return {
+            "status": "success",
+            "data": facets,
+            "total": total,
+            "filters": filters,
+            "performance": {
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"库存分面统计异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"分面统计失败：{str(e)}"}, 500
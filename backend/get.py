@@ -2,6 +2,7 @@ from inventory_management import *
 import logging
 import time
 from collections import defaultdict
+from index_manager import index_manager
 
 import time
 import pandas as pd  # 确保已导入pandas（原代码依赖）
@@ -10,9 +11,118 @@ import pandas as pd  # 确保已导入pandas（原代码依赖）
 # def read_csv_data(): ...
 # def df_to_serializable_list(df): ...
 
-def get_inventory_list():
-    """查询库存列表 - 统一计算入库/出库/借/还后的库存数量"""
+# 列表视图可按需展开的关联对象：expand参数取值 → 响应字段名
+INVENTORY_EXPAND_OPTIONS = {
+    "product": "商品信息",
+    "feature": "特征信息",
+    "location": "位置信息",
+    "manufacturer": "厂家信息"
+}
+# 库存列表中由操作记录汇总得到的计算字段
+INVENTORY_COMPUTED_FIELDS = ["累计入库数量", "累计出库数量", "累计借出数量", "累计归还数量", "库存数量"]
+
+
+def parse_list_param(value):
+    """解析逗号分隔的查询参数：None → None（未传），空字符串 → []"""
+    if value is None:
+        return None
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value).split(",")
+    return [str(item).strip() for item in items if str(item).strip()]
+
+
+def parse_inventory_id_param(value):
+    """解析库存ID查询参数：未传/空字符串 → None；非非负整数抛出ValueError"""
+    if value is None or str(value).strip() == "":
+        return None
+    value = str(value).strip()
+    if not value.isdigit():
+        raise ValueError(f"inventory_id必须为非负整数：{value}")
+    return int(value)
+
+
+def summarize_operation_quantities(operation_df):
+    """
+    按库存ID批量汇总入库/出库/借/还数量（替代逐条遍历操作记录）
+    :return: {库存ID: {"入库": x, "出库": x, "借": x, "还": x}}，仅包含有操作记录的库存
+    """
+    if operation_df.empty or "关联库存ID" not in operation_df.columns:
+        return {}
+
+    op_types = ["入库", "出库", "借", "还"]
+    quantities = pd.to_numeric(operation_df["操作数量"], errors="coerce").fillna(0.0)
+    summary = quantities.groupby(
+        [operation_df["关联库存ID"], operation_df["操作类型"].where(operation_df["操作类型"].isin(op_types), "")]
+    ).sum().unstack(fill_value=0.0)
+    for op_type in op_types:
+        if op_type not in summary.columns:
+            summary[op_type] = 0.0
+    return summary[op_types].to_dict("index")
+
+
+def _rows_with_ids(df, column, ids):
+    """按ID列筛选行（列不存在时原样返回）"""
+    if df.empty or column not in df.columns:
+        return df
+    return df[pd.to_numeric(df[column], errors="coerce").isin(ids)]
+
+
+def select_inventory_rows(csv_data, inventory_ids):
+    """
+    取指定库存及其关联的特征/商品/位置/厂家/操作记录行
+    :return: (inventory_df, feature_df, product_df, location_df, manufacturer_df, operation_df)
+    """
+    inventory_df = _rows_with_ids(csv_data.get("inventory", pd.DataFrame()), "库存ID", inventory_ids)
+
+    def related_ids(df, column):
+        if df.empty or column not in df.columns:
+            return []
+        return pd.to_numeric(df[column], errors="coerce").dropna().unique()
+
+    feature_df = _rows_with_ids(csv_data.get("feature", pd.DataFrame()), "商品特征ID",
+                                related_ids(inventory_df, "关联商品特征ID"))
+    product_df = _rows_with_ids(csv_data.get("product", pd.DataFrame()), "商品ID",
+                                related_ids(feature_df, "关联商品ID"))
+    location_df = _rows_with_ids(csv_data.get("location", pd.DataFrame()), "地址ID",
+                                 related_ids(inventory_df, "关联位置ID"))
+    manufacturer_df = _rows_with_ids(csv_data.get("manufacturer", pd.DataFrame()), "厂家ID",
+                                     related_ids(inventory_df, "关联厂家ID"))
+    operation_df = _rows_with_ids(csv_data.get("operation_record", pd.DataFrame()), "关联库存ID", inventory_ids)
+    return inventory_df, feature_df, product_df, location_df, manufacturer_df, operation_df
+
+
+def get_inventory_list(fields=None, expand=None, inventory_ids=None, csv_data=None):
+    """
+    查询库存列表 - 统一计算入库/出库/借/还后的库存数量
+    :param fields: 返回的库存字段列表（None=全部字段，库存ID始终返回）
+    :param expand: 需展开的关联对象（product/feature/location/manufacturer，None=全部展开，[]=不展开）
+    :param inventory_ids: 只返回指定库存（None=全部），关联表与操作记录只处理相关行，结果与全量列表中对应的行一致
+    :param csv_data: 使用调用方已读取的数据快照（None=读取当前数据）
+    操作记录不再内嵌在列表中，需通过 /api/inventory/<id> 分页获取
+    """
     try:
+        fields = parse_list_param(fields)
+        expand = parse_list_param(expand)
+
+        # 展开参数校验（兼容中文字段名）
+        expand_keys = list(INVENTORY_EXPAND_OPTIONS.keys())
+        if expand is not None:
+            name_to_key = {v: k for k, v in INVENTORY_EXPAND_OPTIONS.items()}
+            expand_keys = []
+            for name in expand:
+                if name in ("操作记录", "operations"):
+                    return {"status": "error", "message": "操作记录请通过 /api/inventory/<id> 分页获取"}, 400
+                key = name if name in INVENTORY_EXPAND_OPTIONS else name_to_key.get(name)
+                if key is None:
+                    return {
+                        "status": "error",
+                        "message": f"expand参数无效：{name}，可选值：{', '.join(INVENTORY_EXPAND_OPTIONS.keys())}"
+                    }, 400
+                if key not in expand_keys:
+                    expand_keys.append(key)
+
         # 初始化时间统计
         time_stats = {
             "读取CSV数据": 0.0,
@@ -25,7 +135,8 @@ def get_inventory_list():
 
         # ========== 阶段1：读取CSV数据 ==========
         start = time.time()
-        csv_data = read_csv_data()
+        if csv_data is None:
+            csv_data = read_csv_data()
         time_stats["读取CSV数据"] = (time.time() - start) * 1000  # 转换为毫秒
 
         # 获取所有相关表
@@ -36,117 +147,98 @@ def get_inventory_list():
         manufacturer_df = csv_data.get("manufacturer", pd.DataFrame())
         operation_df = csv_data.get("operation_record", pd.DataFrame())
 
-        # ========== 阶段2：批量转换为可序列化格式 ==========
+        # 只取指定库存时，关联表按外键缩小到相关行
+        if inventory_ids is not None:
+            inventory_df, feature_df, product_df, location_df, manufacturer_df, operation_df = select_inventory_rows(
+                csv_data, inventory_ids)
+
+        # 字段投影校验：只序列化需要的库存列
+        computed_fields = INVENTORY_COMPUTED_FIELDS
+        if fields is not None:
+            unknown_fields = [f for f in fields if f not in inventory_df.columns and f not in INVENTORY_COMPUTED_FIELDS]
+            if unknown_fields:
+                return {"status": "error", "message": f"fields参数包含未知字段：{', '.join(unknown_fields)}"}, 400
+            selected_columns = ["库存ID"] + [f for f in fields if f in inventory_df.columns and f != "库存ID"]
+            # 关联ID列用于展开关联对象，序列化后再移除
+            helper_columns = [c for c in ["关联商品特征ID", "关联位置ID", "关联厂家ID"]
+                              if c in inventory_df.columns and c not in selected_columns]
+            inventory_df = inventory_df[selected_columns + helper_columns]
+            computed_fields = [f for f in INVENTORY_COMPUTED_FIELDS if f in fields]
+        else:
+            helper_columns = []
+
+        # ========== 阶段2：批量转换为可序列化格式（仅转换需要展开的表） ==========
         start = time.time()
         inventory_list = df_to_serializable_list(inventory_df)
-        feature_list = df_to_serializable_list(feature_df)
-        product_list = df_to_serializable_list(product_df)
-        location_list = df_to_serializable_list(location_df)
-        manufacturer_list = df_to_serializable_list(manufacturer_df)
-        operation_list = df_to_serializable_list(operation_df)
+        need_feature = "feature" in expand_keys or "product" in expand_keys
+        feature_list = df_to_serializable_list(feature_df) if need_feature else []
+        product_list = df_to_serializable_list(product_df) if "product" in expand_keys else []
+        location_list = df_to_serializable_list(location_df) if "location" in expand_keys else []
+        manufacturer_list = df_to_serializable_list(manufacturer_df) if "manufacturer" in expand_keys else []
         time_stats["转换可序列化列表"] = (time.time() - start) * 1000
 
         # ========== 阶段3：构建索引字典 ==========
         start = time.time()
-        # 构建特征索引
         feature_index = {}
         for feature in feature_list:
-            feature_id = feature.get("商品特征ID")
-            if feature_id not in feature_index:
-                feature_index[feature_id] = feature
+            feature_index.setdefault(feature.get("商品特征ID"), feature)
 
-        # 构建商品索引
         product_index = {}
         for product in product_list:
-            product_id = product.get("商品ID")
-            if product_id not in product_index:
-                product_index[product_id] = product
+            product_index.setdefault(product.get("商品ID"), product)
 
-        # 构建位置索引
         location_index = {}
         for loc in location_list:
-            location_id = loc.get("地址ID")
-            if location_id not in location_index:
-                location_index[location_id] = loc
+            location_index.setdefault(loc.get("地址ID"), loc)
 
-        # 构建厂家索引
         manufacturer_index = {}
         for mfr in manufacturer_list:
-            manufacturer_id = mfr.get("厂家ID")
-            if manufacturer_id not in manufacturer_index:
-                manufacturer_index[manufacturer_id] = mfr
-
-        # 建立操作记录索引（按关联库存ID）
-        operation_index = {}
-        for operation in operation_list:
-            inv_id = operation.get("关联库存ID")
-            if inv_id not in operation_index:
-                operation_index[inv_id] = []
-            operation_index[inv_id].append(operation)
+            manufacturer_index.setdefault(mfr.get("厂家ID"), mfr)
+
+        # 操作记录按库存ID批量汇总（不再序列化全部操作记录）
+        operation_summary = summarize_operation_quantities(operation_df) if computed_fields else {}
         time_stats["构建索引字典"] = (time.time() - start) * 1000
 
         # ========== 阶段4：组装最终数据 ==========
         start = time.time()
         inventory_with_details = []
         for inv in inventory_list:
-            # 获取关联ID
-            feature_id = inv.get("关联商品特征ID")
-            location_id = inv.get("关联位置ID")
-            manufacturer_id = inv.get("关联厂家ID")
             inventory_id = inv.get("库存ID")
-
-            # 获取商品特征信息
-            feature_dict = {}
-            if feature_id is not None and feature_id in feature_index:
-                feature_dict = feature_index[feature_id]
-                # 通过商品特征获取商品信息
-                product_id = feature_dict.get("关联商品ID")
-                if product_id is not None and product_id in product_index:
-                    inv["商品信息"] = product_index[product_id]
+            feature_dict = feature_index.get(inv.get("关联商品特征ID"), {}) if need_feature else {}
+
+            if "product" in expand_keys:
+                inv["商品信息"] = product_index.get(feature_dict.get("关联商品ID"), {}) if feature_dict else {}
+            if "feature" in expand_keys:
+                inv["特征信息"] = feature_dict
+            if "location" in expand_keys:
+                inv["位置信息"] = location_index.get(inv.get("关联位置ID"), {})
+            if "manufacturer" in expand_keys:
+                inv["厂家信息"] = manufacturer_index.get(inv.get("关联厂家ID"), {})
+
+            # 统一计算当前库存
+            if computed_fields:
+                totals = operation_summary.get(inventory_id)
+                if totals is not None:
+                    computed = {
+                        "累计入库数量": totals["入库"],
+                        "累计出库数量": totals["出库"],
+                        "累计借出数量": totals["借"],
+                        "累计归还数量": totals["还"],
+                        "库存数量": totals["入库"] - totals["出库"] - totals["借"] + totals["还"]
+                    }
                 else:
-                    inv["商品信息"] = {}
-
-            # 获取位置信息
-            if location_id is not None and location_id in location_index:
-                inv["位置信息"] = location_index[location_id]
-            else:
-                inv["位置信息"] = {}
-
-            # 获取厂家信息
-            if manufacturer_id is not None and manufacturer_id in manufacturer_index:
-                inv["厂家信息"] = manufacturer_index[manufacturer_id]
-            else:
-                inv["厂家信息"] = {}
-
-            # 获取操作记录并统一计算库存数量
-            if inventory_id is not None and inventory_id in operation_index:
-                inv["操作记录"] = operation_index[inventory_id]
-                # 计算入库/出库/借/还数量
-                total_in = sum(op.get("操作数量", 0) for op in operation_index[inventory_id]
-                               if op.get("操作类型") == "入库")
-                total_out = sum(op.get("操作数量", 0) for op in operation_index[inventory_id]
-                                if op.get("操作类型") == "出库")
-                total_lend = sum(op.get("操作数量", 0) for op in operation_index[inventory_id]
-                                 if op.get("操作类型") == "借")
-                total_return = sum(op.get("操作数量", 0) for op in operation_index[inventory_id]
-                                   if op.get("操作类型") == "还")
-
-                # 统一计算当前库存
-                inv["累计入库数量"] = total_in
-                inv["累计出库数量"] = total_out
-                inv["累计借出数量"] = total_lend
-                inv["累计归还数量"] = total_return
-                inv["库存数量"] = total_in - total_out - total_lend + total_return
-            else:
-                inv["操作记录"] = []
-                inv["累计入库数量"] = 0
-                inv["累计出库数量"] = 0
-                inv["累计借出数量"] = 0
-                inv["累计归还数量"] = 0
-                inv["库存数量"] = inv.get("库存数量", 0)
-
-            # 添加特征信息
-            inv["特征信息"] = feature_dict
+                    computed = {
+                        "累计入库数量": 0,
+                        "累计出库数量": 0,
+                        "累计借出数量": 0,
+                        "累计归还数量": 0,
+                        "库存数量": inv.get("库存数量", 0)
+                    }
+                for field in computed_fields:
+                    inv[field] = computed[field]
+
+            for col in helper_columns:
+                inv.pop(col, None)
 
             inventory_with_details.append(inv)
         time_stats["组装库存数据"] = (time.time() - start) * 1000
@@ -170,15 +262,142 @@ def get_inventory_list():
         print(f"查询库存异常: {str(e)}")
         return {"status": "error", "message": f"系统异常: {str(e)}"}, 500
 
-def get_operation_records(operation_type=None, inventory_id=None, start_date=None, end_date=None):
+# ------------------- 操作记录时间索引（按 操作时间+操作ID 升序） -------------------
+# 由index_manager按数据版本维护：加载后构建一次，入库/出库/借还写入后仅对新增记录增量合并
+NAT_NS = np.iinfo(np.int64).min  # 无法解析的操作时间排在最早
+# 仅追加操作记录（或不改动操作记录）的写入事件
+OPERATION_APPEND_EVENTS = {"stock_in", "stock_out", "lend", "return", "edit"}
+
+
+def build_operation_time_index(operation_df, offset=0):
+    """构建操作记录的时间有序索引：各数组均按（操作时间, 操作ID）升序排列，offset为首行的行位置"""
+    times = parse_operation_times(operation_df["操作时间"])
+    times_ns = times.values.astype("datetime64[ns]").view("int64")
+    op_ids = pd.to_numeric(operation_df["操作ID"], errors="coerce").fillna(-1).astype("int64").values
+    order = np.lexsort((op_ids, times_ns))
+    return {
+        "rows": offset + len(operation_df),
+        "positions": order + offset,  # 升序排列后对应的原始行位置
+        "times_ns": times_ns[order],
+        "op_ids": op_ids[order],
+        "inventory_ids": pd.to_numeric(operation_df["关联库存ID"], errors="coerce").fillna(-1).astype(
+            "int64").values[order],
+        "op_types": operation_df["操作类型"].astype(str).values[order]
+    }
+
+
+class OperationTimeIndex:
+    """持有当前的索引数组；增量合并时整体替换，读取方拿到的始终是一致的快照"""
+
+    def __init__(self, arrays):
+        self.arrays = arrays
+
+
+def _build_operation_time_index(csv_data):
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    if operation_df.empty:
+        return OperationTimeIndex(None)
+    return OperationTimeIndex(build_operation_time_index(operation_df))
+
+
+def _patch_operation_time_index(index, event, csv_data):
+    """新增操作记录合并进有序数组：新记录时间不早于已有记录时直接拼接，否则对合并结果重新排序"""
+    if event.get("type") not in OPERATION_APPEND_EVENTS or index.arrays is None:
+        return False
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    current = index.arrays
+    if len(operation_df) < current["rows"]:
+        return False
+    if len(operation_df) == current["rows"]:
+        return True
+
+    added = build_operation_time_index(operation_df.iloc[current["rows"]:], offset=current["rows"])
+    merged = {key: np.concatenate([current[key], added[key]]) for key in current if key != "rows"}
+    merged["rows"] = added["rows"]
+    in_order = (len(current["times_ns"]) == 0
+                or (added["times_ns"][0], added["op_ids"][0]) >= (current["times_ns"][-1], current["op_ids"][-1]))
+    if not in_order:
+        order = np.lexsort((merged["op_ids"], merged["times_ns"]))
+        merged = {key: (value[order] if key != "rows" else value) for key, value in merged.items()}
+    index.arrays = merged
+    return True
+
+
+index_manager.register("operation_times", _build_operation_time_index, _patch_operation_time_index)
+
+
+def get_operation_time_index(operation_df):
+    """获取当前操作记录快照的时间索引（与传入数据行数不一致时直接按传入数据构建）"""
+    arrays = index_manager.get("operation_times").arrays
+    if arrays is None or arrays["rows"] != len(operation_df):
+        arrays = build_operation_time_index(operation_df)
+    return arrays
+
+
+def operation_time_window(times_ns, start_date=None, end_date=None):
+    """按起止时间二分定位有序数组中的窗口 [lower, upper)"""
+    lower, upper = 0, len(times_ns)
+    if start_date:
+        try:
+            lower = int(np.searchsorted(times_ns, pd.to_datetime(start_date).value, side="left"))
+        except Exception as e:
+            print(f"起始时间过滤异常: {str(e)}")
+    if end_date:
+        try:
+            upper = int(np.searchsorted(times_ns, pd.to_datetime(end_date).value, side="right"))
+        except Exception as e:
+            print(f"结束时间过滤异常: {str(e)}")
+    # 起始时间过滤时排除无法解析的时间（与原比较逻辑一致）
+    if start_date and lower == 0:
+        lower = int(np.searchsorted(times_ns, NAT_NS, side="right"))
+    return lower, max(lower, upper)
+
+
+def match_operation_window(time_index, operation_type=None, inventory_id=None, start_date=None, end_date=None):
+    """时间窗口内按操作类型/库存ID向量化过滤，返回索引中的升序位置（开销与窗口大小成正比）"""
+    lower, upper = operation_time_window(time_index["times_ns"], start_date, end_date)
+    window_mask = np.ones(upper - lower, dtype=bool)
+    if operation_type:
+        op_types = operation_type if isinstance(operation_type, list) else [operation_type]
+        window_mask &= np.isin(time_index["op_types"][lower:upper], op_types)
+    if inventory_id not in (None, ""):
+        # 调用方已校验为整数（路由层parse_inventory_id_param）
+        window_mask &= time_index["inventory_ids"][lower:upper] == int(inventory_id)
+    return np.flatnonzero(window_mask) + lower
+
+
+def format_operation_cursor(time_ns, op_id):
+    """游标格式：<操作时间,操作ID>，时间无法解析时为空"""
+    time_str = "" if time_ns == NAT_NS else pd.Timestamp(int(time_ns)).strftime("%Y-%m-%d %H:%M:%S")
+    return f"{time_str},{int(op_id)}"
+
+
+def parse_operation_cursor(cursor):
+    """解析游标 → (时间纳秒, 操作ID)；格式错误抛出ValueError"""
+    time_part, sep, id_part = str(cursor).rpartition(",")
+    if not sep:
+        raise ValueError(f"游标格式错误：{cursor}，应为 <操作时间,操作ID>")
+    op_id = int(id_part.strip())
+    time_part = time_part.strip()
+    if not time_part:
+        return NAT_NS, op_id
+    parsed = parse_operation_times(pd.Series([time_part])).iloc[0]
+    if pd.isna(parsed):
+        raise ValueError(f"游标时间格式错误：{time_part}")
+    return parsed.value, op_id
+
+
+def get_operation_records(operation_type=None, inventory_id=None, start_date=None, end_date=None,
+                          after=None, limit=None):
     """
     查询操作记录（出库/入库/其他）
     优化点：
     1. 缓存CSV数据，避免重复磁盘IO
-    2. 批量构建字典（替代iterrows），提升10~100倍效率
-    3. 批量关联数据（merge替代逐行循环），减少Python循环开销
-    4. 提前预处理类型转换，避免重复计算
+    2. 操作记录按（操作时间, 操作ID）建立有序索引，时间范围用二分查找直接定位
+    3. 支持游标分页（after=<操作时间,操作ID>, limit=N），任意深度分页开销一致
+    4. 仅对当前页记录关联库存/商品/特征/位置/厂家信息
     5. 保留ID=0的兼容逻辑，仅过滤无效值（-1/None）
+    未传after/limit时保持原行为，返回全部匹配记录
     """
     try:
         # 读取缓存的预处理数据
@@ -192,57 +411,89 @@ def get_operation_records(operation_type=None, inventory_id=None, start_date=Non
         location_df = csv_data.get("location", pd.DataFrame())
         manufacturer_df = csv_data.get("manufacturer", pd.DataFrame())
 
+        # 分页参数校验
+        paginated = after is not None or limit is not None
+        if paginated:
+            try:
+                limit = int(limit) if limit is not None else DEFAULT_PAGE_SIZE
+            except (ValueError, TypeError):
+                return {"status": "error", "message": "limit必须为整数"}, 400
+            limit = max(1, min(limit, MAX_PAGE_SIZE))
+
         # 空数据处理
         if operation_df.empty:
-            return {
+            empty_result = {
                 "status": "success",
                 "data": [],
                 "total": 0
-            }, 200
-
-        # ========== 第一步：数据过滤（基于预处理后的列） ==========
-        # 过滤操作类型
-        if operation_type:
-            if isinstance(operation_type, list):
-                operation_df = operation_df[operation_df["操作类型"].isin(operation_type)]
-            else:
-                operation_df = operation_df[operation_df["操作类型"] == operation_type]
-
-        # 过滤库存ID（预处理已转换为int，直接匹配）
-        if inventory_id:
-            operation_df = operation_df[operation_df["关联库存ID"] == int(inventory_id)]
-
-        # 过滤时间范围（预处理已转换为datetime，直接比较）
-        if start_date:
-            try:
-                operation_df = operation_df[operation_df["操作时间"] >= pd.to_datetime(start_date)]
-            except Exception as e:
-                print(f"起始时间过滤异常: {str(e)}")
+            }
+            if paginated:
+                empty_result.update({"limit": limit, "next_cursor": None, "has_more": False})
+            return empty_result, 200
 
-        if end_date:
-            try:
-                operation_df = operation_df[operation_df["操作时间"] <= pd.to_datetime(end_date)]
-            except Exception as e:
-                print(f"结束时间过滤异常: {str(e)}")
+        time_index = get_operation_time_index(operation_df)
+        times_ns = time_index["times_ns"]
+
+        # ========== 第一步：时间范围二分定位 + 窗口内按操作类型/库存ID过滤 ==========
+        matched = match_operation_window(time_index, operation_type, inventory_id, start_date, end_date)
+        total = int(len(matched))
 
-        # 按操作时间降序排序（批量排序，替代逐行排序）
-        operation_df = operation_df.sort_values("操作时间", ascending=False)
+        # ========== 第二步：游标定位 + 截取当前页（按操作时间降序） ==========
+        if after:
+            try:
+                cursor_time, cursor_id = parse_operation_cursor(after)
+            except ValueError as e:
+                return {"status": "error", "message": str(e)}, 400
+            # 游标之前（更早）的记录数：先按时间二分，再在同一时间内按操作ID二分
+            time_lo = int(np.searchsorted(times_ns, cursor_time, side="left"))
+            time_hi = int(np.searchsorted(times_ns, cursor_time, side="right"))
+            boundary = time_lo + int(np.searchsorted(time_index["op_ids"][time_lo:time_hi], cursor_id, side="left"))
+            matched = matched[:int(np.searchsorted(matched, boundary, side="left"))]
+
+        if paginated:
+            page_positions = matched[::-1][:limit]
+            has_more = len(matched) > limit
+        else:
+            page_positions = matched[::-1]
+            has_more = False
+
+        page_df = operation_df.iloc[time_index["positions"][page_positions]]
+        next_cursor = None
+        if paginated and has_more and len(page_positions) > 0:
+            last = page_positions[-1]
+            next_cursor = format_operation_cursor(times_ns[last], time_index["op_ids"][last])
+
+        # ========== 第四步：仅为当前页构建关联字典 ==========
+        page_inventory_df = inventory_df[inventory_df["库存ID"].isin(page_df["关联库存ID"])] \
+            if not inventory_df.empty else inventory_df
+        page_feature_df = feature_df[feature_df["商品特征ID"].isin(page_inventory_df["关联商品特征ID"])] \
+            if not feature_df.empty and not page_inventory_df.empty else feature_df.iloc[0:0]
+        page_product_df = product_df[product_df["商品ID"].isin(page_feature_df["关联商品ID"])] \
+            if not product_df.empty and not page_feature_df.empty else product_df.iloc[0:0]
+        page_location_df = location_df[location_df["地址ID"].isin(page_inventory_df["关联位置ID"])] \
+            if not location_df.empty and not page_inventory_df.empty else location_df.iloc[0:0]
+        page_manufacturer_df = manufacturer_df[manufacturer_df["厂家ID"].isin(page_inventory_df["关联厂家ID"])] \
+            if not manufacturer_df.empty and not page_inventory_df.empty else manufacturer_df.iloc[0:0]
 
-        # ========== 第二步：批量构建关联字典（替代iterrows） ==========
         # 库存字典 {库存ID: 库存信息}
-        inventory_dict = inventory_df.set_index("库存ID").to_dict('index') if not inventory_df.empty else {}
+        inventory_dict = page_inventory_df.drop_duplicates("库存ID").set_index("库存ID").to_dict('index') \
+            if not page_inventory_df.empty else {}
         # 特征字典 {商品特征ID: 特征信息}
-        feature_dict = feature_df.set_index("商品特征ID").to_dict('index') if not feature_df.empty else {}
+        feature_dict = page_feature_df.drop_duplicates("商品特征ID").set_index("商品特征ID").to_dict('index') \
+            if not page_feature_df.empty else {}
         # 商品字典 {商品ID: 商品信息}
-        product_dict = product_df.set_index("商品ID").to_dict('index') if not product_df.empty else {}
+        product_dict = page_product_df.drop_duplicates("商品ID").set_index("商品ID").to_dict('index') \
+            if not page_product_df.empty else {}
         # 位置字典 {地址ID: 位置信息}
-        location_dict = location_df.set_index("地址ID").to_dict('index') if not location_df.empty else {}
+        location_dict = page_location_df.drop_duplicates("地址ID").set_index("地址ID").to_dict('index') \
+            if not page_location_df.empty else {}
         # 厂家字典 {厂家ID: 厂家信息}
-        manufacturer_dict = manufacturer_df.set_index("厂家ID").to_dict('index') if not manufacturer_df.empty else {}
+        manufacturer_dict = page_manufacturer_df.drop_duplicates("厂家ID").set_index("厂家ID").to_dict('index') \
+            if not page_manufacturer_df.empty else {}
 
-        # ========== 第三步：批量关联数据（替代逐行循环） ==========
+        # ========== 第五步：关联当前页数据 ==========
         records_with_details = []
-        operation_list = df_to_serializable_list(operation_df)
+        operation_list = df_to_serializable_list(page_df)
 
         for record in operation_list:
             inv_id = record.get("关联库存ID")
@@ -297,18 +548,25 @@ def get_operation_records(operation_type=None, inventory_id=None, start_date=Non
             }
             records_with_details.append(record_details)
 
-        # ========== 第四步：返回结果 ==========
-        return {
+        # ========== 第六步：返回结果 ==========
+        result = {
             "status": "success",
             "data": records_with_details,
-            "total": len(records_with_details),
+            "total": total if paginated else len(records_with_details),
             "filters": {
                 "operation_type": operation_type,
                 "inventory_id": inventory_id,
                 "start_date": start_date,
                 "end_date": end_date
             }
-        }, 200
+        }
+        if paginated:
+            result.update({
+                "limit": limit,
+                "next_cursor": next_cursor,
+                "has_more": bool(has_more)
+            })
+        return result, 200
 
     except Exception as e:
         print(f"查询操作记录异常: {str(e)}")
@@ -1,137 +1,152 @@
 from inventory_management import *
-import logging
-import time
-from collections import defaultdict
+from index_manager import index_manager
+
+# 地址信息返回字段
+ADDRESS_FIELDS = ["地址类型", "楼层", "架号", "框号", "包号"]
+EMPTY_ADDRESS = {field: "" for field in ADDRESS_FIELDS}
+# 不改变库存ID与关联位置的写入事件（无需更新）
+LAST_ADDRESS_NEUTRAL_EVENTS = {"stock_out", "lend", "return"}
+
+
+def _address_text(value):
+    """地址字段统一为去空格字符串，缺失值为空字符串"""
+    return str(value).strip() if pd.notna(value) else ""
+
+
+class LastAddressPointer:
+    """
+    最近入库地址指针：
+    1. latest：库存ID最大的库存记录对应的地址（无关联位置或位置不存在时为空地址）
+    2. recent：按库存ID从新到旧去重后的最近地址列表（最多LAST_ADDRESS_RECENT_MAX条）
+    入库后由index_manager按事件增量更新，接口直接读取
+    """
+
+    def __init__(self):
+        self.latest_inventory_id = None
+        self.latest = dict(EMPTY_ADDRESS)
+        self.recent = []
+
+    def push(self, inventory_id, address):
+        """按库存ID递增顺序推入新入库记录的地址"""
+        self.latest_inventory_id = inventory_id
+        self.latest = dict(address) if address else dict(EMPTY_ADDRESS)
+        if not address:
+            return
+        self.recent = [item for item in self.recent if item["地址ID"] != address["地址ID"]]
+        self.recent.insert(0, dict(address))
+        del self.recent[LAST_ADDRESS_RECENT_MAX:]
+
+
+def _resolve_addresses(location_ids, location_df):
+    """地址ID → 地址信息（同一地址ID取第一条，与原按地址ID匹配后取iloc[0]一致）"""
+    if location_df.empty or not set(["地址ID"] + ADDRESS_FIELDS).issubset(location_df.columns):
+        return {}
+    ids = pd.to_numeric(location_df["地址ID"], errors="coerce")
+    matched = location_df[ids.isin(location_ids)].drop_duplicates("地址ID")
+    return {
+        int(row["地址ID"]): {"地址ID": int(row["地址ID"]), **{field: _address_text(row[field]) for field in ADDRESS_FIELDS}}
+        for _, row in matched.iterrows()
+    }
+
+
+def _sorted_inventory(inventory_df):
+    """有效库存ID及关联位置ID，按库存ID升序"""
+    ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
+    location_ids = pd.to_numeric(inventory_df["关联位置ID"], errors="coerce")
+    valid = ids.notna().values
+    order = np.argsort(ids.values[valid], kind="stable")
+    return ids.values[valid][order].astype("int64"), location_ids.values[valid][order]
+
+
+def build_last_address_pointer(csv_data):
+    pointer = LastAddressPointer()
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    if inventory_df.empty or not {"库存ID", "关联位置ID"}.issubset(inventory_df.columns):
+        return pointer
+
+    inventory_ids, location_ids = _sorted_inventory(inventory_df)
+    if len(inventory_ids) == 0:
+        return pointer
+
+    # 从最新的库存记录往前取，直到凑满去重后的最近地址
+    addresses = _resolve_addresses(set(pd.unique(location_ids[~np.isnan(location_ids)]).astype("int64").tolist()),
+                                   csv_data.get("location", pd.DataFrame()))
+    newest = []
+    seen = set()
+    for location_id in location_ids[::-1]:
+        address = addresses.get(int(location_id)) if not np.isnan(location_id) else None
+        if address and address["地址ID"] not in seen:
+            seen.add(address["地址ID"])
+            newest.append(address)
+            if len(newest) >= LAST_ADDRESS_RECENT_MAX:
+                break
+    pointer.recent = [dict(address) for address in newest]
+
+    pointer.latest_inventory_id = int(inventory_ids[-1])
+    latest_location = location_ids[-1]
+    latest_address = addresses.get(int(latest_location)) if not np.isnan(latest_location) else None
+    pointer.latest = dict(latest_address) if latest_address else dict(EMPTY_ADDRESS)
+    return pointer
+
+
+def patch_last_address_pointer(pointer, event, csv_data):
+    """入库：按库存ID顺序推入新记录；编辑等可能改动关联位置的写入留待重建"""
+    event_type = event.get("type")
+    if event_type in LAST_ADDRESS_NEUTRAL_EVENTS:
+        return True
+    if event_type != "stock_in":
+        return False
+
+    new_ids = sorted(int(inventory_id) for inventory_id in event.get("inventory_ids", []))
+    if not new_ids:
+        return True
+    if pointer.latest_inventory_id is not None and new_ids[0] <= pointer.latest_inventory_id:
+        return False
+
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
+    new_rows = inventory_df[ids.isin(new_ids)]
+    location_by_id = dict(zip(pd.to_numeric(new_rows["库存ID"], errors="coerce").astype("int64"),
+                              pd.to_numeric(new_rows["关联位置ID"], errors="coerce")))
+    addresses = _resolve_addresses(set(int(value) for value in location_by_id.values() if pd.notna(value)),
+                                   csv_data.get("location", pd.DataFrame()))
+    for inventory_id in new_ids:
+        location_id = location_by_id.get(inventory_id)
+        pointer.push(inventory_id, addresses.get(int(location_id)) if pd.notna(location_id) else None)
+    return True
+
+
+index_manager.register("last_address", build_last_address_pointer, patch_last_address_pointer)
 
-import time
-import pandas as pd  # 确保已导入pandas（原代码依赖）
 
 def get_last_address_info(data):
     """
-    获取最后地址信息（核心逻辑）：
-    1. 从inventory表取库存ID最大的记录，提取「关联位置ID」；
-    2. 从location表通过「关联位置ID」匹配「地址ID」，获取地址类型/楼层/架号/框号/包号；
-    【仅内部临时统一ID格式，不修改原DataFrame，避免影响其他函数】
+    获取最后地址信息：库存ID最大的库存记录对应的 地址类型/楼层/架号/框号/包号
+    （读取index_manager维护的最近入库地址指针，无需排序或扫描库存/位置表）
+    可选参数 recent=N：同时返回按入库先后去重的最近N个地址（最多LAST_ADDRESS_RECENT_MAX个）
     """
     try:
-        # 修正后：datetime.now() 可正常调用
-        print(f"\n=== 获取最后地址信息请求开始 | 时间: {datetime.now()} ===", flush=True)
-
-        # 1. 读取CSV数据（仅读取，不修改原数据）
-        csv_data = read_csv_data()
-        # 【关键修改1】复制DataFrame副本，避免修改原数据影响其他函数
-        inventory_df = csv_data.get("inventory", pd.DataFrame()).copy()
-        location_df = csv_data.get("location", pd.DataFrame()).copy()
-
-        # 2. 校验inventory表基础条件
-        if inventory_df.empty:
-            print(f"[信息] 获取最后地址信息：inventory表数据为空，返回默认值", flush=True)
-            return {
-                "status": "success",
-                "data": {"地址类型": "", "楼层": "", "架号": "", "框号": "", "包号": ""}
-            }, 200
-
-        # 校验inventory表必要字段（匹配实际字段名）
-        inv_required_cols = ["库存ID", "关联位置ID"]
-        inv_missing_cols = [col for col in inv_required_cols if col not in inventory_df.columns]
-        if inv_missing_cols:
-            print(f"[错误] inventory.csv缺少必要字段：{', '.join(inv_missing_cols)}", flush=True)
-            return {
-                "status": "error",
-                "message": f"inventory.csv格式错误：缺少字段 {', '.join(inv_missing_cols)}，请检查CSV表头"
-            }, 400
-
-        # 3. 取inventory表中库存ID最大的记录
-        # 确保库存ID为数值类型（避免字符串排序异常）
-        inventory_df["库存ID"] = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
-        # 过滤掉库存ID为空的记录
-        inv_valid_df = inventory_df.dropna(subset=["库存ID"])
-        if inv_valid_df.empty:
-            print(f"[信息] 获取最后地址信息：inventory表中无有效库存ID记录，返回默认值", flush=True)
-            return {
-                "status": "success",
-                "data": {"地址类型": "", "楼层": "", "架号": "", "框号": "", "包号": ""}
-            }, 200
-
-        # 按库存ID倒序取最后一条
-        inv_latest_record = inv_valid_df.sort_values("库存ID", ascending=False).iloc[0]
-        location_id = inv_latest_record.get("关联位置ID")
-        latest_inv_id = inv_latest_record["库存ID"]
-
-        # 4. 校验关联位置ID是否有效
-        if pd.isna(location_id) or str(location_id).strip() == "":
-            print(f"[信息] 获取最后地址信息：inventory表最新记录（库存ID：{latest_inv_id}）的关联位置ID为空，返回默认值",
-                  flush=True)
-            return {
-                "status": "success",
-                "data": {"地址类型": "", "楼层": "", "架号": "", "框号": "", "包号": ""}
-            }, 200
-
-        # 【关键修改2】仅临时清洗当前要匹配的location_id，不修改原DataFrame的字段
-        target_location_id = str(location_id).strip()
-        print(f"[信息] 从inventory表获取最新记录：库存ID={latest_inv_id}，关联位置ID={target_location_id}", flush=True)
-
-        # 5. 校验location表基础条件
-        if location_df.empty:
-            print(f"[信息] 获取最后地址信息：location表数据为空，返回默认值", flush=True)
-            return {
-                "status": "success",
-                "data": {"地址类型": "", "楼层": "", "架号": "", "框号": "", "包号": ""}
-            }, 200
-
-        # 校验location表必要字段（匹配实际字段名）
-        loc_required_cols = ["地址ID", "地址类型", "楼层", "架号", "框号", "包号"]
-        loc_missing_cols = [col for col in loc_required_cols if col not in location_df.columns]
-        if loc_missing_cols:
-            print(f"[错误] location.csv缺少必要字段：{', '.join(loc_missing_cols)}", flush=True)
-            return {
-                "status": "error",
-                "message": f"location.csv格式错误：缺少字段 {', '.join(loc_missing_cols)}，请检查CSV表头"
-            }, 400
-
-        # 6. 从location表匹配地址ID（仅临时转换要匹配的列，不修改原数据）
-        # 【关键修改3】临时创建清洗后的地址ID列（不覆盖原列），用于匹配
-        location_df["_temp_address_id"] = location_df["地址ID"].astype(str).str.strip()
-        loc_filtered_df = location_df[location_df["_temp_address_id"] == target_location_id]
-        # 匹配后删除临时列，不影响原数据
-        location_df.drop(columns=["_temp_address_id"], inplace=True)
-
-        if loc_filtered_df.empty:
-            print(f"[信息] 获取最后地址信息：location表中无地址ID={target_location_id}的记录，返回默认值", flush=True)
-            return {
-                "status": "success",
-                "data": {"地址类型": "", "楼层": "", "架号": "", "框号": "", "包号": ""}
-            }, 200
-
-        # 取匹配到的地址记录（地址ID唯一，取第一条）
-        loc_record = loc_filtered_df.iloc[0]
-
-        # 7. 提取并清洗地址信息
-        address_type = str(loc_record.get("地址类型", "")).strip() if pd.notna(loc_record.get("地址类型")) else ""
-        floor = str(loc_record.get("楼层", "")).strip() if pd.notna(loc_record.get("楼层")) else ""
-        shelf_no = str(loc_record.get("架号", "")).strip() if pd.notna(loc_record.get("架号")) else ""
-        box_no = str(loc_record.get("框号", "")).strip() if pd.notna(loc_record.get("框号")) else ""
-        package_no = str(loc_record.get("包号", "")).strip() if pd.notna(loc_record.get("包号")) else ""
-
-        print(
-            f"[成功] 获取最后地址信息：库存ID={latest_inv_id} → 地址ID={target_location_id} - 地址类型={address_type}, 楼层={floor}, 架号={shelf_no}, 框号={box_no}, 包号={package_no}",
-            flush=True
-        )
-
-        return {
+        recent = 0
+        if isinstance(data, dict) and data.get("recent") not in (None, ""):
+            try:
+                recent = max(0, min(int(data.get("recent")), LAST_ADDRESS_RECENT_MAX))
+            except (ValueError, TypeError):
+                return {"status": "error", "message": "recent必须为整数"}, 400
+
+        pointer = index_manager.get("last_address")
+        result = {
             "status": "success",
-            "data": {
-                "地址类型": address_type,
-                "楼层": floor,
-                "架号": shelf_no,
-                "框号": box_no,
-                "包号": package_no
-            }
-        }, 200
+            "data": {field: pointer.latest.get(field, "") for field in ADDRESS_FIELDS}
+        }
+        if recent:
+            result["recent"] = [dict(address) for address in pointer.recent[:recent]]
+
+        print(f"[成功] 获取最后地址信息：库存ID={pointer.latest_inventory_id} → {result['data']}", flush=True)
+        return result, 200
 
     except Exception as e:
         error_msg = f"获取最后地址信息异常: {str(e)}"
         print(f"[异常] {error_msg}", flush=True)
         import traceback
         traceback.print_exc()
-        return {"status": "error", "message": f"系统异常: {str(e)}"}, 500
\ No newline at end of file
+        return {"status": "error", "message": f"系统异常: {str(e)}"}, 500
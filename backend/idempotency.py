@@ -0,0 +1,116 @@
+"""
+写接口幂等键（请求头 Idempotency-Key）：
+1. 键按 方法+路径+幂等键 区分，首次请求执行后保存响应（状态码、响应体、Content-Type）
+2. 相同键的重试直接返回保存的响应，不再执行写入；同一键仍在处理中时返回409
+3. 同一键但请求体不同（JSON请求比较请求体摘要，上传文件请求比较表单字段、文件名及文件内容摘要）时返回422
+4. 5xx响应不保存，客户端可用同一键重试；条目按IDEMPOTENCY_TTL过期，按字节数限制总内存，超出时淘汰最早的条目
+数据写入时不清空（重放须返回首次执行的结果）
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from config import *
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+IDEMPOTENCY_REPLAYED_HEADER = "Idempotent-Replayed"
+IDEMPOTENCY_KEY_MAX_LENGTH = 255
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024  # 计算上传文件摘要时每次读取的字节数
+
+
+class IdempotencyStore:
+    """幂等键 → 保存的响应（线程安全，按创建时间有序）"""
+
+    def __init__(self, max_bytes, ttl):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> [创建时间, 请求指纹, (状态码, 响应体, Content-Type) 或 None(处理中)]
+        self._size = 0
+        self._lock = threading.Lock()
+        self.replays = 0
+
+    def _expire(self, now):
+        while self._entries:
+            key, entry = next(iter(self._entries.items()))
+            if now - entry[0] < self.ttl:
+                break
+            self._drop(key)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        if entry[2] is not None:
+            self._size -= len(entry[2][1])
+
+    def begin(self, key, fingerprint):
+        """
+        登记请求，返回 (状态, 保存的响应)：
+        new=首次请求（调用方执行后须finish或release）；replay=返回保存的响应；in_progress=处理中；mismatch=请求体不同
+        """
+        with self._lock:
+            now = time.time()
+            self._expire(now)
+            entry = self._entries.get(key)
+            if entry is None:
+                self._entries[key] = [now, fingerprint, None]
+                return "new", None
+            if entry[1] != fingerprint:
+                return "mismatch", None
+            if entry[2] is None:
+                return "in_progress", None
+            self.replays += 1
+            return "replay", entry[2]
+
+    def finish(self, key, status_code, body, content_type):
+        """保存首次执行的响应；单条超过上限时不保存（视同未登记）"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] is not None:
+                return
+            if len(body) > self.max_bytes:
+                self._drop(key)
+                return
+            entry[2] = (status_code, body, content_type)
+            self._size += len(body)
+            # 超出上限时淘汰最早的条目（处理中的条目不占字节，跳过）
+            for old_key in list(self._entries):
+                if self._size <= self.max_bytes:
+                    break
+                if old_key != key and self._entries[old_key][2] is not None:
+                    self._drop(old_key)
+
+    def release(self, key):
+        """放弃登记（执行异常或5xx），允许用同一键重试"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is None:
+                self._drop(key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size, "replays": self.replays}
+
+
+def request_fingerprint(request):
+    """
+    请求指纹：JSON请求为请求体摘要；表单/上传文件请求为 表单字段 + 文件名 + 文件内容 的摘要
+    （逐块读取后把文件流移回开头，接口仍可正常读取；须在设置好request.max_content_length之后调用）；
+    其他请求为请求体摘要
+    """
+    if request.is_json:
+        return hashlib.sha256(request.get_data()).hexdigest()
+    digest = hashlib.sha256()
+    if request.mimetype in ("multipart/form-data", "application/x-www-form-urlencoded"):
+        for name, value in sorted(request.form.items(multi=True)):
+            digest.update(f"form:{name}={value}\n".encode("utf-8"))
+        for name, storage in sorted(request.files.items(multi=True), key=lambda item: item[0]):
+            digest.update(f"file:{name}:{storage.filename}\n".encode("utf-8"))
+            for chunk in iter(lambda: storage.stream.read(FINGERPRINT_CHUNK_SIZE), b""):
+                digest.update(chunk)
+            storage.stream.seek(0)
+    else:
+        digest.update(request.get_data(cache=True))
+    return digest.hexdigest()
+
+
+idempotency_store = IdempotencyStore(IDEMPOTENCY_MAX_BYTES, IDEMPOTENCY_TTL)
@@ -4,6 +4,8 @@ import functools
 import pandas as pd
 from werkzeug.utils import secure_filename
 from werkzeug.exceptions import RequestEntityTooLarge
+from utils import read_csv_data
+from index_manager import commit_write, write_transaction
 
 # ===================== 图片上传配置（新增缓存配置） =====================
 # 图片上传文件夹（项目根目录下的image文件夹）
@@ -151,39 +153,42 @@ def get_product_code_by_feature_id(feature_id):
 
 def update_feature_image_path(feature_id, image_relative_path, host="127.0.0.1:5000"):
     """
-    更新特征表的图片路径（核心修复：仅改图片路径，保留原关联商品ID）
+    更新特征表的图片路径（仅改图片路径，保留原关联商品ID）
+    经commit_write写入：递增数据版本号、清空响应缓存并更新派生索引；不递增库存版本号
+    （前端上传后还会带原版本号同步图片路径）
     :param feature_id: 特征ID（支持0）
     :param image_relative_path: 图片相对路径（如image/货号_时间戳.jpg）
     :param host: 服务器地址（用于拼接图片访问URL）
     :return: 是否更新成功
     """
     try:
-        if not os.path.exists(FEATURE_CSV_PATH):
-            print(f"[特征表] 特征表不存在：{FEATURE_CSV_PATH}", flush=True)
-            return False
-
-        # 读取特征表并处理字段类型
-        feature_df = pd.read_csv(FEATURE_CSV_PATH, encoding="utf-8-sig")
-        feature_df["商品特征ID"] = pd.to_numeric(feature_df["商品特征ID"], errors="coerce").fillna(-1).astype(int)
-        feature_mask = feature_df["商品特征ID"] == int(feature_id)
-
-        if not feature_mask.any():
-            print(f"[特征表] 特征ID[{feature_id}]不存在，无法更新图片路径", flush=True)
-            return False
-
-        # 关键：保留原有关联商品ID（防止篡改）
-        original_product_id = feature_df.loc[feature_mask, "关联商品ID"].iloc[0]
-        print(f"[特征表] 特征ID[{feature_id}]原关联商品ID：{original_product_id}", flush=True)
-
-        # 仅更新图片相关字段，不修改任何关联ID
-        feature_df.loc[feature_mask, "图片路径"] = image_relative_path
-        # feature_df.loc[feature_mask, "图片"] = f"http://{host}/{image_relative_path}"
-
-        # 强制写回原有商品ID（双重防护）
-        feature_df.loc[feature_mask, "关联商品ID"] = original_product_id
-
-        # 保存特征表
-        feature_df.to_csv(FEATURE_CSV_PATH, index=False, encoding="utf-8-sig")
+        with write_transaction():
+            csv_data = read_csv_data()
+            feature_df = csv_data.get("feature", pd.DataFrame()).copy()
+            if feature_df.empty or "商品特征ID" not in feature_df.columns:
+                print(f"[特征表] 特征表为空或结构异常", flush=True)
+                return False
+
+            feature_mask = pd.to_numeric(feature_df["商品特征ID"], errors="coerce") == int(feature_id)
+            if not feature_mask.any():
+                print(f"[特征表] 特征ID[{feature_id}]不存在，无法更新图片路径", flush=True)
+                return False
+
+            # 仅更新图片相关字段，不修改任何关联ID
+            feature_df.loc[feature_mask, "图片路径"] = image_relative_path
+            # feature_df.loc[feature_mask, "图片"] = f"http://{host}/{image_relative_path}"
+
+            inventory_df = csv_data.get("inventory", pd.DataFrame())
+            inventory_ids = []
+            if not inventory_df.empty and "关联商品特征ID" in inventory_df.columns:
+                related = pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce") == int(feature_id)
+                inventory_ids = pd.to_numeric(inventory_df.loc[related, "库存ID"], errors="coerce").dropna().astype(int).tolist()
+
+            data = dict(csv_data)
+            data["feature"] = feature_df
+            if not commit_write(data, {"type": "edit", "inventory_ids": inventory_ids}):
+                print(f"[特征表] 特征ID[{feature_id}]图片路径保存失败", flush=True)
+                return False
         print(f"[特征表] 特征ID[{feature_id}]图片路径更新成功，路径：{image_relative_path}", flush=True)
         return True
     except Exception as e:
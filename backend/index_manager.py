@@ -0,0 +1,133 @@
+"""
+派生索引管理：
+1. 各模块注册 构建函数 + 增量补丁函数，索引按数据版本号惰性构建（版本变化后首次使用时重建）
+2. 写接口通过commit_write保存数据：写入成功且期间无其他写入时，对最新的索引直接打补丁并推进版本号，
+   避免每次写入后全量重建；补丁函数返回False或抛异常时该索引留待下次使用时重建
+3. 写入事件格式：{"type": "stock_in" | "stock_out" | "lend" | "return" | "edit" | "delete", ...附加ID列表}
+4. 写入监听器（如变更日志、事件推送）在每次成功写入后收到 (写入后的版本号, event, 写入的数据)；
+   数据版本在commit_write之外推进（如撤销、直接改写CSV）时，未记录写入监听器收到新版本号
+5. 需要基于最新数据校验后再写入（如编辑时的版本号校验）时，用write_transaction()在写锁内读取、校验并commit_write
+"""
+import threading
+import time
+
+from utils import read_csv_data, write_csv_data, get_data_version, register_invalidate_hook
+
+
+class _IndexEntry:
+    def __init__(self, name, build, patch):
+        self.name = name
+        self.build = build
+        self.patch = patch
+        self.value = None
+        self.version = None
+        self.lock = threading.Lock()
+
+
+class IndexManager:
+    """派生索引注册表（线程安全）"""
+
+    def __init__(self):
+        self._entries = {}
+        self._listeners = []
+        self._gap_listeners = []
+        self._write_lock = threading.RLock()  # 可重入：write_transaction内可直接commit_write
+        self._local = threading.local()  # 当前线程是否正在commit_write内写入
+
+    def register(self, name, build, patch=None):
+        """
+        注册索引：
+        build(csv_data) -> 索引对象
+        patch(索引对象, event, csv_data) -> bool，返回True表示已增量更新到写入后的状态
+        """
+        self._entries[name] = _IndexEntry(name, build, patch)
+
+    def add_write_listener(self, listener):
+        """注册写入监听器 listener(version, event, csv_data)，仅在能确定写入前后版本时调用"""
+        if listener not in self._listeners:
+            self._listeners.append(listener)
+        return listener
+
+    def add_gap_listener(self, listener):
+        """注册未记录写入监听器 listener(version)：数据版本推进但没有对应的写入事件时调用"""
+        if listener not in self._gap_listeners:
+            self._gap_listeners.append(listener)
+        return listener
+
+    def _on_invalidate(self):
+        """缓存失效回调：不是commit_write内的写入即为未记录的写入"""
+        if getattr(self._local, "committing", False):
+            return
+        version = get_data_version()
+        for listener in self._gap_listeners:
+            try:
+                listener(version)
+            except Exception as e:
+                print(f"[索引] 未记录写入监听器执行失败: {str(e)}", flush=True)
+
+    def get(self, name):
+        """获取与当前数据版本一致的索引，版本不一致时重建"""
+        entry = self._entries[name]
+        if entry.value is not None and entry.version == get_data_version():
+            return entry.value
+
+        with entry.lock:
+            version = get_data_version()
+            if entry.value is None or entry.version != version:
+                start = time.time()
+                # 先取版本号再读数据，构建期间发生写入时下次使用会再次重建
+                entry.value = entry.build(read_csv_data())
+                entry.version = version
+                print(f"[索引] {name} 构建完成（数据版本 {version}），耗时 {time.time() - start:.4f}秒", flush=True)
+            return entry.value
+
+    def commit_write(self, csv_data, event, force_override=False):
+        """保存数据并对已构建的索引打增量补丁，返回是否写入成功（与write_csv_data一致）"""
+        with self._write_lock:
+            base_version = get_data_version()
+            self._local.committing = True
+            try:
+                if not write_csv_data(csv_data, force_override=force_override):
+                    return False
+            finally:
+                self._local.committing = False
+
+            # 写入期间有其他写入（版本号跳变）时无法确定基准，全部留待重建
+            if get_data_version() != base_version + 1:
+                return True
+
+            for listener in self._listeners:
+                try:
+                    listener(base_version + 1, event, csv_data)
+                except Exception as e:
+                    print(f"[索引] 写入监听器执行失败: {str(e)}", flush=True)
+
+            for entry in self._entries.values():
+                if entry.patch is None or entry.value is None or entry.version != base_version:
+                    continue
+                with entry.lock:
+                    try:
+                        if entry.patch(entry.value, event, csv_data):
+                            entry.version = base_version + 1
+                    except Exception as e:
+                        print(f"[索引] {entry.name} 增量更新失败，将在下次使用时重建: {str(e)}", flush=True)
+            return True
+
+
+    def write_transaction(self):
+        """写事务：持有写锁期间其他写入等待，锁内读取的数据即写入时的最新数据"""
+        return self._write_lock
+
+
+index_manager = IndexManager()
+register_invalidate_hook(index_manager._on_invalidate)
+
+
+def commit_write(csv_data, event, force_override=False):
+    """写接口保存数据的统一入口（写入CSV + 增量更新派生索引）；删除记录时force_override=True覆盖写入"""
+    return index_manager.commit_write(csv_data, event, force_override=force_override)
+
+
+def write_transaction():
+    """读-校验-写需基于最新数据时使用：with write_transaction(): csv_data = read_csv_data() ... commit_write(...)"""
+    return index_manager.write_transaction()
@@ -6,6 +6,10 @@ from config import *
 from datetime import datetime
 import traceback
 import re
+from index_manager import commit_write, index_manager, write_transaction
+from lookup_index import get_lookup_index
+from manufacturer_index import get_manufacturer_index
+from facets import FACET_FIELDS
 # 1、查询详情
 # 2、编辑
 # 3、删除
@@ -36,393 +40,313 @@ def convert_to_serializable(value):
 
 def serialize_df(df):
     """
-    重写序列化函数：强制逐单元格处理，避免 datetime 列的 map 特殊行为
+    序列化为字典列表（逐列向量化转换，见utils.serialize_column）
+    datetime 列统一为 "%Y-%m-%d %H:%M:%S"，NaT → 空字符串
+    """
+    return df_to_serializable_list(df)
+
+
+# ------------------- 库存详情索引（主键/外键 → 行位置，操作时间预先解析） -------------------
+# 详情表 -> 主键列
+DETAIL_TABLES = {
+    "inventory": "库存ID",
+    "feature": "商品特征ID",
+    "product": "商品ID",
+    "location": "地址ID",
+    "manufacturer": "厂家ID",
+}
+# 仅追加行（不删除、不改主键）的写入事件
+DETAIL_APPEND_EVENTS = {"stock_in", "stock_out", "lend", "return", "edit"}
+NAT_VALUE = np.iinfo(np.int64).min
+EMPTY_POSITIONS = np.empty(0, dtype="int64")
+# 关联多条记录时的警告文字
+DETAIL_WARNING_LABELS = {"product": "商品", "feature": "特征", "location": "位置", "manufacturer": "厂家"}
+
+
+def _group_positions(key_series, offset=0):
+    """按键分组得到 {键: 行位置数组}，键无法转换为整数的行忽略"""
+    keys = pd.to_numeric(key_series, errors="coerce")
+    valid = keys.notna().values
+    positions = np.flatnonzero(valid) + offset
+    if len(positions) == 0:
+        return {}
+    groups = pd.Series(positions).groupby(keys.values[valid].astype("int64")).indices
+    return {int(key): positions[idx] for key, idx in groups.items()}
+
+
+class InventoryDetailIndex:
+    """
+    各表主键 → 行位置、操作记录 关联库存ID → 行位置，以及全部操作时间（纳秒，NaT为最小值）；
+    详情查询只按位置取目标行，不再复制整表或逐行转换
     """
-    if df.empty:
-        return []
 
-    # 先将所有 datetime 列转为字符串（主动处理 NaT）
-    for col in df.columns:
-        if pd.api.types.is_datetime64_any_dtype(df[col]):
-            # 直接将 datetime 列转为字符串，NaT → 空字符串
-            df[col] = df[col].dt.strftime("%Y-%m-%d %H:%M:%S").fillna("")
+    def __init__(self):
+        self.rows = {table: {} for table in DETAIL_TABLES}
+        self.operations = {}
+        self.operation_times = np.empty(0, dtype="int64")
+        self.row_counts = {table: 0 for table in list(DETAIL_TABLES) + ["operation_record"]}
 
-    # 再逐元素序列化（此时已无 datetime 类型，只有字符串/数值）
-    df_serializable = df.apply(lambda col: col.map(convert_to_serializable))
-    return df_serializable.to_dict('records')
+    def append(self, csv_data):
+        """合并各表新增的行（全量构建即从第0行开始追加）"""
+        for table, id_column in DETAIL_TABLES.items():
+            df = csv_data.get(table, pd.DataFrame())
+            start = self.row_counts[table]
+            if len(df) > start and id_column in df.columns:
+                self._merge(self.rows[table], _group_positions(df[id_column].iloc[start:], offset=start))
+            self.row_counts[table] = len(df)
 
+        operation_df = csv_data.get("operation_record", pd.DataFrame())
+        start = self.row_counts["operation_record"]
+        if len(operation_df) > start and "关联库存ID" in operation_df.columns:
+            added = operation_df.iloc[start:]
+            self._merge(self.operations, _group_positions(added["关联库存ID"], offset=start))
+            times = parse_operation_times(added["操作时间"]).values.astype("datetime64[ns]").view("int64")
+            self.operation_times = np.concatenate([self.operation_times, times])
+        self.row_counts["operation_record"] = len(operation_df)
 
-def get_inventory_detail(inventory_id, page=1, page_size=50):
-    """查询库存详情 - 统一计算入库/出库/借/还后的库存数量"""
-    try:
-        # ========== 【新增】打印请求参数 ==========
-        print("=" * 50)
-        print(f"【请求参数】库存ID：{inventory_id} | 页码：{page} | 页大小：{page_size}")
-        print("=" * 50)
+    @staticmethod
+    def _merge(target, groups):
+        for key, positions in groups.items():
+            existing = target.get(key)
+            target[key] = positions if existing is None else np.concatenate([existing, positions])
 
-        csv_data = read_csv_data()
+    def matches(self, csv_data):
+        """索引是否与给定数据快照的行数一致"""
+        return all(len(csv_data.get(table, pd.DataFrame())) == count for table, count in self.row_counts.items())
 
-        # 获取所有相关表（加 copy 避免原数据被修改）
-        inventory_df = csv_data.get("inventory", pd.DataFrame()).copy()
-        feature_df = csv_data.get("feature", pd.DataFrame()).copy()
-        product_df = csv_data.get("product", pd.DataFrame()).copy()
-        location_df = csv_data.get("location", pd.DataFrame()).copy()
-        manufacturer_df = csv_data.get("manufacturer", pd.DataFrame()).copy()
-        operation_df = csv_data.get("operation_record", pd.DataFrame()).copy()
+    def positions(self, table, key):
+        """按主键取目标行位置（键为空/无法转换或不存在时返回空数组）"""
+        key = pd.to_numeric(key, errors="coerce")
+        if key is None or pd.isna(key):
+            return EMPTY_POSITIONS
+        return self.rows[table].get(int(key), EMPTY_POSITIONS)
 
-        # 校验库存ID是否存在
-        if inventory_df.empty or "库存ID" not in inventory_df.columns:
-            return {"status": "error", "message": "库存数据表格结构异常"}, 500
 
-        # 筛选目标库存
-        inventory_df["库存ID"] = pd.to_numeric(inventory_df["库存ID"], errors="coerce").fillna(-1).astype(int)
-        target_inventory = inventory_df[inventory_df["库存ID"] == inventory_id].copy()
+def build_inventory_detail_index(csv_data):
+    index = InventoryDetailIndex()
+    index.append(csv_data)
+    return index
 
-        if target_inventory.empty:
-            # ========== 【新增】打印库存不存在的提示 ==========
-            print(f"【错误】未找到库存ID为 {inventory_id} 的记录")
-            return {"status": "error", "message": f"未找到ID为{inventory_id}的库存记录"}, 404
 
-        # 获取关联ID
-        inventory_record = target_inventory.iloc[0]
-        feature_id = inventory_record.get("关联商品特征ID")
-        location_id = inventory_record.get("关联位置ID")
-        manufacturer_id = inventory_record.get("关联厂家ID")
-
-        # 获取商品特征信息
-        target_features = pd.DataFrame()
-        if feature_id is not None and not feature_df.empty and "商品特征ID" in feature_df.columns:
-            feature_df["商品特征ID"] = pd.to_numeric(feature_df["商品特征ID"], errors="coerce").fillna(-1).astype(int)
-            target_features = feature_df[feature_df["商品特征ID"] == feature_id].copy()
-
-        # 获取商品信息
-        target_products = pd.DataFrame()
-        if feature_id is not None and not target_features.empty and not product_df.empty and "商品ID" in product_df.columns:
-            product_id = target_features.iloc[0].get("关联商品ID")
-            if product_id is not None and product_id != "":
-                product_df["商品ID"] = pd.to_numeric(product_df["商品ID"], errors="coerce").fillna(-1).astype(int)
-                target_products = product_df[product_df["商品ID"] == int(product_id)].copy()
-
-        # 获取位置信息
-        target_locations = pd.DataFrame()
-        if location_id is not None and not location_df.empty and "地址ID" in location_df.columns:
-            location_df["地址ID"] = pd.to_numeric(location_df["地址ID"], errors="coerce").fillna(-1).astype(int)
-            target_locations = location_df[location_df["地址ID"] == location_id].copy()
-
-        # 获取厂家信息
-        target_manufacturers = pd.DataFrame()
-        if manufacturer_id is not None and not manufacturer_df.empty and "厂家ID" in manufacturer_df.columns:
-            manufacturer_df["厂家ID"] = pd.to_numeric(manufacturer_df["厂家ID"], errors="coerce").fillna(-1).astype(int)
-            target_manufacturers = manufacturer_df[manufacturer_df["厂家ID"] == manufacturer_id].copy()
-
-        # 获取操作记录
-        target_operations = pd.DataFrame()
-        if inventory_id is not None and not operation_df.empty and "关联库存ID" in operation_df.columns:
-            operation_df["关联库存ID"] = pd.to_numeric(operation_df["关联库存ID"], errors="coerce").fillna(-1).astype(
-                int)
-            target_operations = operation_df[operation_df["关联库存ID"] == inventory_id].copy()
-
-        # ========== 【新增】打印读取到的操作记录基础信息 ==========
-        print(f"\n【操作记录】共读取到 {len(target_operations)} 条记录")
-        if not target_operations.empty:
-            # 打印前5条记录的关键字段（操作类型、操作时间、操作数量）
-            print("【操作记录详情（前5条）】：")
-            for idx, (_, row) in enumerate(target_operations.head(5).iterrows()):
-                op_time = row.get("操作时间", "无")
-                # 处理 NaT/空值
-                if pd.isna(op_time):
-                    op_time = "NaT（空时间）"
-                print(
-                    f"  第{idx + 1}条：操作类型={row.get('操作类型', '无')} | 操作时间={op_time} | 操作数量={row.get('操作数量', 0)}")
-
-        # 操作记录分页
-        page = max(1, int(page))
-        page_size = max(10, min(int(page_size), 100))
-        total_operations = int(len(target_operations))
-        total_pages = int((total_operations + page_size - 1) // page_size)
-
-        # 分页截取 + 处理操作时间（修复核心逻辑）
-        paginated_operations = pd.DataFrame()
-        if not target_operations.empty:
-            # ========== 【新增：详细调试原始数据】 ==========
-            print("\n【详细调试】操作时间原始数据：")
-            for idx, (_, row) in enumerate(target_operations.iterrows()):
-                original_time = row["操作时间"]
-                print(f"  第{idx + 1}条：")
-                print(f"    类型：{type(original_time)}")
-                print(f"    值：{repr(original_time)}")
-                print(f"    长度：{len(str(original_time))}")
-
-            # ========== 【修复1：安全时间转换函数】 ==========
-            def safe_convert_time(time_str):
-                """安全的时间转换函数"""
-                if pd.isna(time_str):
-                    return pd.NaT
-
-                # 如果是 datetime 类型直接返回
-                if isinstance(time_str, (pd.Timestamp, datetime)):
-                    return time_str
-
-                # 转换为字符串并清理
-                str_time = str(time_str).strip()
-
-                # 清理常见问题字符
-                # 1. 替换全角字符
-                str_time = str_time.replace('：', ':')  # 全角冒号
-                str_time = str_time.replace('－', '-')  # 全角横线
-
-                # 2. 清理不可见字符（控制字符）
-                import re
-                str_time = re.sub(r'[\x00-\x1f\x7f]', '', str_time)
-
-                # 3. 处理多个空格
-                str_time = ' '.join(str_time.split())
-
-                # 4. 统一时间格式（添加秒部分如果缺少）
-                if ':' in str_time:
-                    parts = str_time.split(':')
-                    if len(parts) == 2:  # 只有时:分
-                        str_time = f'{str_time}:00'
-                    elif len(parts) > 3:  # 如果有多余部分，只取前3部分
-                        str_time = ':'.join(parts[:3])
-
-                # 5. 确保日期时间格式完整
-                if len(str_time) == 10:  # 只有日期
-                    str_time = f'{str_time} 00:00:00'
-                elif len(str_time) == 16:  # 日期+时:分
-                    str_time = f'{str_time}:00'
-
-                return str_time
-
-            # 应用安全转换
-            print("\n【安全转换】开始转换操作时间...")
-            target_operations["操作时间"] = target_operations["操作时间"].apply(safe_convert_time)
-
-            # ========== 【新增：调试转换后的字符串】 ==========
-            print("\n【调试】转换后的字符串：")
-            for idx, (_, row) in enumerate(target_operations.iterrows()):
-                conv_time = row["操作时间"]
-                print(f"  第{idx + 1}条：{repr(conv_time)}")
-
-            # ========== 【修复2：尝试多种转换方式】 ==========
-            # 方式1：尝试标准格式
-            target_operations["操作时间_parsed"] = pd.to_datetime(
-                target_operations["操作时间"],
-                errors='coerce',
-                format='%Y-%m-%d %H:%M:%S'
-            )
-
-            # 检查哪些转换失败
-            failed_mask = target_operations["操作时间_parsed"].isna()
-            if failed_mask.any():
-                print(f"\n【警告】部分时间转换失败：{failed_mask.sum()}条")
-
-                # 方式2：尝试不指定format，让pandas自动推断
-                target_operations.loc[failed_mask, "操作时间_parsed"] = pd.to_datetime(
-                    target_operations.loc[failed_mask, "操作时间"],
-                    errors='coerce',
-                    format=None  # 不指定格式，自动推断
-                )
-
-            # 方式3：如果还有失败，尝试更宽松的转换
-            still_failed_mask = target_operations["操作时间_parsed"].isna()
-            if still_failed_mask.any():
-                print(f"\n【警告】仍有{still_failed_mask.sum()}条记录转换失败，尝试最后手段...")
-
-                # 手动解析日期时间
-                for idx, row in target_operations[still_failed_mask].iterrows():
-                    time_str = row["操作时间"]
-                    if isinstance(time_str, str):
-                        # 尝试提取日期和时间
-                        date_match = re.search(r'(\d{4}[-/]\d{1,2}[-/]\d{1,2})', time_str)
-                        time_match = re.search(r'(\d{1,2}:\d{1,2}(:\d{1,2})?)', time_str)
-
-                        if date_match:
-                            date_part = date_match.group(1).replace('/', '-')
-                            time_part = time_match.group(1) if time_match else "00:00:00"
-
-                            # 补齐时间部分
-                            if ':' in time_part:
-                                time_parts = time_part.split(':')
-                                if len(time_parts) == 2:
-                                    time_part = f'{time_part}:00'
-
-                            combined_str = f'{date_part} {time_part}'
-                            try:
-                                target_operations.at[idx, "操作时间_parsed"] = pd.to_datetime(
-                                    combined_str, errors='coerce'
-                                )
-                            except:
-                                target_operations.at[idx, "操作时间_parsed"] = pd.NaT
-
-            # 使用转换后的列
-            target_operations["操作时间"] = target_operations["操作时间_parsed"]
-            target_operations.drop(columns=["操作时间_parsed"], inplace=True)
-
-            # ========== 【新增：调试转换后的时间】 ==========
-            print("\n【时间转换结果】：")
-            for idx, (_, row) in enumerate(target_operations.head(10).iterrows()):
-                conv_time = row["操作时间"]
-                if pd.isna(conv_time):
-                    conv_time_str = "NaT"
-                else:
-                    try:
-                        conv_time_str = conv_time.strftime("%Y-%m-%d %H:%M:%S")
-                    except:
-                        conv_time_str = "格式错误"
-                print(f"  第{idx + 1}条：转换后时间={conv_time_str}")
-
-            # 检查是否有未转换的记录
-            na_count = target_operations["操作时间"].isna().sum()
-            if na_count > 0:
-                print(f"\n【警告】仍有 {na_count} 条记录的时间转换失败")
-                # 填充默认值（使用当前时间或最早的有效时间）
-                valid_times = target_operations["操作时间"].dropna()
-                if not valid_times.empty:
-                    fill_time = valid_times.min()  # 使用最早的有效时间
-                else:
-                    fill_time = pd.Timestamp.now()
-
-                target_operations["操作时间"] = target_operations["操作时间"].fillna(fill_time)
-                print(f"【修复】已用 {fill_time.strftime('%Y-%m-%d %H:%M:%S')} 填充 {na_count} 条失败记录")
-
-            # ========== 【修复3：排序逻辑确认（降序，最新时间在前）】 ==========
-            target_operations = target_operations.sort_values(
-                "操作时间",
-                ascending=False,  # 降序：最新时间排在前面
-                na_position='last'  # NaT 放到最后
-            )
-
-            # 分页
-            start = (page - 1) * page_size
-            end = start + page_size
-            paginated_operations = target_operations.iloc[start:end].copy()
-
-        # 数据序列化（使用修复后的 serialize_df）
-        inventory_serial = serialize_df(target_inventory)
-        inventory_dict = inventory_serial[0] if inventory_serial else {}
-        product_list = serialize_df(target_products)
-        feature_list = serialize_df(target_features)
-        location_list = serialize_df(target_locations)
-        manufacturer_list = serialize_df(target_manufacturers)
-        operation_list = serialize_df(paginated_operations)
-
-        # 计算操作统计（包含借/还）
-        total_in_quantity = 0.0
-        total_out_quantity = 0.0
-        total_lend_quantity = 0.0
-        total_return_quantity = 0.0
-        other_stats = {}
-
-        if not target_operations.empty:
-            # 确保操作数量为数值类型
-            target_operations["操作数量"] = pd.to_numeric(target_operations["操作数量"], errors="coerce").fillna(0.0)
-
-            # 入库/出库统计
-            in_operations = target_operations[target_operations["操作类型"] == "入库"]
-            total_in_quantity = float(in_operations["操作数量"].sum()) if not in_operations.empty else 0.0
-
-            out_operations = target_operations[target_operations["操作类型"] == "出库"]
-            total_out_quantity = float(out_operations["操作数量"].sum()) if not out_operations.empty else 0.0
-
-            # 借/还统计
-            lend_operations = target_operations[target_operations["操作类型"] == "借"]
-            total_lend_quantity = float(lend_operations["操作数量"].sum()) if not lend_operations.empty else 0.0
-
-            return_operations = target_operations[target_operations["操作类型"] == "还"]
-            total_return_quantity = float(return_operations["操作数量"].sum()) if not return_operations.empty else 0.0
-
-            # 其他操作类型
-            other_operations = target_operations[~target_operations["操作类型"].isin(["入库", "出库", "借", "还"])]
-            if not other_operations.empty:
-                for op_type in other_operations["操作类型"].unique():
-                    op_type_str = str(op_type).strip()
-                    if not op_type_str:
-                        continue
-                    type_ops = other_operations[other_operations["操作类型"] == op_type]
-                    other_stats[op_type_str] = {
-                        "次数": int(len(type_ops)),
-                        "总数量": float(type_ops["操作数量"].sum())
-                    }
-
-        # 统一计算当前库存
-        current_stock = round(
-            float(total_in_quantity - total_out_quantity - total_lend_quantity + total_return_quantity),
-            2
-        )
-        inventory_dict["库存数量"] = current_stock
-        inventory_dict["累计入库数量"] = round(total_in_quantity, 2)
-        inventory_dict["累计出库数量"] = round(total_out_quantity, 2)
-        inventory_dict["累计借出数量"] = round(total_lend_quantity, 2)
-        inventory_dict["累计归还数量"] = round(total_return_quantity, 2)
-
-        # 操作统计信息（处理最后操作时间）
-        last_operation_time = ""
-        if not target_operations.empty:
-            # ========== 【修复4：正确获取最后操作时间（排除NaT）】 ==========
-            valid_times = target_operations["操作时间"].dropna()
-            if not valid_times.empty:
-                last_op_time = valid_times.max()
-                last_operation_time = last_op_time.strftime("%Y-%m-%d %H:%M:%S")
-
-        operation_stats = {
-            "total_in_quantity": round(total_in_quantity, 2),
-            "total_out_quantity": round(total_out_quantity, 2),
-            "total_lend_quantity": round(total_lend_quantity, 2),
-            "total_return_quantity": round(total_return_quantity, 2),
-            "current_stock": current_stock,
-            "total_operations": int(total_operations),
-            "other_operations": other_stats,
-            "last_operation_time": last_operation_time
+def patch_inventory_detail_index(index, event, csv_data):
+    if event.get("type") not in DETAIL_APPEND_EVENTS:
+        return False
+    if any(len(csv_data.get(table, pd.DataFrame())) < count for table, count in index.row_counts.items()):
+        return False
+    index.append(csv_data)
+    return True
+
+
+index_manager.register("inventory_detail", build_inventory_detail_index, patch_inventory_detail_index)
+
+
+def _load_detail_snapshot():
+    """读取一次数据快照及与之匹配的详情索引（单条/批量详情共用）"""
+    csv_data = read_csv_data()
+    index = index_manager.get("inventory_detail")
+    if not index.matches(csv_data):
+        # 数据快照与索引不一致（如读取后被就地修改）时按当前数据构建
+        index = build_inventory_detail_index(csv_data)
+    return csv_data, index
+
+
+def _normalize_detail_page(page, page_size):
+    """操作记录分页参数：页码从1开始，页大小限制在10~100"""
+    return max(1, int(page)), max(10, min(int(page_size), 100))
+
+
+def _cell(df, column, position):
+    """按行位置取单元格（列不存在时为None）"""
+    return df[column].values[position] if column in df.columns else None
+
+
+def _serialize_positions(df, positions):
+    """一次iloc取出并序列化多行，返回 {行位置: 记录}"""
+    positions = np.unique(np.asarray(positions, dtype="int64"))
+    if len(positions) == 0:
+        return {}
+    return dict(zip(positions.tolist(), serialize_df(df.iloc[positions])))
+
+
+def _resolve_detail_rows(csv_data, index, inventory_id):
+    """
+    定位单个库存在各表的目标行位置，操作记录按预先解析的操作时间降序（最新在前），
+    无法解析的时间用该库存最早的有效时间代替；库存不存在时返回None
+    """
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    feature_df = csv_data.get("feature", pd.DataFrame())
+
+    inventory_positions = index.positions("inventory", inventory_id)
+    if len(inventory_positions) == 0:
+        return None
+
+    first = inventory_positions[0]
+    feature_positions = index.positions("feature", _cell(inventory_df, "关联商品特征ID", first))
+    product_positions = index.positions("product", _cell(feature_df, "关联商品ID", feature_positions[0])) \
+        if len(feature_positions) > 0 else EMPTY_POSITIONS
+
+    op_positions = index.operations.get(int(inventory_id), EMPTY_POSITIONS)
+    op_times = index.operation_times[op_positions]
+    invalid = op_times == NAT_VALUE
+    if invalid.any():
+        fill_time = op_times[~invalid].min() if (~invalid).any() else pd.Timestamp.now().value
+        op_times = np.where(invalid, fill_time, op_times)
+    order = np.argsort(-op_times, kind="stable")
+
+    return {
+        "inventory": inventory_positions,
+        "feature": feature_positions,
+        "product": product_positions,
+        "location": index.positions("location", _cell(inventory_df, "关联位置ID", first)),
+        "manufacturer": index.positions("manufacturer", _cell(inventory_df, "关联厂家ID", first)),
+        "operation_record": op_positions[order],
+        "operation_times": op_times[order],
+    }
+
+
+def _operation_stats(op_types, op_quantities, op_times):
+    """计算操作统计（包含借/还），返回 (累计数量字典, 统计信息)"""
+    total_in_quantity = float(op_quantities[op_types == "入库"].sum())
+    total_out_quantity = float(op_quantities[op_types == "出库"].sum())
+    total_lend_quantity = float(op_quantities[op_types == "借"].sum())
+    total_return_quantity = float(op_quantities[op_types == "还"].sum())
+
+    # 其他操作类型
+    other_stats = {}
+    other_mask = ~pd.Series(op_types, dtype=object).isin(["入库", "出库", "借", "还"]).values
+    for op_type in pd.unique(op_types[other_mask]):
+        op_type_str = str(op_type).strip()
+        if not op_type_str:
+            continue
+        type_mask = other_mask & (op_types == op_type)
+        other_stats[op_type_str] = {
+            "次数": int(type_mask.sum()),
+            "总数量": float(op_quantities[type_mask].sum())
         }
 
-        # 处理多记录警告提示
-        warnings = []
-        if len(product_list) > 1:
-            warnings.append(f"该库存关联{len(product_list)}个商品记录，请确认数据是否正常")
-        if len(feature_list) > 1:
-            warnings.append(f"该库存关联{len(feature_list)}个特征记录，请确认数据是否正常")
-        if len(location_list) > 1:
-            warnings.append(f"该库存关联{len(location_list)}个位置记录，请确认数据是否正常")
-        if len(manufacturer_list) > 1:
-            warnings.append(f"该库存关联{len(manufacturer_list)}个厂家记录，请确认数据是否正常")
-
-        # 组装响应数据
-        response_data = {
-            "status": "success",
+    # 统一计算当前库存
+    current_stock = round(
+        float(total_in_quantity - total_out_quantity - total_lend_quantity + total_return_quantity),
+        2
+    )
+    totals = {
+        "库存数量": current_stock,
+        "累计入库数量": round(total_in_quantity, 2),
+        "累计出库数量": round(total_out_quantity, 2),
+        "累计借出数量": round(total_lend_quantity, 2),
+        "累计归还数量": round(total_return_quantity, 2),
+    }
+
+    # 操作统计信息（处理最后操作时间）
+    last_operation_time = ""
+    if len(op_times) > 0:
+        last_operation_time = pd.Timestamp(int(op_times.max())).strftime("%Y-%m-%d %H:%M:%S")
+
+    operation_stats = {
+        "total_in_quantity": round(total_in_quantity, 2),
+        "total_out_quantity": round(total_out_quantity, 2),
+        "total_lend_quantity": round(total_lend_quantity, 2),
+        "total_return_quantity": round(total_return_quantity, 2),
+        "current_stock": current_stock,
+        "total_operations": int(len(op_types)),
+        "other_operations": other_stats,
+        "last_operation_time": last_operation_time
+    }
+    return totals, operation_stats
+
+
+def _build_inventory_details(csv_data, index, inventory_ids, page, page_size, include_operations=True):
+    """
+    按索引批量组装库存详情（库存/商品/特征/位置/厂家 + 操作记录分页与统计）：
+    先定位所有目标行，再每张表一次iloc取出并序列化，单条详情与批量详情共用
+    :return: {库存ID: {"data", "pagination", "warnings"?}}，不存在的库存不包含在结果中
+    """
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    resolved = {}
+    for inventory_id in inventory_ids:
+        rows = _resolve_detail_rows(csv_data, index, inventory_id)
+        if rows is not None:
+            resolved[inventory_id] = rows
+    if not resolved:
+        return {}
+
+    # 操作记录分页（批量详情可不返回操作记录，仅保留统计）
+    start = (page - 1) * page_size
+    for rows in resolved.values():
+        rows["operation_page"] = rows["operation_record"][start:start + page_size] if include_operations \
+            else EMPTY_POSITIONS
+
+    # 各表目标行一次取出并序列化
+    records = {}
+    for table in list(DETAIL_TABLES) + ["operation_page"]:
+        source = "operation_record" if table == "operation_page" else table
+        positions = np.concatenate([rows[table] for rows in resolved.values()])
+        records[table] = _serialize_positions(csv_data.get(source, pd.DataFrame()), positions)
+
+    # 操作类型/数量一次取出，再按库存切分
+    all_positions = np.concatenate([rows["operation_record"] for rows in resolved.values()])
+    all_types = operation_df["操作类型"].values[all_positions] if len(all_positions) > 0 else np.empty(0, dtype=object)
+    all_quantities = pd.to_numeric(pd.Series(operation_df["操作数量"].values[all_positions]) if len(all_positions) > 0
+                                   else pd.Series([], dtype=float), errors="coerce").fillna(0.0).values
+    split_at = np.cumsum([len(rows["operation_record"]) for rows in resolved.values()])[:-1]
+
+    details = {}
+    for (inventory_id, rows), op_types, op_quantities in zip(
+            resolved.items(), np.split(all_types, split_at), np.split(all_quantities, split_at)):
+        lists = {table: [records[table][position] for position in rows[table].tolist()] for table in DETAIL_TABLES}
+
+        operation_list = [dict(records["operation_page"][position]) for position in rows["operation_page"].tolist()]
+        for record, time_ns in zip(operation_list, rows["operation_times"][start:start + page_size]):
+            record["操作时间"] = pd.Timestamp(int(time_ns)).strftime("%Y-%m-%d %H:%M:%S")
+
+        totals, operation_stats = _operation_stats(op_types, op_quantities, rows["operation_times"])
+        inventory_dict = dict(lists["inventory"][0])
+        inventory_dict.update(totals)
+
+        total_operations = int(len(op_types))
+        detail = {
             "data": {
                 "inventory": inventory_dict,
-                "product": product_list[0] if product_list else {},
-                "feature": feature_list[0] if feature_list else {},
-                "location": location_list[0] if location_list else {},
-                "manufacturer": manufacturer_list[0] if manufacturer_list else {},
+                "product": lists["product"][0] if lists["product"] else {},
+                "feature": lists["feature"][0] if lists["feature"] else {},
+                "location": lists["location"][0] if lists["location"] else {},
+                "manufacturer": lists["manufacturer"][0] if lists["manufacturer"] else {},
                 "operations": operation_list,
                 "operation_stats": operation_stats
             },
             "pagination": {
-                "total": int(total_operations),
+                "total": total_operations,
                 "page": int(page),
                 "page_size": int(page_size),
-                "total_pages": int(total_pages)
+                "total_pages": int((total_operations + page_size - 1) // page_size)
             }
         }
 
+        # 处理多记录警告提示
+        warnings = [f"该库存关联{len(lists[table])}个{label}记录，请确认数据是否正常"
+                    for table, label in DETAIL_WARNING_LABELS.items() if len(lists[table]) > 1]
         if warnings:
-            response_data["warnings"] = warnings
-
-        # ========== 【新增】打印最终返回给前端的数据（关键） ==========
-        print("\n【最终返回前端数据】")
-        print(f"1. 库存基本信息：{inventory_dict}")
-        print(f"2. 操作记录总数：{total_operations}")
-        print(f"3. 分页后返回的操作记录数：{len(operation_list)}")
-        print(f"4. 操作记录示例（前3条）：")
-        for idx, op in enumerate(operation_list[:3]):
-            print(
-                f"   第{idx + 1}条：操作类型={op.get('操作类型', '无')} | 操作时间={op.get('操作时间', '空')} | 操作数量={op.get('操作数量', 0)}")
-        print(f"5. 最后操作时间：{last_operation_time}")
-        print("=" * 50 + "\n")
+            detail["warnings"] = warnings
+        details[inventory_id] = detail
+    return details
 
-        return response_data, 200
+
+def get_inventory_detail(inventory_id, page=1, page_size=50):
+    """查询库存详情 - 统一计算入库/出库/借/还后的库存数量（按主键/外键索引直接定位目标行）"""
+    try:
+        csv_data, index = _load_detail_snapshot()
+        inventory_df = csv_data.get("inventory", pd.DataFrame())
+
+        # 校验库存ID是否存在
+        if inventory_df.empty or "库存ID" not in inventory_df.columns:
+            return {"status": "error", "message": "库存数据表格结构异常"}, 500
+
+        page, page_size = _normalize_detail_page(page, page_size)
+        detail = _build_inventory_details(csv_data, index, [inventory_id], page, page_size).get(inventory_id)
+        if detail is None:
+            return {"status": "error", "message": f"未找到ID为{inventory_id}的库存记录"}, 404
+
+        return {"status": "success", **detail}, 200
 
     except IndexError as e:
         error_trace = traceback.format_exc()
@@ -438,319 +362,499 @@ def get_inventory_detail(inventory_id, page=1, page_size=50):
         return {"status": "error", "message": f"系统异常：{str(e)}"}, 500
 
 
-def edit_inventory(inventory_id, edit_data):
+def batch_get_inventory_detail(data):
     """
-    编辑库存功能（最终修复版：编辑后不再写入操作记录表）
-    核心修复：
-    1. ID=0合法校验（仅拦截None/空字符串）
-    2. feature_id=0时正常更新feature表
-    3. 特征字段对比兼容original_feature为空的场景
-    4. 移除操作记录表的写入逻辑，仅保留变更日志用于接口响应
+    批量查询库存详情（多选场景一次请求）：所有库存基于同一数据快照和同一份索引组装
+    请求格式：{"inventory_ids": [1, 2, ...], "include_operations": false, "page": 1, "page_size": 50}
+    include_operations为false时只返回操作统计，不返回操作记录列表
     """
     try:
         start_time = time.time()
-        current_time = datetime.now()
-        print(f"\n=== 库存编辑请求开始 | 时间: {current_time} | 库存ID: {inventory_id} ===", flush=True)
+        if not isinstance(data, dict):
+            return {"status": "error", "message": "请求数据格式错误"}, 400
+
+        inventory_ids = data.get("inventory_ids")
+        if not isinstance(inventory_ids, list) or len(inventory_ids) == 0:
+            return {"status": "error", "message": "inventory_ids必须为非空列表"}, 400
+        if len(inventory_ids) > MAX_BATCH_DETAIL_SIZE:
+            return {"status": "error", "message": f"单次最多查询{MAX_BATCH_DETAIL_SIZE}条库存详情"}, 400
+
+        # 校验ID并去重（保持请求顺序）
+        valid_ids = []
+        for inv_id in inventory_ids:
+            try:
+                inv_id = int(inv_id)
+            except (ValueError, TypeError):
+                return {"status": "error", "message": f"无效的库存ID: {inv_id}"}, 400
+            if inv_id not in valid_ids:
+                valid_ids.append(inv_id)
 
-        # 打印接收到的编辑数据（排查日志）
-        print(f"[库存ID:{inventory_id}] 接收到的编辑参数：{edit_data}", flush=True)
+        try:
+            page, page_size = _normalize_detail_page(data.get("page", 1), data.get("page_size", 50))
+        except (ValueError, TypeError):
+            return {"status": "error", "message": "page和page_size必须为整数"}, 400
+        include_operations = bool(data.get("include_operations", False))
 
-        # 1. 基础参数校验（核心修复：ID=0合法，仅拦截None/空字符串）
-        if inventory_id is None or (isinstance(inventory_id, str) and inventory_id.strip() == ""):
-            print(f"[错误] 库存编辑：库存ID无效 - 为空或None", flush=True)
-            return {"status": "error", "message": "库存ID不能为空"}, 400
+        csv_data, index = _load_detail_snapshot()
+        inventory_df = csv_data.get("inventory", pd.DataFrame())
+        if inventory_df.empty or "库存ID" not in inventory_df.columns:
+            return {"status": "error", "message": "库存数据表格结构异常"}, 500
 
-        if not isinstance(inventory_id, (int, str)):
-            print(f"[错误] 库存编辑：库存ID类型错误 - 类型：{type(inventory_id)}，值：{inventory_id}", flush=True)
-            return {"status": "error", "message": "库存ID必须为数字或字符串类型"}, 400
+        found = _build_inventory_details(csv_data, index, valid_ids, page, page_size, include_operations)
+        details = {str(inv_id): found[inv_id] for inv_id in valid_ids if inv_id in found}
+        not_found = [inv_id for inv_id in valid_ids if inv_id not in found]
 
-        # 强制转换为int（支持"0"转0，保留0的合法性）
-        try:
-            inventory_id = int(inventory_id)
-        except (ValueError, TypeError):
-            print(f"[错误] 库存编辑：库存ID无法转换为数字 - {inventory_id}", flush=True)
-            return {"status": "error", "message": "库存ID必须为数字"}, 400
+        return {
+            "status": "success",
+            "data": details,
+            "not_found": not_found,
+            "total": len(details),
+            "performance": {
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
 
-        # 校验edit_data
-        if not edit_data or not isinstance(edit_data, dict):
-            print(f"[错误] 库存编辑：编辑数据为空或格式错误 - 类型：{type(edit_data)}", flush=True)
-            return {"status": "error", "message": "编辑数据不能为空且必须为JSON格式"}, 400
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        print(f"【异常】批量获取库存详情异常: {str(e)}\n完整堆栈：{error_trace}")
+        return {"status": "error", "message": f"系统异常：{str(e)}"}, 500
 
-        # 2. 读取CSV数据
-        csv_data = read_csv_data()
-        inventory_df = csv_data.get("inventory", pd.DataFrame())
-        feature_df = csv_data.get("feature", pd.DataFrame())
-        product_df = csv_data.get("product", pd.DataFrame())
-        location_df = csv_data.get("location", pd.DataFrame())
-        manufacturer_df = csv_data.get("manufacturer", pd.DataFrame())
-        # 不再处理operation_df，仅读取不修改
 
-        # 确保feature表有图片路径字段（无则初始化）
-        if "图片路径" not in feature_df.columns:
-            feature_df["图片路径"] = ""
+# 编辑涉及的各表字段（用于判断哪些共享记录被修改，需递增引用它们的库存版本号）
+EDIT_FEATURE_FIELDS = ["单价", "重量", "规格", "材质", "颜色", "形状", "风格", "图片路径"]
+EDIT_PRODUCT_FIELDS = ["货号", "类型", "用途", "备注"]
+EDIT_LOCATION_FIELDS = ["地址类型", "楼层", "架号", "框号", "包号"]
+EDIT_MANUFACTURER_FIELDS = ["厂家", "厂家地址", "电话"]
+EDIT_INVENTORY_FIELDS = ["批次", "状态", "次品数量"]
+# 编辑涉及的表 -> 主键列
+EDIT_TABLES = {
+    "inventory": "库存ID",
+    "feature": "商品特征ID",
+    "product": "商品ID",
+    "location": "地址ID",
+    "manufacturer": "厂家ID",
+}
 
-        # 3. 校验库存记录是否存在（支持ID=0）
-        if inventory_df.empty or "库存ID" not in inventory_df.columns:
-            print(f"[错误] 库存编辑：库存数据表结构异常", flush=True)
-            return {"status": "error", "message": "库存数据表格结构异常"}, 500
 
-        inventory_df["库存ID"] = pd.to_numeric(inventory_df["库存ID"], errors="coerce").fillna(-1).astype(int)
-        target_inventory_idx = inventory_df[inventory_df["库存ID"] == inventory_id].index
-        if target_inventory_idx.empty:
-            print(f"[错误] 库存编辑：未找到ID为{inventory_id}的库存记录", flush=True)
-            return {"status": "error", "message": f"未找到ID为{inventory_id}的库存记录"}, 404
-        target_inventory_idx = target_inventory_idx[0]
-
-        # 4. 提取原始记录
-        original_inventory = inventory_df.iloc[target_inventory_idx].copy()
-        original_feature = {}
-        original_product = {}
-        original_location = {}
-        original_manufacturer = {}
-
-        # 5. 提取关联ID（兼容0值）
-        feature_id = original_inventory.get("关联商品特征ID")
-        location_id = original_inventory.get("关联位置ID")
-        manufacturer_id = original_inventory.get("关联厂家ID")
-        product_id = None
-
-        # 6. 数据校验
-        # 楼层校验
-        if "楼层" in edit_data and edit_data["楼层"] is not None and str(edit_data["楼层"]).strip() != "":
-            floor_val = edit_data["楼层"]
-            if not isinstance(floor_val, (int, str)):
-                print(f"[错误] 库存编辑：楼层类型错误 - 类型：{type(floor_val)}，值：{floor_val}", flush=True)
-                return {"status": "error", "message": "楼层必须为数字或数字字符串"}, 400
+def _fields_changed(original, edit_data, fields):
+    """编辑数据是否修改了原记录中的任一字段（按去空格字符串比较）"""
+    return any(field in edit_data and edit_data[field] is not None
+               and str(original.get(field, "")).strip() != str(edit_data[field]).strip() for field in fields)
+
+
+class _EditSession:
+    """
+    一次写事务内的编辑上下文（单条编辑与批量编辑共用）：
+    1. 编辑涉及的表在副本上修改，ID列只统一转换一次；校验不通过或保存失败时不影响缓存数据
+    2. 记录本事务新建的商品/厂家（索引尚未包含），同一批次内同货号/同厂家不重复创建
+    3. 记录需递增版本号的库存，提交前统一递增一次（同一事务内的版本校验都以事务开始时为准）
+    """
+
+    def __init__(self, csv_data):
+        self.csv_data = csv_data
+        self.tables = {}
+        for table, id_column in EDIT_TABLES.items():
+            df = csv_data.get(table, pd.DataFrame()).copy()
+            if id_column in df.columns:
+                df[id_column] = pd.to_numeric(df[id_column], errors="coerce").fillna(-1).astype(int)
+            self.tables[table] = df
+        # 确保feature表有图片路径字段、库存表有版本字段（无则初始化）
+        if "图片路径" not in self.tables["feature"].columns:
+            self.tables["feature"]["图片路径"] = ""
+        if not self.tables["inventory"].empty and "版本" not in self.tables["inventory"].columns:
+            self.tables["inventory"]["版本"] = 0
+        self.new_products = {}  # 货号 -> 商品ID
+        self.new_manufacturers = {}  # (厂家, 厂家地址, 电话) -> 厂家ID
+        self.versioned_ids = set()
+        self.product_ids = set()
+        self.location_ids = set()
+        self.manufacturer_ids = set()
+
+    def row_position(self, inventory_id):
+        """库存ID对应的行标签，不存在时返回None"""
+        labels = self.tables["inventory"].index[self.tables["inventory"]["库存ID"] == inventory_id]
+        return labels[0] if len(labels) > 0 else None
+
+    def bump_versions(self):
+        """递增本事务涉及库存的版本号（每条只递增一次）"""
+        inventory_df = self.tables["inventory"]
+        mask = inventory_df["库存ID"].isin(list(self.versioned_ids))
+        inventory_df.loc[mask, "版本"] = \
+            pd.to_numeric(inventory_df.loc[mask, "版本"], errors="coerce").fillna(0).astype(int) + 1
+
+    def commit(self):
+        """保存编辑后的表（一次写入），返回是否成功"""
+        self.csv_data.update(self.tables)
+        # 商品/地址/厂家信息被多条库存共享，派生索引需按涉及的ID一并更新
+        event = {"type": "edit", "inventory_ids": sorted(self.versioned_ids), "product_ids": sorted(self.product_ids),
+                 "location_ids": sorted(self.location_ids), "manufacturer_ids": sorted(self.manufacturer_ids)}
+        return commit_write(self.csv_data, event)
+
+
+def _apply_inventory_edit(session, inventory_id, edit_data):
+    """
+    在编辑上下文中应用单条编辑（不保存）
+    核心修复：
+    1. ID=0合法校验（仅拦截None/空字符串）
+    2. feature_id=0时正常更新feature表
+    3. 特征字段对比兼容original_feature为空的场景
+    4. 移除操作记录表的写入逻辑，仅保留变更日志用于接口响应
+    所有校验在修改前完成，校验不通过时不修改任何表
+    :return: (结果, 状态码)，成功时结果为 {"inventory_id", "updated_fields", "edit_time", "operator"}
+    """
+    # 打印接收到的编辑数据（排查日志）
+    print(f"[库存ID:{inventory_id}] 接收到的编辑参数：{edit_data}", flush=True)
+
+    # 1. 基础参数校验（核心修复：ID=0合法，仅拦截None/空字符串）
+    if inventory_id is None or (isinstance(inventory_id, str) and inventory_id.strip() == ""):
+        print(f"[错误] 库存编辑：库存ID无效 - 为空或None", flush=True)
+        return {"status": "error", "message": "库存ID不能为空"}, 400
+
+    if not isinstance(inventory_id, (int, str)):
+        print(f"[错误] 库存编辑：库存ID类型错误 - 类型：{type(inventory_id)}，值：{inventory_id}", flush=True)
+        return {"status": "error", "message": "库存ID必须为数字或字符串类型"}, 400
+
+    # 强制转换为int（支持"0"转0，保留0的合法性）
+    try:
+        inventory_id = int(inventory_id)
+    except (ValueError, TypeError):
+        print(f"[错误] 库存编辑：库存ID无法转换为数字 - {inventory_id}", flush=True)
+        return {"status": "error", "message": "库存ID必须为数字"}, 400
+
+    # 校验edit_data
+    if not edit_data or not isinstance(edit_data, dict):
+        print(f"[错误] 库存编辑：编辑数据为空或格式错误 - 类型：{type(edit_data)}", flush=True)
+        return {"status": "error", "message": "编辑数据不能为空且必须为JSON格式"}, 400
+
+    # 2. 编辑涉及的表（副本，ID列已统一为整数）
+    inventory_df = session.tables["inventory"]
+    feature_df = session.tables["feature"]
+    product_df = session.tables["product"]
+    location_df = session.tables["location"]
+    manufacturer_df = session.tables["manufacturer"]
+
+    # 3. 校验库存记录是否存在（支持ID=0）
+    if inventory_df.empty or "库存ID" not in inventory_df.columns:
+        print(f"[错误] 库存编辑：库存数据表结构异常", flush=True)
+        return {"status": "error", "message": "库存数据表格结构异常"}, 500
+
+    target_inventory_idx = session.row_position(inventory_id)
+    if target_inventory_idx is None:
+        print(f"[错误] 库存编辑：未找到ID为{inventory_id}的库存记录", flush=True)
+        return {"status": "error", "message": f"未找到ID为{inventory_id}的库存记录"}, 404
+
+    # 版本号校验（乐观并发）：须与客户端读取时一致
+    expected_version = edit_data.get("版本")
+    if expected_version is None or str(expected_version).strip() == "":
+        print(f"[错误] 库存编辑：缺少版本号 - 库存ID：{inventory_id}", flush=True)
+        return {"status": "error", "message": "缺少版本号（版本），请重新获取库存信息后再编辑"}, 400
+    try:
+        expected_version = int(str(expected_version).strip())
+    except ValueError:
+        return {"status": "error", "message": "版本号必须为整数"}, 400
+    current_version = int(pd.to_numeric(inventory_df.at[target_inventory_idx, "版本"], errors="coerce") or 0)
+    if expected_version != current_version:
+        print(f"[冲突] 库存编辑：库存ID {inventory_id} 版本已变化（提交{expected_version}，当前{current_version}）",
+              flush=True)
+        return {
+            "status": "error",
+            "message": f"库存ID {inventory_id} 已被其他人修改，请刷新后重新编辑",
+            "data": {
+                "inventory_id": inventory_id,
+                "submitted_version": expected_version,
+                "current_version": current_version,
+                "inventory": convert_to_serializable(inventory_df.loc[target_inventory_idx].to_dict())
+            }
+        }, 409
+
+    # 4. 提取原始记录
+    original_inventory = inventory_df.loc[target_inventory_idx].copy()
+    original_feature = {}
+    original_product = {}
+    original_location = {}
+    original_manufacturer = {}
+
+    # 5. 提取关联ID（兼容0值）
+    feature_id = original_inventory.get("关联商品特征ID")
+    location_id = original_inventory.get("关联位置ID")
+    manufacturer_id = original_inventory.get("关联厂家ID")
+    product_id = None
+
+    # 6. 数据校验
+    # 楼层校验
+    if "楼层" in edit_data and edit_data["楼层"] is not None and str(edit_data["楼层"]).strip() != "":
+        floor_val = edit_data["楼层"]
+        if not isinstance(floor_val, (int, str)):
+            print(f"[错误] 库存编辑：楼层类型错误 - 类型：{type(floor_val)}，值：{floor_val}", flush=True)
+            return {"status": "error", "message": "楼层必须为数字或数字字符串"}, 400
+        try:
+            floor = int(floor_val)
+        except ValueError:
+            print(f"[错误] 库存编辑：楼层格式错误 - {floor_val}", flush=True)
+            return {"status": "error", "message": "楼层必须为数字"}, 400
+        if floor not in FLOORS:
+            print(f"[错误] 库存编辑：楼层无效 - {floor}", flush=True)
+            return {"status": "error", "message": f"楼层无效，可选楼层：{', '.join(map(str, FLOORS))}"}, 400
+
+    # 地址类型校验
+    if "地址类型" in edit_data and edit_data["地址类型"] and str(edit_data["地址类型"]).strip() != "":
+        try:
+            int(edit_data["地址类型"])
+        except (ValueError, TypeError):
+            print(f"[错误] 库存编辑：地址类型格式错误 - {edit_data['地址类型']}", flush=True)
+            return {"status": "error", "message": "地址类型必须为数字"}, 400
+
+    # 类型校验
+    product_type = str(edit_data.get("类型", "")).strip()
+    if product_type != "" and product_type not in PRODUCT_TYPES:
+        print(f"[错误] 库存编辑：类型无效 - {product_type}", flush=True)
+        return {"status": "error", "message": f"类型无效，可选类型：{', '.join(PRODUCT_TYPES)}"}, 400
+
+    # 库存基础信息格式校验（修改任何表之前完成）
+    inventory_updates = {}
+    for field in EDIT_INVENTORY_FIELDS:
+        if field in edit_data and edit_data[field] is not None:
             try:
-                floor = int(floor_val)
-            except ValueError:
-                print(f"[错误] 库存编辑：楼层格式错误 - {floor_val}", flush=True)
-                return {"status": "error", "message": "楼层必须为数字"}, 400
-            if floor not in FLOORS:
-                print(f"[错误] 库存编辑：楼层无效 - {floor}", flush=True)
-                return {"status": "error", "message": f"楼层无效，可选楼层：{', '.join(map(str, FLOORS))}"}, 400
-
-        # 类型校验
-        product_type = str(edit_data.get("类型", "")).strip()
-        if product_type != "" and product_type not in PRODUCT_TYPES:
-            print(f"[错误] 库存编辑：类型无效 - {product_type}", flush=True)
-            return {"status": "error", "message": f"类型无效，可选类型：{', '.join(PRODUCT_TYPES)}"}, 400
-
-        # 7. 更新商品信息（核心修复：feature_id=0时正常处理）
-        product_code = str(edit_data.get("货号", "")).strip()
-
-        # 兼容feature_id=0的场景
-        if feature_id is not None and feature_id != "":
-            feature_df["商品特征ID"] = pd.to_numeric(feature_df["商品特征ID"], errors="coerce").fillna(-1).astype(int)
+                if field == "批次":
+                    inventory_updates[field] = int(edit_data[field])
+                elif field == "次品数量":
+                    inventory_updates[field] = float(edit_data[field])
+                else:
+                    inventory_updates[field] = str(edit_data[field]).strip()
+            except (ValueError, TypeError) as e:
+                print(f"[错误] 库存编辑：{field}格式错误 - {edit_data[field]} | 异常：{e}", flush=True)
+                return {"status": "error", "message": f"{field}格式错误，请检查"}, 400
+
+    # 7. 更新商品信息（核心修复：feature_id=0时正常处理）
+    product_code = str(edit_data.get("货号", "")).strip()
+
+    # 兼容feature_id=0的场景
+    if feature_id is not None and feature_id != "":
+        target_feature = feature_df[feature_df["商品特征ID"] == feature_id]
+
+        # 无对应feature记录时自动创建（适配首次上传图片）
+        if target_feature.empty:
+            print(f"[特征ID:{feature_id}] 无现有记录，自动创建新特征记录", flush=True)
+            new_feature = {
+                "商品特征ID": feature_id,
+                "关联商品ID": "",
+                "单价": "",
+                "重量": "",
+                "规格": "",
+                "材质": "",
+                "颜色": "",
+                "形状": "",
+                "风格": "",
+                "图片路径": ""
+            }
+            feature_df = pd.concat([feature_df, pd.DataFrame([new_feature])], ignore_index=True)
             target_feature = feature_df[feature_df["商品特征ID"] == feature_id]
 
-            # 无对应feature记录时自动创建（适配首次上传图片）
-            if target_feature.empty:
-                print(f"[特征ID:{feature_id}] 无现有记录，自动创建新特征记录", flush=True)
-                new_feature = {
-                    "商品特征ID": feature_id,
-                    "关联商品ID": "",
-                    "单价": "",
-                    "重量": "",
-                    "规格": "",
-                    "材质": "",
-                    "颜色": "",
-                    "形状": "",
-                    "风格": "",
-                    "图片路径": ""
-                }
-                feature_df = pd.concat([feature_df, pd.DataFrame([new_feature])], ignore_index=True)
-                target_feature = feature_df[feature_df["商品特征ID"] == feature_id]
-
-            # 提取原始特征记录
-            original_feature = target_feature.iloc[0].to_dict()
-            product_id = target_feature.iloc[0].get("关联商品ID")
-
-            # 更新feature表字段（包含图片路径）
-            feature_update_fields = ["单价", "重量", "规格", "材质", "颜色", "形状", "风格", "图片路径"]
-            for field in feature_update_fields:
+        # 提取原始特征记录
+        original_feature = target_feature.iloc[0].to_dict()
+        product_id = target_feature.iloc[0].get("关联商品ID")
+
+        # 更新feature表字段（包含图片路径）
+        for field in EDIT_FEATURE_FIELDS:
+            if field in edit_data and edit_data[field] is not None:
+                feature_df.loc[feature_df["商品特征ID"] == feature_id, field] = str(edit_data[field]).strip()
+                print(f"[特征ID:{feature_id}] 更新{field}：{original_feature.get(field, '')} → {edit_data[field]}",
+                      flush=True)
+
+    # 更新商品基础信息
+    if product_id:
+        target_product = product_df[product_df["商品ID"] == product_id]
+        if not target_product.empty:
+            original_product = target_product.iloc[0].to_dict()
+            for field in EDIT_PRODUCT_FIELDS:
                 if field in edit_data and edit_data[field] is not None:
-                    feature_df.loc[feature_df["商品特征ID"] == feature_id, field] = str(edit_data[field]).strip()
-                    print(f"[特征ID:{feature_id}] 更新{field}：{original_feature.get(field, '')} → {edit_data[field]}",
-                          flush=True)
-
-        # 更新商品基础信息
-        if product_id:
-            product_df["商品ID"] = pd.to_numeric(product_df["商品ID"], errors="coerce").fillna(-1).astype(int)
-            target_product = product_df[product_df["商品ID"] == product_id]
-            if not target_product.empty:
-                original_product = target_product.iloc[0].to_dict()
-                product_update_fields = ["货号", "类型", "用途", "备注"]
-                for field in product_update_fields:
-                    if field in edit_data and edit_data[field] is not None:
-                        product_df.loc[product_df["商品ID"] == product_id, field] = str(edit_data[field]).strip()
+                    product_df.loc[product_df["商品ID"] == product_id, field] = str(edit_data[field]).strip()
+    else:
+        # 货号为空时创建新商品（本事务已新建的货号直接复用）
+        product_code_to_id = get_lookup_index().product_code_to_id
+
+        if product_code in session.new_products:
+            product_id = session.new_products[product_code]
+        elif product_code in product_code_to_id:
+            product_id = product_code_to_id[product_code]
         else:
-            # 货号为空时创建新商品
-            product_code_to_id = {}
-            if not product_df.empty:
-                for _, row in product_df.iterrows():
-                    code = str(row["货号"]).strip()
-                    if code and code not in product_code_to_id:
-                        product_code_to_id[code] = int(row["商品ID"])
-
-            if product_code in product_code_to_id:
-                product_id = product_code_to_id[product_code]
-            else:
-                product_id = generate_auto_id_df(product_df, "商品ID")
-                new_product = {
-                    "商品ID": product_id,
-                    "货号": product_code,
-                    "类型": product_type,
-                    "备注": edit_data.get("备注", ""),
-                    "用途": edit_data.get("用途", "")
-                }
-                product_df = pd.concat([product_df, pd.DataFrame([new_product])], ignore_index=True)
-
-            # 关联商品ID到feature表（兼容feature_id=0）
-            if feature_id is not None and feature_id != "":
-                feature_df.loc[feature_df["商品特征ID"] == feature_id, "关联商品ID"] = product_id
-
-        # 8. 更新地址信息（兼容0值）
-        if location_id is not None and location_id != "":
-            location_df["地址ID"] = pd.to_numeric(location_df["地址ID"], errors="coerce").fillna(-1).astype(int)
-            target_location = location_df[location_df["地址ID"] == location_id]
-            if not target_location.empty:
-                original_location = target_location.iloc[0].to_dict()
-                location_update_fields = ["地址类型", "楼层", "架号", "框号", "包号"]
-                for field in location_update_fields:
-                    if field in edit_data and edit_data[field] is not None:
-                        val = edit_data[field]
-                        if field in ["地址类型", "楼层"]:
-                            val = int(val) if val and str(val).strip() != "" else ""
-                        else:
-                            val = str(val).strip()
-                        location_df.loc[location_df["地址ID"] == location_id, field] = val
-
-        # 9. 更新厂家信息（兼容0值）
-        if manufacturer_id is not None and manufacturer_id != "":
-            manufacturer_df["厂家ID"] = pd.to_numeric(manufacturer_df["厂家ID"], errors="coerce").fillna(-1).astype(int)
-            target_manufacturer = manufacturer_df[manufacturer_df["厂家ID"] == manufacturer_id]
-            if not target_manufacturer.empty:
-                original_manufacturer = target_manufacturer.iloc[0].to_dict()
-                manufacturer_update_fields = ["厂家", "厂家地址", "电话"]
-                for field in manufacturer_update_fields:
-                    if field in edit_data and edit_data[field] is not None:
-                        manufacturer_df.loc[manufacturer_df["厂家ID"] == manufacturer_id, field] = str(
-                            edit_data[field]).strip()
-        elif "厂家" in edit_data and edit_data["厂家"]:
-            factory_name = str(edit_data.get("厂家", "")).strip()
-            factory_address = str(edit_data.get("厂家地址", "")).strip()
-            factory_phone = str(edit_data.get("电话", "")).strip()
-
-            manufacturer_key = f"{factory_name if factory_name else '###EMPTY###'}|{factory_address if factory_address else '###EMPTY###'}|{factory_phone if factory_phone else '###EMPTY###'}"
-            manufacturer_lookup = {}
-            if not manufacturer_df.empty:
-                for _, row in manufacturer_df.iterrows():
-                    key = f"{str(row.get('厂家', '')).strip() if pd.notna(row.get('厂家')) else '###EMPTY###'}|{str(row.get('厂家地址', '')).strip() if pd.notna(row.get('厂家地址')) else '###EMPTY###'}|{str(row.get('电话', '')).strip() if pd.notna(row.get('电话')) else '###EMPTY###'}"
-                    manufacturer_lookup[key] = int(row["厂家ID"])
-
-            if manufacturer_key in manufacturer_lookup:
-                manufacturer_id = manufacturer_lookup[manufacturer_key]
-            else:
-                manufacturer_id = generate_auto_id_df(manufacturer_df, "厂家ID")
-                new_manufacturer = {
-                    "厂家ID": manufacturer_id,
-                    "厂家": factory_name,
-                    "厂家地址": factory_address,
-                    "电话": factory_phone
-                }
-                manufacturer_df = pd.concat([manufacturer_df, pd.DataFrame([new_manufacturer])], ignore_index=True)
-
-            inventory_df.loc[target_inventory_idx, "关联厂家ID"] = manufacturer_id
-
-        # 10. 更新库存基础信息
-        inventory_update_fields = ["批次", "状态", "次品数量"]
-        for field in inventory_update_fields:
-            if field in edit_data and edit_data[field] is not None:
-                try:
-                    if field == "批次":
-                        val = int(edit_data[field])
-                    elif field == "次品数量":
-                        val = float(edit_data[field])
+            product_id = generate_auto_id_df(product_df, "商品ID")
+            new_product = {
+                "商品ID": product_id,
+                "货号": product_code,
+                "类型": product_type,
+                "备注": edit_data.get("备注", ""),
+                "用途": edit_data.get("用途", "")
+            }
+            product_df = pd.concat([product_df, pd.DataFrame([new_product])], ignore_index=True)
+            session.new_products[product_code] = product_id
+
+        # 关联商品ID到feature表（兼容feature_id=0）
+        if feature_id is not None and feature_id != "":
+            feature_df.loc[feature_df["商品特征ID"] == feature_id, "关联商品ID"] = product_id
+
+    # 8. 更新地址信息（兼容0值）
+    if location_id is not None and location_id != "":
+        target_location = location_df[location_df["地址ID"] == location_id]
+        if not target_location.empty:
+            original_location = target_location.iloc[0].to_dict()
+            for field in EDIT_LOCATION_FIELDS:
+                if field in edit_data and edit_data[field] is not None:
+                    val = edit_data[field]
+                    if field in ["地址类型", "楼层"]:
+                        val = int(val) if val and str(val).strip() != "" else ""
                     else:
-                        val = str(edit_data[field]).strip()
-                    inventory_df.loc[target_inventory_idx, field] = val
-                except (ValueError, TypeError) as e:
-                    print(f"[错误] 库存编辑：{field}格式错误 - {edit_data[field]} | 异常：{e}", flush=True)
-                    return {"status": "error", "message": f"{field}格式错误，请检查"}, 400
-
-        # 11. 生成修改日志（仅用于接口响应，不再写入操作记录表）
-        edit_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        operator = str(edit_data.get("操作人", "系统")).strip()
-
-        change_log = []
-        # 库存字段对比
-        for col in ["批次", "状态", "次品数量"]:
-            if col in edit_data:
-                old_val = original_inventory.get(col, "")
-                new_val = edit_data.get(col, "")
-                if str(old_val).strip() != str(new_val).strip():
-                    change_log.append(f"{col}：{old_val} → {new_val}")
-
-        # 商品字段对比
-        for col in ["货号", "类型", "用途", "备注"]:
-            if col in edit_data:
-                old_val = original_product.get(col, "") if original_product else ""
-                new_val = edit_data.get(col, "")
-                if str(old_val).strip() != str(new_val).strip():
-                    change_log.append(f"商品{col}：{old_val} → {new_val}")
-
-        # 特征字段对比
-        for col in ["单价", "重量", "规格", "材质", "图片路径"]:
-            if col in edit_data:
-                old_val = original_feature.get(col, "") if original_feature else ""
-                new_val = edit_data.get(col, "")
-                if str(old_val).strip() != str(new_val).strip():
-                    change_log.append(f"特征{col}：{old_val} → {new_val}")
-
-        # 地址字段对比
-        for col in ["地址类型", "楼层", "架号", "框号", "包号"]:
-            if col in edit_data:
-                old_val = original_location.get(col, "") if original_location else ""
-                new_val = edit_data.get(col, "")
-                if str(old_val).strip() != str(new_val).strip():
-                    change_log.append(f"地址{col}：{old_val} → {new_val}")
-
-        # 厂家字段对比
-        for col in ["厂家", "厂家地址", "电话"]:
-            if col in edit_data:
-                old_val = original_manufacturer.get(col, "") if original_manufacturer else ""
-                new_val = edit_data.get(col, "")
-                if str(old_val).strip() != str(new_val).strip():
-                    change_log.append(f"厂家{col}：{old_val} → {new_val}")
-
-        change_note = "；".join(change_log) if change_log else "未修改具体字段"
-        print(f"[库存ID:{inventory_id}] 生成的变更日志：{change_log}", flush=True)
-
-        # 12. 保存数据（不再更新操作记录表）
-        csv_data.update({
-            "inventory": inventory_df,
-            "feature": feature_df,
-            "product": product_df,
-            "location": location_df,
-            "manufacturer": manufacturer_df
-            # 移除操作记录的更新，编辑操作不再写入操作记录表
-        })
-
-        if not write_csv_data(csv_data):
-            print(f"[错误] 库存编辑：数据保存失败", flush=True)
-            return {"status": "error", "message": "数据保存失败"}, 500
+                        val = str(val).strip()
+                    location_df.loc[location_df["地址ID"] == location_id, field] = val
+
+    # 9. 更新厂家信息（兼容0值）
+    if manufacturer_id is not None and manufacturer_id != "":
+        target_manufacturer = manufacturer_df[manufacturer_df["厂家ID"] == manufacturer_id]
+        if not target_manufacturer.empty:
+            original_manufacturer = target_manufacturer.iloc[0].to_dict()
+            for field in EDIT_MANUFACTURER_FIELDS:
+                if field in edit_data and edit_data[field] is not None:
+                    manufacturer_df.loc[manufacturer_df["厂家ID"] == manufacturer_id, field] = str(
+                        edit_data[field]).strip()
+    elif "厂家" in edit_data and edit_data["厂家"]:
+        factory_name = str(edit_data.get("厂家", "")).strip()
+        factory_address = str(edit_data.get("厂家地址", "")).strip()
+        factory_phone = str(edit_data.get("电话", "")).strip()
+        factory_key = (factory_name, factory_address, factory_phone)
+
+        manufacturer_id = session.new_manufacturers.get(factory_key)
+        if manufacturer_id is None:
+            manufacturer_id = get_manufacturer_index().find(factory_name, factory_address, factory_phone)
+        if manufacturer_id is None:
+            manufacturer_id = generate_auto_id_df(manufacturer_df, "厂家ID")
+            new_manufacturer = {
+                "厂家ID": manufacturer_id,
+                "厂家": factory_name,
+                "厂家地址": factory_address,
+                "电话": factory_phone
+            }
+            manufacturer_df = pd.concat([manufacturer_df, pd.DataFrame([new_manufacturer])], ignore_index=True)
+            session.new_manufacturers[factory_key] = manufacturer_id
+
+        inventory_df.loc[target_inventory_idx, "关联厂家ID"] = manufacturer_id
+
+    # 10. 更新库存基础信息（已在修改前校验格式）
+    for field, val in inventory_updates.items():
+        inventory_df.loc[target_inventory_idx, field] = val
+
+    # 新建记录后表对象已替换，写回编辑上下文
+    session.tables.update({"feature": feature_df, "product": product_df, "manufacturer": manufacturer_df})
+
+    # 记录需递增版本号的库存：本库存，以及引用了被修改的特征/商品/地址/厂家记录的其他库存（其详情随之变化）
+    version_mask = inventory_df["库存ID"] == inventory_id
+    if original_feature and _fields_changed(original_feature, edit_data, EDIT_FEATURE_FIELDS):
+        version_mask |= inventory_df["关联商品特征ID"] == feature_id
+    if original_product and _fields_changed(original_product, edit_data, EDIT_PRODUCT_FIELDS):
+        product_feature_ids = feature_df.loc[pd.to_numeric(feature_df["关联商品ID"], errors="coerce") == product_id,
+                                             "商品特征ID"]
+        version_mask |= inventory_df["关联商品特征ID"].isin(product_feature_ids.tolist())
+    if original_location and _fields_changed(original_location, edit_data, EDIT_LOCATION_FIELDS):
+        version_mask |= inventory_df["关联位置ID"] == location_id
+    if original_manufacturer and _fields_changed(original_manufacturer, edit_data, EDIT_MANUFACTURER_FIELDS):
+        version_mask |= inventory_df["关联厂家ID"] == manufacturer_id
+    session.versioned_ids.update(inventory_df.loc[version_mask, "库存ID"].astype(int).tolist())
+
+    # 派生索引需按涉及的商品/地址/厂家ID更新
+    edited_product_id = pd.to_numeric(product_id, errors="coerce")
+    if pd.notna(edited_product_id):
+        session.product_ids.add(int(edited_product_id))
+    edited_location_id = pd.to_numeric(location_id, errors="coerce")
+    if pd.notna(edited_location_id) and any(f in edit_data for f in EDIT_LOCATION_FIELDS):
+        session.location_ids.add(int(edited_location_id))
+    edited_manufacturer_id = pd.to_numeric(manufacturer_id, errors="coerce")
+    if pd.notna(edited_manufacturer_id) and any(f in edit_data for f in EDIT_MANUFACTURER_FIELDS):
+        session.manufacturer_ids.add(int(edited_manufacturer_id))
+
+    # 11. 生成修改日志（仅用于接口响应，不再写入操作记录表）
+    edit_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    operator = str(edit_data.get("操作人", "系统")).strip()
+
+    change_log = []
+    # 库存字段对比
+    for col in EDIT_INVENTORY_FIELDS:
+        if col in edit_data:
+            old_val = original_inventory.get(col, "")
+            new_val = edit_data.get(col, "")
+            if str(old_val).strip() != str(new_val).strip():
+                change_log.append(f"{col}：{old_val} → {new_val}")
+
+    # 商品字段对比
+    for col in EDIT_PRODUCT_FIELDS:
+        if col in edit_data:
+            old_val = original_product.get(col, "") if original_product else ""
+            new_val = edit_data.get(col, "")
+            if str(old_val).strip() != str(new_val).strip():
+                change_log.append(f"商品{col}：{old_val} → {new_val}")
+
+    # 特征字段对比
+    for col in ["单价", "重量", "规格", "材质", "图片路径"]:
+        if col in edit_data:
+            old_val = original_feature.get(col, "") if original_feature else ""
+            new_val = edit_data.get(col, "")
+            if str(old_val).strip() != str(new_val).strip():
+                change_log.append(f"特征{col}：{old_val} → {new_val}")
+
+    # 地址字段对比
+    for col in EDIT_LOCATION_FIELDS:
+        if col in edit_data:
+            old_val = original_location.get(col, "") if original_location else ""
+            new_val = edit_data.get(col, "")
+            if str(old_val).strip() != str(new_val).strip():
+                change_log.append(f"地址{col}：{old_val} → {new_val}")
+
+    # 厂家字段对比
+    for col in EDIT_MANUFACTURER_FIELDS:
+        if col in edit_data:
+            old_val = original_manufacturer.get(col, "") if original_manufacturer else ""
+            new_val = edit_data.get(col, "")
+            if str(old_val).strip() != str(new_val).strip():
+                change_log.append(f"厂家{col}：{old_val} → {new_val}")
+
+    print(f"[库存ID:{inventory_id}] 生成的变更日志：{change_log}", flush=True)
+    return {"inventory_id": inventory_id, "updated_fields": change_log, "edit_time": edit_time,
+            "operator": operator}, 200
+
+
+def edit_inventory(inventory_id, edit_data):
+    """
+    编辑库存（乐观并发）：请求须携带读取详情/列表时的库存版本号（版本），
+    在写事务内基于最新数据校验，版本不一致（期间被其他编辑修改过）返回409；
+    写事务只覆盖校验、修改和保存，编辑表单打开期间不加锁（编辑后不再写入操作记录表）
+    """
+    try:
+        start_time = time.time()
+        current_time = datetime.now()
+        print(f"\n=== 库存编辑请求开始 | 时间: {current_time} | 库存ID: {inventory_id} ===", flush=True)
+
+        with write_transaction():
+            session = _EditSession(read_csv_data())
+            result, status_code = _apply_inventory_edit(session, inventory_id, edit_data)
+            if status_code != 200:
+                return result, status_code
+
+            # 12. 递增版本号并保存数据（不再更新操作记录表）
+            session.bump_versions()
+            if not session.commit():
+                print(f"[错误] 库存编辑：数据保存失败", flush=True)
+                return {"status": "error", "message": "数据保存失败"}, 500
 
         # 13. 组装响应
-        updated_inventory = inventory_df.iloc[target_inventory_idx].to_dict()
+        inventory_id = result["inventory_id"]
+        updated_inventory = session.tables["inventory"].loc[session.row_position(inventory_id)].to_dict()
         response_data = {
             "status": "success",
             "message": f"库存ID {inventory_id} 编辑成功",
             "data": {
                 "inventory_id": inventory_id,
-                "updated_fields": change_log,
-                "edit_time": edit_time,
-                "operator": operator,
+                "version": int(updated_inventory["版本"]),
+                "updated_fields": result["updated_fields"],
+                "edit_time": result["edit_time"],
+                "operator": result["operator"],
                 "inventory": convert_to_serializable(updated_inventory)
             },
             "performance": {
@@ -776,195 +880,198 @@ def edit_inventory(inventory_id, edit_data):
         traceback.print_exc()
         return {"status": "error", "message": f"系统异常：{str(e)}"}, 500
 
+
+def bulk_edit_inventory(data):
+    """
+    批量编辑库存（一次写事务、一次保存）：
+    1. edits: [{库存ID, 版本, ...编辑字段}]，逐条按单条编辑的规则校验，版本号均与事务开始时比较
+    2. 或 filter + patch：在事务内按分面条件（类型/楼层/材质/颜色/厂家）选出库存，对每条应用同一patch（取当前版本号）
+    3. atomic为true时任一条不通过则全部不保存；否则保存通过校验的条目
+    同一库存在一次批量编辑中只递增一次版本号；逐条返回结果
+    """
+    try:
+        start_time = time.time()
+        if not isinstance(data, dict):
+            return {"status": "error", "message": "请求体必须为JSON对象"}, 400
+        edits = data.get("edits")
+        filters = data.get("filter")
+        patch = data.get("patch")
+        atomic = bool(data.get("atomic", False))
+        if (edits is None) == (filters is None):
+            return {"status": "error", "message": "请提供edits（逐条编辑）或filter+patch（按条件批量修改）其中之一"}, 400
+
+        if edits is not None:
+            if not isinstance(edits, list) or not edits:
+                return {"status": "error", "message": "edits必须为非空列表"}, 400
+            if len(edits) > MAX_BULK_EDIT_SIZE:
+                return {"status": "error", "message": f"单次最多编辑{MAX_BULK_EDIT_SIZE}条库存"}, 400
+        else:
+            if not isinstance(filters, dict) or not any(filters.values()):
+                return {"status": "error", "message": "filter必须为非空对象，如 {\"类型\": [\"样品\"]}"}, 400
+            unknown = [field for field in filters if field not in FACET_FIELDS]
+            if unknown:
+                return {"status": "error",
+                        "message": f"不支持的筛选字段: {', '.join(unknown)}，可选值：{', '.join(FACET_FIELDS)}"}, 400
+            if not isinstance(patch, dict) or not patch:
+                return {"status": "error", "message": "patch必须为非空对象"}, 400
+            patch = {field: value for field, value in patch.items() if field not in ("库存ID", "版本")}
+
+        print(f"\n=== 批量编辑请求开始 | 时间: {datetime.now()} ===", flush=True)
+        with write_transaction():
+            csv_data = read_csv_data()
+            if edits is None:
+                # 分面索引与锁内读取的数据版本一致，行位置与库存表对应
+                filters = {field: [str(value) for value in (values if isinstance(values, list) else [values])]
+                           for field, values in filters.items() if values}
+                mask = index_manager.get("facets").match_mask(filters)
+                matched = csv_data["inventory"].loc[mask, ["库存ID", "版本"]]
+                if matched.empty:
+                    return {"status": "error", "message": "没有符合筛选条件的库存"}, 404
+                if len(matched) > MAX_BULK_EDIT_SIZE:
+                    return {"status": "error",
+                            "message": f"符合条件的库存有{len(matched)}条，单次最多编辑{MAX_BULK_EDIT_SIZE}条，请缩小筛选范围"}, 400
+                edits = [{**patch, "库存ID": int(inventory_id), "版本": int(version)}
+                         for inventory_id, version in zip(matched["库存ID"], matched["版本"])]
+
+            session = _EditSession(csv_data)
+            results = []
+            seen_ids = set()
+            for edit in edits:
+                inventory_id = edit.get("库存ID") if isinstance(edit, dict) else None
+                try:
+                    inventory_key = int(str(inventory_id).strip())
+                except ValueError:
+                    inventory_key = inventory_id
+                if inventory_key is not None and inventory_key in seen_ids:
+                    result, status_code = {"status": "error", "message": "同一库存在本次批量编辑中重复出现"}, 400
+                else:
+                    seen_ids.add(inventory_key)
+                    result, status_code = _apply_inventory_edit(session, inventory_id, edit)
+                if status_code == 200:
+                    results.append({"库存ID": result["inventory_id"], "status": "success",
+                                    "updated_fields": result["updated_fields"]})
+                else:
+                    results.append({"库存ID": inventory_id, "status": "error", "code": status_code,
+                                    "message": result.get("message"), **({"data": result["data"]} if "data" in result else {})})
+
+            success_count = sum(1 for item in results if item["status"] == "success")
+            error_count = len(results) - success_count
+            if success_count == 0 or (atomic and error_count):
+                return {
+                    "status": "error",
+                    "message": "所有编辑都未通过校验" if success_count == 0 else f"{error_count}条编辑未通过校验，已全部取消（atomic）",
+                    "data": {"success_count": 0, "error_count": error_count, "total_count": len(results),
+                             "results": results}
+                }, 400
+
+            session.bump_versions()
+            if not session.commit():
+                print(f"[错误] 批量编辑：数据保存失败", flush=True)
+                return {"status": "error", "message": "数据保存失败"}, 500
+
+        # 成功条目附上递增后的版本号
+        inventory_df = session.tables["inventory"]
+        versions = dict(zip(inventory_df["库存ID"].tolist(), inventory_df["版本"].tolist()))
+        for item in results:
+            if item["status"] == "success":
+                item["version"] = int(versions[item["库存ID"]])
+
+        total_time = time.time() - start_time
+        print(f"=== 批量编辑请求结束 | 耗时: {total_time:.4f}秒 | 成功{success_count}条/失败{error_count}条 ===", flush=True)
+        return {
+            "status": "success",
+            "message": f"批量编辑完成！成功: {success_count} 条，失败: {error_count} 条",
+            "data": {
+                "success_count": success_count,
+                "error_count": error_count,
+                "total_count": len(results),
+                "versioned_count": len(session.versioned_ids),
+                "results": results
+            },
+            "performance": {
+                "total_time": f"{total_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"批量编辑系统异常: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"系统异常：{str(e)}"}, 500
+
+# 删除库存时一并清理的关联记录：表名 → (库存表关联列, 主键列)
+DELETE_ORPHAN_TABLES = {
+    "feature": ("关联商品特征ID", "商品特征ID"),
+    "location": ("关联位置ID", "地址ID"),
+    "manufacturer": ("关联厂家ID", "厂家ID"),
+}
+# 只有这些类型操作记录的库存允许删除
+DELETABLE_OPERATION_TYPES = {"入库"}
+
+
+def _check_deletable(csv_data, index, inventory_id):
+    """按详情索引校验单条库存能否删除（无操作记录/仅入库记录），返回 (错误信息, 状态码) 或 None"""
+    if len(index.positions("inventory", inventory_id)) == 0:
+        return f"未找到库存ID为 {inventory_id} 的记录", 404
+    positions = index.operations.get(inventory_id, EMPTY_POSITIONS)
+    if len(positions) == 0:
+        return None
+    operation_types = pd.unique(csv_data["operation_record"]["操作类型"].iloc[positions].astype(str).str.strip()).tolist()
+    if any(op_type not in DELETABLE_OPERATION_TYPES for op_type in operation_types):
+        return f"该库存（ID:{inventory_id}）包含非入库操作记录（{operation_types}），无法删除。请先删除相关操作记录。", 400
+    return None
+
+
+def _delete_inventory_rows(csv_data, inventory_ids):
+    """
+    删除库存行并清理孤立的特征/位置/厂家（被删库存引用、剩余库存不再引用的记录），
+    关联ID一次集合差集得出；返回 (写入的数据, 写入事件, 各表删除的ID)
+    """
+    inventory_df = csv_data["inventory"]
+    delete_mask = pd.to_numeric(inventory_df["库存ID"], errors="coerce").isin(inventory_ids)
+    removed, remaining = inventory_df[delete_mask], inventory_df[~delete_mask].reset_index(drop=True)
+
+    data = dict(csv_data)
+    data["inventory"] = remaining
+    orphans = {}
+    for table, (link_column, id_column) in DELETE_ORPHAN_TABLES.items():
+        df = csv_data.get(table, pd.DataFrame())
+        if link_column not in inventory_df.columns or df.empty or id_column not in df.columns:
+            orphans[table] = []
+            continue
+        referenced = pd.to_numeric(removed[link_column], errors="coerce").dropna()
+        still_used = pd.to_numeric(remaining[link_column], errors="coerce").dropna()
+        orphans[table] = sorted(set(referenced[referenced > 0].astype(int)) - set(still_used.astype(int)))
+        if orphans[table]:
+            data[table] = df[~pd.to_numeric(df[id_column], errors="coerce").isin(orphans[table])].reset_index(drop=True)
+
+    event = {"type": "delete", "inventory_ids": list(inventory_ids),
+             "location_ids": orphans["location"], "manufacturer_ids": orphans["manufacturer"]}
+    return data, event, orphans
+
+
 def delete_inventory(inventory_id):
     """删除库存记录（支持删除：无操作记录 / 仅入库记录的库存）"""
     try:
-        # 强制清除缓存，确保读取最新数据
-        invalidate_cache()
-        csv_data = read_csv_data()
-
-        # ------------------- 1. 标准化输入ID -------------------
         try:
             inventory_id = int(inventory_id)
-            if inventory_id < 0:  # 过滤无效ID（负数/0）
+            if inventory_id < 0:  # 过滤无效ID（负数）
                 return {"status": "error", "message": "无效的库存ID（需为正整数）"}, 400
         except (ValueError, TypeError):
             return {"status": "error", "message": "库存ID必须为数字"}, 400
 
-        # ------------------- 2. 校验库存表结构 & 筛选目标库存 -------------------
-        inventory_df = csv_data.get("inventory", pd.DataFrame()).copy()
-        if inventory_df.empty or "库存ID" not in inventory_df.columns:
-            return {"status": "error", "message": "库存数据表格结构异常"}, 500
+        # 写锁内读取，校验与写入基于同一份最新数据
+        with write_transaction():
+            csv_data, index = _load_detail_snapshot()
+            if csv_data.get("inventory", pd.DataFrame()).empty or "库存ID" not in csv_data["inventory"].columns:
+                return {"status": "error", "message": "库存数据表格结构异常"}, 500
+            error = _check_deletable(csv_data, index, inventory_id)
+            if error is not None:
+                return {"status": "error", "message": error[0]}, error[1]
 
-        # 清理库存表无效数据
-        inventory_df = inventory_df.dropna(how='all')  # 删除全空行
-        inventory_df = inventory_df.loc[:, ~inventory_df.columns.str.contains('^Unnamed')]  # 删除索引列
-        inventory_df["库存ID"] = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
-        # 过滤有效库存行（正整数ID）
-        valid_inventory_df = inventory_df[
-            inventory_df["库存ID"].notna() & (inventory_df["库存ID"] >= 0)
-            ].astype({"库存ID": int})
-
-        # 检查目标库存是否存在
-        mask = valid_inventory_df["库存ID"] == inventory_id
-        if not mask.any():
-            return {"status": "error", "message": f"未找到库存ID为 {inventory_id} 的记录"}, 404
-
-        # ------------------- 3. 核心逻辑：判断操作记录是否允许删除 -------------------
-        operation_df = csv_data.get("operation_record", pd.DataFrame()).copy()
-        # 初始化：默认允许删除（无操作记录/仅入库记录）
-        allow_delete = True
-        error_msg = ""
-
-        if not operation_df.empty and "关联库存ID" in operation_df.columns:
-            # 清理操作记录无效数据
-            operation_df = operation_df.dropna(how='all')
-            operation_df = operation_df.loc[:, ~operation_df.columns.str.contains('^Unnamed')]
-            # 标准化关联库存ID
-            operation_df["关联库存ID"] = pd.to_numeric(operation_df["关联库存ID"], errors="coerce")
-            # 筛选关联当前库存的有效操作记录（正整数ID）
-            valid_operation_df = operation_df[
-                (operation_df["关联库存ID"].notna()) &
-                (operation_df["关联库存ID"] > 0) &
-                (operation_df["关联库存ID"] == inventory_id)
-                ].astype({"关联库存ID": int})
-
-            if not valid_operation_df.empty:
-                # 标准化操作类型（去空格、转中文，避免格式问题）
-                valid_operation_df["操作类型"] = valid_operation_df["操作类型"].astype(str).str.strip()
-                # 获取所有唯一的操作类型
-                operation_types = valid_operation_df["操作类型"].unique().tolist()
-                # 定义允许删除的操作类型（仅入库）
-                allowed_op_types = ["入库"]
-
-                # 检查是否包含非入库记录
-                has_non_inbound = any(op_type not in allowed_op_types for op_type in operation_types)
-                if has_non_inbound:
-                    allow_delete = False
-                    error_msg = f"该库存（ID:{inventory_id}）包含非入库操作记录（{operation_types}），无法删除。请先删除相关操作记录。"
-                else:
-                    # 仅入库记录 → 允许删除，打印日志
-                    print(f"✅ 库存ID {inventory_id} 仅包含入库记录（共{len(valid_operation_df)}条），允许删除")
-
-        # 若不允许删除，返回错误
-        if not allow_delete:
-            return {"status": "error", "message": error_msg}, 400
-
-        # ------------------- 4. 处理关联ID & 删除库存记录 -------------------
-        # 获取原库存记录的关联ID
-        original_inventory = csv_data.get("inventory", pd.DataFrame())
-        original_inventory["库存ID"] = pd.to_numeric(original_inventory["库存ID"], errors="coerce").fillna(-1).astype(
-            int)
-        original_record = original_inventory[original_inventory["库存ID"] == inventory_id]
-
-        feature_id = location_id = manufacturer_id = None
-        if not original_record.empty:
-            original_record = original_record.iloc[0]
-            # 标准化关联ID（仅保留有效正整数）
-            feature_id = original_record.get("关联商品特征ID")
-            feature_id = int(feature_id) if (
-                        pd.notna(feature_id) and str(feature_id).strip() and int(feature_id) > 0) else None
-
-            location_id = original_record.get("关联位置ID")
-            location_id = int(location_id) if (
-                        pd.notna(location_id) and str(location_id).strip() and int(location_id) > 0) else None
-
-            manufacturer_id = original_record.get("关联厂家ID")
-            manufacturer_id = int(manufacturer_id) if (
-                        pd.notna(manufacturer_id) and str(manufacturer_id).strip() and int(
-                    manufacturer_id) > 0) else None
-
-        # 核心：删除目标库存记录并清理
-        valid_inventory_df = valid_inventory_df[~mask].copy().reset_index(drop=True)
-        # 最终清理空行
-        inventory_df = valid_inventory_df.dropna(how='all').reset_index(drop=True)
-
-        # ------------------- 5. 清理关联的特征/位置/厂家记录（无其他库存使用时） -------------------
-        # 5.1 清理商品特征
-        feature_df = csv_data.get("feature", pd.DataFrame()).copy()
-        if feature_id is not None and not feature_df.empty and "商品特征ID" in feature_df.columns:
-            feature_df = feature_df.dropna(how='all')
-            feature_df["商品特征ID"] = pd.to_numeric(feature_df["商品特征ID"], errors="coerce")
-            feature_df = feature_df[feature_df["商品特征ID"].notna() & (feature_df["商品特征ID"] >= 0)].astype(
-                {"商品特征ID": int})
-
-            # 检查是否有其他库存使用该特征
-            inventory_df["关联商品特征ID"] = pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce").fillna(
-                -1).astype(int)
-            other_usage = inventory_df[inventory_df["关联商品特征ID"] == feature_id].empty
-            if other_usage:
-                feature_df = feature_df[feature_df["商品特征ID"] != feature_id].reset_index(drop=True)
-
-        # 5.2 清理位置
-        location_df = csv_data.get("location", pd.DataFrame()).copy()
-        if location_id is not None and not location_df.empty and "地址ID" in location_df.columns:
-            location_df = location_df.dropna(how='all')
-            location_df["地址ID"] = pd.to_numeric(location_df["地址ID"], errors="coerce")
-            location_df = location_df[location_df["地址ID"].notna() & (location_df["地址ID"] >= 0)].astype(
-                {"地址ID": int})
-
-            inventory_df["关联位置ID"] = pd.to_numeric(inventory_df["关联位置ID"], errors="coerce").fillna(-1).astype(
-                int)
-            other_usage = inventory_df[inventory_df["关联位置ID"] == location_id].empty
-            if other_usage:
-                location_df = location_df[location_df["地址ID"] != location_id].reset_index(drop=True)
-
-        # 5.3 清理厂家
-        manufacturer_df = csv_data.get("manufacturer", pd.DataFrame()).copy()
-        if manufacturer_id is not None and not manufacturer_df.empty and "厂家ID" in manufacturer_df.columns:
-            manufacturer_df = manufacturer_df.dropna(how='all')
-            manufacturer_df["厂家ID"] = pd.to_numeric(manufacturer_df["厂家ID"], errors="coerce")
-            manufacturer_df = manufacturer_df[
-                manufacturer_df["厂家ID"].notna() & (manufacturer_df["厂家ID"] >= 0)].astype({"厂家ID": int})
-
-            inventory_df["关联厂家ID"] = pd.to_numeric(inventory_df["关联厂家ID"], errors="coerce").fillna(-1).astype(
-                int)
-            other_usage = inventory_df[inventory_df["关联厂家ID"] == manufacturer_id].empty
-            if other_usage:
-                manufacturer_df = manufacturer_df[manufacturer_df["厂家ID"] != manufacturer_id].reset_index(drop=True)
-
-        # ------------------- 6. 强制覆盖写入（避免数据残留） -------------------
-        # 更新数据字典
-        csv_data["inventory"] = inventory_df
-        csv_data["feature"] = feature_df
-        csv_data["location"] = location_df
-        csv_data["manufacturer"] = manufacturer_df
-
-        # 自定义强制写入函数（彻底覆盖，无合并）
-        def force_write_csv(data_dict):
-            try:
-                ensure_csv_directory()
-                create_single_backup()  # 写入前备份
-                for table, filepath in CSV_FILES.items():
-                    df = data_dict.get(table, pd.DataFrame())
-                    # 最终清理：空行 + 无效列
-                    df = df.dropna(how='all')
-                    df = df.loc[:, ~df.columns.str.contains('^Unnamed')]
-                    # 原子写入（临时文件→替换）
-                    with tempfile.NamedTemporaryFile(mode='w', delete=False, encoding='utf-8-sig') as temp_f:
-                        df.to_csv(temp_f, index=False, encoding='utf-8-sig')
-                        temp_path = temp_f.name
-                    if os.path.exists(filepath):
-                        os.remove(filepath)
-                    shutil.move(temp_path, filepath)
-                invalidate_cache()
-                return True
-            except Exception as e:
-                print(f"强制写入失败: {e}")
-                restore_from_backup()
-
-                return False
-
-        # 执行写入
-        if not force_write_csv(csv_data):
-            return {"status": "error", "message": "数据保存失败"}, 500
-
-        # ------------------- 7. 最终校验：确认删除成功 -------------------
-        verify_data = read_csv_data()
-        verify_inventory = verify_data.get("inventory", pd.DataFrame())
-        verify_inventory["库存ID"] = pd.to_numeric(verify_inventory["库存ID"], errors="coerce").fillna(-1).astype(int)
-        if inventory_id in verify_inventory["库存ID"].values:
-            return {"status": "error", "message": "删除后校验失败（ID仍存在）"}, 500
+            data, event, _ = _delete_inventory_rows(csv_data, [inventory_id])
+            if not commit_write(data, event, force_override=True):
+                return {"status": "error", "message": "数据保存失败"}, 500
 
         return {
             "status": "success",
@@ -975,4 +1082,87 @@ def delete_inventory(inventory_id):
         print(f"删除库存记录异常: {str(e)}")
         import traceback
         traceback.print_exc()
-        return {"status": "error", "message": f"系统异常: {str(e)}"}, 500
\ No newline at end of file
+        return {"status": "error", "message": f"系统异常: {str(e)}"}, 500
+
+
+def batch_delete_inventory(data):
+    """
+    批量删除库存（一次写事务、一次保存）：
+    1. inventory_ids: [库存ID]，逐条按详情索引校验（存在、无操作记录或仅入库记录）
+    2. 通过校验的库存一并删除，孤立的特征/位置/厂家按集合差集一次算出并删除
+    3. atomic为true时任一条不通过则全部不删除；否则删除通过校验的条目
+    逐条返回结果
+    """
+    try:
+        start_time = time.time()
+        if not isinstance(data, dict):
+            return {"status": "error", "message": "请求体必须为JSON对象"}, 400
+        inventory_ids = data.get("inventory_ids")
+        atomic = bool(data.get("atomic", False))
+        if not isinstance(inventory_ids, list) or not inventory_ids:
+            return {"status": "error", "message": "inventory_ids必须为非空列表"}, 400
+        if len(inventory_ids) > MAX_BATCH_DELETE_SIZE:
+            return {"status": "error", "message": f"单次最多删除{MAX_BATCH_DELETE_SIZE}条库存"}, 400
+
+        print(f"\n=== 批量删除请求开始 | 时间: {datetime.now()} | 条数: {len(inventory_ids)} ===", flush=True)
+        with write_transaction():
+            csv_data, index = _load_detail_snapshot()
+            if csv_data.get("inventory", pd.DataFrame()).empty or "库存ID" not in csv_data["inventory"].columns:
+                return {"status": "error", "message": "库存数据表格结构异常"}, 500
+
+            results = []
+            deletable = []
+            for inventory_id in inventory_ids:
+                try:
+                    inventory_key = int(str(inventory_id).strip())
+                    error = ("无效的库存ID（需为正整数）", 400) if inventory_key < 0 else None
+                except ValueError:
+                    inventory_key, error = None, ("库存ID必须为数字", 400)
+                if error is None and inventory_key in deletable:
+                    error = ("同一库存在本次批量删除中重复出现", 400)
+                if error is None:
+                    error = _check_deletable(csv_data, index, inventory_key)
+                if error is None:
+                    deletable.append(inventory_key)
+                    results.append({"库存ID": inventory_key, "status": "success"})
+                else:
+                    results.append({"库存ID": inventory_id, "status": "error", "code": error[1], "message": error[0]})
+
+            error_count = len(results) - len(deletable)
+            if not deletable or (atomic and error_count):
+                return {
+                    "status": "error",
+                    "message": "所有库存都不能删除" if not deletable else f"{error_count}条库存不能删除，已全部取消（atomic）",
+                    "data": {"success_count": 0, "error_count": error_count, "total_count": len(results),
+                             "results": results}
+                }, 400
+
+            write_data, event, orphans = _delete_inventory_rows(csv_data, deletable)
+            if not commit_write(write_data, event, force_override=True):
+                print(f"[错误] 批量删除：数据保存失败", flush=True)
+                return {"status": "error", "message": "数据保存失败"}, 500
+
+        total_time = time.time() - start_time
+        print(f"=== 批量删除请求结束 | 耗时: {total_time:.4f}秒 | 成功{len(deletable)}条/失败{error_count}条 ===", flush=True)
+        return {
+            "status": "success",
+            "message": f"批量删除完成！成功: {len(deletable)} 条，失败: {error_count} 条",
+            "data": {
+                "success_count": len(deletable),
+                "error_count": error_count,
+                "total_count": len(results),
+                "deleted_feature_ids": orphans["feature"],
+                "deleted_location_ids": orphans["location"],
+                "deleted_manufacturer_ids": orphans["manufacturer"],
+                "results": results
+            },
+            "performance": {
+                "total_time": f"{total_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"批量删除系统异常: {str(e)}", flush=True)
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"系统异常：{str(e)}"}, 500
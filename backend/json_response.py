@@ -0,0 +1,112 @@
+"""
+JSON响应序列化与压缩：
+1. 优先使用orjson序列化（可选依赖，未安装时回退标准库json，均不转义中文）
+2. 按Accept-Encoding协商br/gzip压缩，仅压缩超过阈值的响应（brotli为可选依赖）
+"""
+import gzip
+import json
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+from flask import request
+from flask.json.provider import DefaultJSONProvider
+
+from config import *
+
+try:
+    import orjson
+except ImportError:  # 未安装orjson时回退标准库json
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # 未安装brotli时仅支持gzip
+    brotli = None
+
+# 可压缩的响应类型
+COMPRESSIBLE_MIMETYPES = {"application/json", "text/csv", "text/plain", "text/html"}
+
+
+def _json_default(value):
+    """处理json/orjson无法直接序列化的类型（numpy标量、时间、缺失值等）"""
+    if isinstance(value, np.integer):
+        return int(value)
+    if isinstance(value, np.floating):
+        return float(value)
+    if isinstance(value, np.bool_):
+        return bool(value)
+    if isinstance(value, (pd.Timestamp, datetime)):
+        return "" if pd.isna(value) else value.strftime("%Y-%m-%d %H:%M:%S")
+    if value is pd.NaT or value is pd.NA:
+        return ""
+    return str(value)
+
+
+def encode_json(payload):
+    """将响应对象编码为UTF-8 JSON字节串"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_json_default,
+                            option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+    return json.dumps(payload, ensure_ascii=False, separators=(",", ":"), default=_json_default).encode("utf-8")
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON提供器：jsonify直接输出orjson编码的字节，不排序键、不转义中文"""
+
+    def dumps(self, obj, **kwargs):
+        return encode_json(obj).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        if orjson is not None:
+            return orjson.loads(s)
+        return json.loads(s)
+
+    def response(self, *args, **kwargs):
+        if args and kwargs:
+            raise TypeError("jsonify() behavior undefined when passed both args and kwargs")
+        obj = args[0] if len(args) == 1 else (args or kwargs)
+        return self._app.response_class(encode_json(obj), mimetype=self.mimetype)
+
+
+def negotiate_encoding():
+    """根据Accept-Encoding选择压缩算法（br优先于gzip，遵循q值），无可用算法返回None"""
+    supported = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return request.accept_encodings.best_match(supported)
+
+
+def compress_bytes(body, encoding):
+    """按指定算法压缩字节串"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_COMPRESS_QUALITY)
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_COMPRESS_LEVEL)
+    return body
+
+
+def compress_response(response):
+    """after_request钩子：对超过阈值的文本/JSON响应按协商结果压缩"""
+    if (response.status_code < 200 or response.status_code >= 300
+            or response.direct_passthrough or response.is_streamed
+            or "Content-Encoding" in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+
+    body = response.get_data()
+    if len(body) < COMPRESS_MIN_SIZE:
+        return response
+
+    response.vary.add("Accept-Encoding")
+    encoding = negotiate_encoding()
+    if encoding is None:
+        return response
+
+    start = time.time()
+    compressed = compress_bytes(body, encoding)
+    response.set_data(compressed)
+    response.headers["Content-Encoding"] = encoding
+    if len(body) >= COMPRESS_LOG_MIN_SIZE:
+        print(f"[压缩] {request.path} {encoding}: {len(body)} → {len(compressed)} 字节 "
+              f"({len(compressed) / len(body):.1%})，耗时 {(time.time() - start) * 1000:.1f}ms", flush=True)
+    return response
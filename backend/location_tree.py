@@ -0,0 +1,247 @@
+"""
+库位层级树（楼层 → 架号 → 框号 → 包号）：
+1. 每条库存按关联位置ID计入所在库位，节点统计 库存条数 与 总数量（当前库存，按操作记录汇总，与库存列表一致）
+2. 按库存ID维护 (位置ID, 数量) 明细，入库/出库/借还/编辑后只重算事件涉及的库存和位置
+3. 空层级（如没有架号的框位）直接跳过，子节点通过level字段标明所在层级
+"""
+import time
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from index_manager import index_manager
+
+# 层级顺序：(层级名, 位置表列名)
+LOCATION_LEVELS = [("楼层", "楼层"), ("架号", "架号"), ("框号", "框号"), ("包号", "包号")]
+
+
+def _level_text(value):
+    """层级取值统一为字符串：缺失值为空字符串，整数型数字去掉小数部分（如楼层 3.0 → "3"）"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+
+def current_stock_quantities(inventory_df, operation_df):
+    """
+    各库存的当前库存数量：有操作记录时为 入库-出库-借+还，否则取库存表中的库存数量
+    :return: pd.Series（索引为库存ID）
+    """
+    ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
+    if "库存数量" in inventory_df.columns:
+        stored = pd.Series(pd.to_numeric(inventory_df["库存数量"], errors="coerce").values, index=ids.values)
+    else:
+        stored = pd.Series(np.zeros(len(inventory_df)), index=ids.values)
+    stored = stored.fillna(0.0)
+    if operation_df.empty or "关联库存ID" not in operation_df.columns:
+        return stored
+
+    related = operation_df[pd.to_numeric(operation_df["关联库存ID"], errors="coerce").isin(ids)]
+    if related.empty:
+        return stored
+    signs = related["操作类型"].map({"入库": 1.0, "出库": -1.0, "借": -1.0, "还": 1.0})
+    quantities = pd.to_numeric(related["操作数量"], errors="coerce").fillna(0.0) * signs.fillna(0.0)
+    computed = quantities.groupby(pd.to_numeric(related["关联库存ID"], errors="coerce")).sum()
+    # 与库存列表一致：只要有操作记录（包括只有其他类型的记录）就按操作记录计算
+    has_operations = stored.index.isin(computed.index)
+    stored[has_operations] = computed.reindex(stored.index[has_operations]).values
+    return stored
+
+
+class LocationTree:
+    """库位占用统计：位置ID → 层级路径，库存ID → (位置ID, 数量)，位置ID → [库存条数, 总数量]"""
+
+    def __init__(self):
+        self.paths = {}  # 位置ID -> (楼层, 架号, 框号, 包号)
+        self.items = {}  # 库存ID -> (位置ID, 数量)
+        self.occupancy = {}  # 位置ID -> [库存条数, 总数量]
+        self.capacity = {}  # 楼层 -> {"楼层容量", "楼层剩余容量"}
+        self._rendered = None
+
+    def set_locations(self, location_df):
+        """更新位置路径（全量或部分位置行）"""
+        if location_df.empty or "地址ID" not in location_df.columns:
+            return
+        ids = pd.to_numeric(location_df["地址ID"], errors="coerce")
+        columns = [location_df[column] if column in location_df.columns else pd.Series("", index=location_df.index)
+                   for _, column in LOCATION_LEVELS]
+        for location_id, *levels in zip(ids, *columns):
+            if pd.notna(location_id):
+                self.paths[int(location_id)] = tuple(_level_text(value) for value in levels)
+        self._rendered = None
+
+    def remove_locations(self, location_ids):
+        """移除已删除的位置（其上的库存应已先移除）"""
+        for location_id in location_ids:
+            self.paths.pop(location_id, None)
+            self.occupancy.pop(location_id, None)
+        self._rendered = None
+
+    def set_capacity(self, capacity_df):
+        self.capacity = {}
+        if capacity_df.empty or "楼层" not in capacity_df.columns:
+            return
+        for _, row in capacity_df.iterrows():
+            self.capacity[_level_text(row["楼层"])] = {
+                "楼层容量": _level_text(row.get("楼层容量")),
+                "楼层剩余容量": _level_text(row.get("楼层剩余容量")),
+            }
+        self._rendered = None
+
+    def set_item(self, inventory_id, location_id, quantity):
+        """更新单条库存的所在位置及数量（location_id为None表示移除）"""
+        previous = self.items.pop(inventory_id, None)
+        if previous is not None:
+            counts = self.occupancy.get(previous[0])
+            if counts is not None:
+                counts[0] -= 1
+                counts[1] -= previous[1]
+                if counts[0] <= 0:
+                    del self.occupancy[previous[0]]
+        if location_id is not None:
+            self.items[inventory_id] = (location_id, quantity)
+            counts = self.occupancy.setdefault(location_id, [0, 0.0])
+            counts[0] += 1
+            counts[1] += quantity
+        self._rendered = None
+
+    def load_items(self, inventory_df, operation_df, inventory_ids=None):
+        """按库存表重算指定库存（None=全部）的位置与数量，库存表中已不存在的库存移除"""
+        if inventory_ids is not None:
+            ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
+            inventory_df = inventory_df[ids.isin(inventory_ids)]
+        quantities = current_stock_quantities(inventory_df, operation_df)
+        location_ids = pd.to_numeric(inventory_df["关联位置ID"], errors="coerce")
+
+        seen = set()
+        for inventory_id, location_id, quantity in zip(quantities.index, location_ids, quantities.values):
+            if pd.isna(inventory_id):
+                continue
+            inventory_id = int(inventory_id)
+            seen.add(inventory_id)
+            valid_location = pd.notna(location_id) and int(location_id) in self.paths
+            self.set_item(inventory_id, int(location_id) if valid_location else None, float(quantity))
+        for inventory_id in set(inventory_ids or []) - seen:
+            self.set_item(inventory_id, None, 0.0)
+
+    def render(self):
+        """生成层级树（同一数据版本内缓存）"""
+        if self._rendered is not None:
+            return self._rendered
+
+        root = {"children": {}}
+        for location_id, path in self.paths.items():
+            count, quantity = self.occupancy.get(location_id, (0, 0.0))
+            node = root
+            nodes = []
+            for (level, _), name in zip(LOCATION_LEVELS, path):
+                if name == "" and level != "楼层":
+                    continue
+                node = node["children"].setdefault((level, name), {
+                    "level": level, "name": name, "库存条数": 0, "总数量": 0.0, "地址ID": [], "children": {}
+                })
+                nodes.append(node)
+            for item in nodes:
+                item["库存条数"] += count
+                item["总数量"] += quantity
+            node["地址ID"].append(location_id)
+
+        # 容量表中有但尚无库位的楼层也展示（条数为0）
+        for floor in self.capacity:
+            root["children"].setdefault(("楼层", floor), {
+                "level": "楼层", "name": floor, "库存条数": 0, "总数量": 0.0, "地址ID": [], "children": {}
+            })
+
+        def finalize(children):
+            result = []
+            for node in sorted(children.values(), key=lambda item: _sort_key(item["name"])):
+                node["总数量"] = round(node["总数量"], 2)
+                node["地址ID"].sort()
+                node["children"] = finalize(node["children"])
+                if node["level"] == "楼层" and node["name"] in self.capacity:
+                    node.update(self.capacity[node["name"]])
+                result.append(node)
+            return result
+
+        self._rendered = finalize(root["children"])
+        return self._rendered
+
+
+def _sort_key(name):
+    """数字按数值排序，其余按字符串排序（数字在前）"""
+    try:
+        return 0, float(name), name
+    except ValueError:
+        return 1, 0.0, name
+
+
+def build_location_tree(csv_data):
+    tree = LocationTree()
+    tree.set_locations(csv_data.get("location", pd.DataFrame()))
+    tree.set_capacity(csv_data.get("capacity", pd.DataFrame()))
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    if not inventory_df.empty and {"库存ID", "关联位置ID"}.issubset(inventory_df.columns):
+        tree.load_items(inventory_df, csv_data.get("operation_record", pd.DataFrame()))
+    return tree
+
+
+def patch_location_tree(tree, event, csv_data):
+    """只重算事件涉及的库存（入库新增/出库借还数量变化/编辑移位/删除）及位置（新增位置、编辑位置字段、删除孤立位置）"""
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    if inventory_df.empty or not {"库存ID", "关联位置ID"}.issubset(inventory_df.columns):
+        return False
+
+    location_df = csv_data.get("location", pd.DataFrame())
+    if not location_df.empty and "地址ID" in location_df.columns:
+        ids = pd.to_numeric(location_df["地址ID"], errors="coerce")
+        changed = ~ids.isin(tree.paths) | ids.isin(event.get("location_ids", []))
+        if changed.any():
+            tree.set_locations(location_df[changed])
+    tree.set_capacity(csv_data.get("capacity", pd.DataFrame()))
+
+    inventory_ids = [int(inventory_id) for inventory_id in event.get("inventory_ids", [])]
+    if inventory_ids:
+        tree.load_items(inventory_df, csv_data.get("operation_record", pd.DataFrame()), inventory_ids)
+    if event.get("type") == "delete":
+        existing = set(pd.to_numeric(location_df["地址ID"], errors="coerce").dropna().astype(int)) \
+            if not location_df.empty and "地址ID" in location_df.columns else set()
+        tree.remove_locations([int(location_id) for location_id in event.get("location_ids", [])
+                               if int(location_id) not in existing])
+    return True
+
+
+index_manager.register("location_tree", build_location_tree, patch_location_tree)
+
+
+def get_location_tree(floor=None):
+    """
+    库位层级树：楼层 → 架号 → 框号 → 包号，每个节点含 库存条数、总数量、对应的地址ID
+    :param floor: 只返回指定楼层（None=全部楼层）
+    """
+    try:
+        start_time = time.time()
+        tree = index_manager.get("location_tree").render()
+        if floor not in (None, ""):
+            floor = _level_text(floor)
+            tree = [node for node in tree if node["name"] == floor]
+
+        return {
+            "status": "success",
+            "data": tree,
+            "summary": {
+                "库存条数": sum(node["库存条数"] for node in tree),
+                "总数量": round(sum(node["总数量"] for node in tree), 2)
+            },
+            "performance": {
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"库位层级树查询异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"库位查询失败：{str(e)}"}, 500
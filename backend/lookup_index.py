@@ -0,0 +1,203 @@
+"""
+高频查找映射（由index_manager按数据版本维护）：
+1. 货号 → 商品ID（同一货号取第一条，与入库“同一货号一个商品ID”一致）
+2. 地址键 → 地址ID（重复时取最后一条，与原逐行构建字典的结果一致；厂家去重见manufacturer_index）
+3. 库存ID → 库存表行索引（出库/借出/归还定位行）
+写入后按事件增量更新：新增行直接追加，编辑涉及的商品/地址行重新计算键
+"""
+from bisect import insort
+from collections import defaultdict
+
+import pandas as pd
+
+from index_manager import index_manager
+from utils import read_csv_data
+
+EMPTY_MARK = "###EMPTY###"
+
+
+def make_address_key(address_type, floor, shelf_no, box_no, package_no):
+    """地址唯一键：地址类型|楼层|架号|框号|包号"""
+    return f"{address_type}|{floor}|{shelf_no}|{box_no}|{package_no}"
+
+
+def make_manufacturer_key(factory_name, factory_address, factory_phone):
+    """厂家唯一键：厂家|厂家地址|电话（空字段用特殊标记替代）"""
+    return f"{factory_name or EMPTY_MARK}|{factory_address or EMPTY_MARK}|{factory_phone or EMPTY_MARK}"
+
+
+def _clean_text(series):
+    """去空格字符串，缺失值为空字符串"""
+    return series.astype(object).where(series.notna(), "").astype(str).str.strip()
+
+
+def product_keys(product_df):
+    """货号键（空货号不参与映射）"""
+    codes = product_df["货号"].astype(str).str.strip()
+    return codes.where(codes != "", None)
+
+
+def location_keys(location_df):
+    return (location_df["地址类型"].astype(str) + "|" + location_df["楼层"].astype(str) + "|"
+            + _clean_text(location_df["架号"]) + "|" + _clean_text(location_df["框号"]) + "|"
+            + _clean_text(location_df["包号"]))
+
+
+def manufacturer_keys(manufacturer_df):
+    """厂家键（与make_manufacturer_key格式一致）"""
+    parts = [_clean_text(manufacturer_df[column]).replace("", EMPTY_MARK) for column in ["厂家", "厂家地址", "电话"]]
+    return parts[0] + "|" + parts[1] + "|" + parts[2]
+
+
+def inventory_keys(inventory_df):
+    ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce").fillna(-1).astype("int64")
+    return ids.astype(object).where(ids != -1, None)
+
+
+class KeyMap:
+    """
+    键 → 值 的映射，同一键对应多行时按行顺序保留全部候选，
+    lookup始终指向第一条（keep="first"）或最后一条（keep="last"），删改行后结果与全量构建一致
+    """
+
+    def __init__(self, keep):
+        self.keep = keep
+        self.lookup = {}
+        self._rows = defaultdict(list)  # 键 -> [(行索引, 值)]，按行索引有序
+        self._key_of = {}  # 行索引 -> 键
+
+    def load(self, labels, keys, values):
+        """全量加载（行索引需递增）"""
+        for label, key, value in zip(labels, keys, values):
+            if key is None:
+                continue
+            self._rows[key].append((label, value))
+            self._key_of[label] = key
+        for key in self._rows:
+            self._refresh(key)
+
+    def set_row(self, label, key, value):
+        self.drop_row(label)
+        if key is None:
+            return
+        insort(self._rows[key], (label, value))
+        self._key_of[label] = key
+        self._refresh(key)
+
+    def drop_row(self, label):
+        key = self._key_of.pop(label, None)
+        if key is None:
+            return
+        self._rows[key] = [row for row in self._rows[key] if row[0] != label]
+        self._refresh(key)
+
+    def _refresh(self, key):
+        rows = self._rows.get(key)
+        if not rows:
+            self._rows.pop(key, None)
+            self.lookup.pop(key, None)
+        else:
+            self.lookup[key] = rows[0][1] if self.keep == "first" else rows[-1][1]
+
+
+# 表名 -> (ID列, 键函数, 同键取第一条/最后一条, 映射值取ID还是行索引)
+LOOKUP_TABLES = {
+    "product": ("商品ID", product_keys, "first", "id"),
+    "location": ("地址ID", location_keys, "last", "id"),
+    "inventory": ("库存ID", inventory_keys, "last", "label"),
+}
+
+
+class LookupIndex:
+    """各表查找映射的集合"""
+
+    def __init__(self):
+        self.maps = {table: KeyMap(spec[2]) for table, spec in LOOKUP_TABLES.items()}
+        self.row_counts = {table: 0 for table in LOOKUP_TABLES}
+
+    def matches(self, csv_data):
+        """映射是否与给定数据快照的行数一致"""
+        return all(len(csv_data.get(table, pd.DataFrame())) == count for table, count in self.row_counts.items())
+
+    @property
+    def product_code_to_id(self):
+        return self.maps["product"].lookup
+
+    @property
+    def address_to_id(self):
+        return self.maps["location"].lookup
+
+    @property
+    def inventory_rows(self):
+        return self.maps["inventory"].lookup
+
+    @staticmethod
+    def _entries(table, df):
+        """计算表中各行的 (行索引, 键, 值)"""
+        id_column, key_func, _, value_kind = LOOKUP_TABLES[table]
+        keys = key_func(df).astype(object)
+        keys = keys.where(keys.notna(), None)
+        if value_kind == "label":
+            values = list(df.index)
+        else:
+            values = pd.to_numeric(df[id_column], errors="coerce").fillna(-1).astype(int).tolist()
+        return df.index, keys.tolist(), values
+
+    def load_table(self, table, df):
+        self.maps[table].load(*self._entries(table, df))
+        self.row_counts[table] = len(df)
+
+    def update_rows(self, table, df):
+        """重新计算指定行的键（用于新增行及编辑过的行）"""
+        for label, key, value in zip(*self._entries(table, df)):
+            self.maps[table].set_row(label, key, value)
+
+
+def build_lookup_index(csv_data):
+    index = LookupIndex()
+    for table in LOOKUP_TABLES:
+        df = csv_data.get(table, pd.DataFrame())
+        if not df.empty:
+            index.load_table(table, df)
+    return index
+
+
+def patch_lookup_index(index, event, csv_data):
+    """追加新增行；编辑事件重新计算涉及的商品/地址行；行数减少（删除）时返回False全量重建"""
+    event_ids = {
+        "product": event.get("product_ids", []),
+        "location": event.get("location_ids", []),
+    }
+    for table, (id_column, _, _, _) in LOOKUP_TABLES.items():
+        df = csv_data.get(table, pd.DataFrame())
+        if len(df) < index.row_counts[table]:
+            return False
+        if len(df) > index.row_counts[table]:
+            index.update_rows(table, df.iloc[index.row_counts[table]:])
+            index.row_counts[table] = len(df)
+        changed_ids = event_ids.get(table)
+        if changed_ids and not df.empty:
+            ids = pd.to_numeric(df[id_column], errors="coerce")
+            index.update_rows(table, df[ids.isin(changed_ids)])
+    return True
+
+
+index_manager.register("lookups", build_lookup_index, patch_lookup_index)
+
+
+def get_lookup_index():
+    """当前数据版本的查找映射（只读，调用方不得修改其中的字典）"""
+    return index_manager.get("lookups")
+
+
+def load_lookup_snapshot():
+    """
+    读取一次数据快照及与之匹配的查找映射（写接口在write_transaction内调用，定位行、校验与写入基于同一份数据）
+    返回的数据为浅拷贝，调用方可替换其中的表而不改动共享的缓存数据
+    """
+    csv_data = read_csv_data()
+    lookups = get_lookup_index()
+    if not lookups.matches(csv_data):
+        # 索引与数据快照行数不一致（如读取后被就地修改）时按当前数据构建
+        lookups = build_lookup_index(csv_data)
+    return dict(csv_data), lookups
@@ -0,0 +1,159 @@
+"""
+厂家前缀索引（由index_manager按数据版本维护）：
+1. 厂家名称/电话/厂家地址 各维护一个按检索词排序的数组 [(检索词, 厂家ID)]，检索词为去空格、不区分大小写的字段值
+2. 输入框联想：二分定位前缀区间，只遍历匹配的条目，不扫描厂家表
+3. 入库/编辑的厂家去重：按厂家名称精确定位候选，再比较 厂家地址/电话（同名同址同电话重复时取最后一条，与原逐行构建字典一致）
+入库新增厂家时直接插入；编辑已有厂家或删除时全量重建（厂家表只有数百行）
+"""
+import time
+from bisect import bisect_left, insort
+
+import pandas as pd
+
+from config import *
+from index_manager import index_manager
+
+# 参与联想的字段（同时是联想结果的排序优先级）
+MANUFACTURER_FIELDS = ["厂家", "电话", "厂家地址"]
+
+
+def _clean_text(series):
+    """去空格字符串，缺失值为空字符串"""
+    return series.astype(object).where(series.notna(), "").astype(str).str.strip()
+
+
+def _term(text):
+    return str(text).strip().casefold()
+
+
+class ManufacturerIndex:
+    """厂家ID → (厂家, 厂家地址, 电话, 行序号)，字段 → 有序检索词数组"""
+
+    def __init__(self):
+        self.records = {}
+        self.terms = {field: [] for field in MANUFACTURER_FIELDS}
+        self.row_count = 0
+
+    def add_rows(self, manufacturer_df):
+        """按行顺序追加厂家（行序号用于同键取最后一条）"""
+        if manufacturer_df.empty or "厂家ID" not in manufacturer_df.columns:
+            return
+        ids = pd.to_numeric(manufacturer_df["厂家ID"], errors="coerce")
+        columns = {field: _clean_text(manufacturer_df[field]) if field in manufacturer_df.columns
+                   else pd.Series("", index=manufacturer_df.index) for field in MANUFACTURER_FIELDS}
+        for manufacturer_id, name, address, phone in zip(ids, columns["厂家"], columns["厂家地址"], columns["电话"]):
+            self.row_count += 1
+            if pd.isna(manufacturer_id):
+                continue
+            manufacturer_id = int(manufacturer_id)
+            self.records[manufacturer_id] = (name, address, phone, self.row_count)
+            for field, value in zip(["厂家", "厂家地址", "电话"], [name, address, phone]):
+                if value:
+                    insort(self.terms[field], (_term(value), manufacturer_id))
+
+    def _scan(self, field, prefix, exact=False):
+        """检索词以prefix开头（exact=True时等于prefix）的厂家ID"""
+        terms = self.terms[field]
+        position = bisect_left(terms, (prefix,))
+        while position < len(terms):
+            term, manufacturer_id = terms[position]
+            if not term.startswith(prefix) or (exact and term != prefix):
+                break
+            yield term, manufacturer_id
+            position += 1
+
+    def find(self, factory_name, factory_address, factory_phone):
+        """按 厂家|厂家地址|电话 精确匹配已有厂家ID（区分大小写，与入库去重键一致），无匹配返回None"""
+        factory_name = str(factory_name or "").strip()
+        if not factory_name:
+            return None
+        factory_address = str(factory_address or "").strip()
+        factory_phone = str(factory_phone or "").strip()
+        matched_id, matched_row = None, 0
+        for _, manufacturer_id in self._scan("厂家", _term(factory_name), exact=True):
+            name, address, phone, row = self.records[manufacturer_id]
+            if (name, address, phone) == (factory_name, factory_address, factory_phone) and row > matched_row:
+                matched_id, matched_row = manufacturer_id, row
+        return matched_id
+
+    def suggest(self, query, fields=None, limit=MANUFACTURER_SUGGEST_LIMIT):
+        """
+        前缀联想：返回 [(厂家ID, 匹配字段)]
+        排序：按字段优先级（厂家 > 电话 > 厂家地址），同字段内完全匹配优先、再按检索词长度和厂家ID
+        """
+        prefix = _term(query)
+        if not prefix:
+            return []
+        best = {}
+        for rank, field in enumerate(fields or MANUFACTURER_FIELDS):
+            for term, manufacturer_id in self._scan(field, prefix):
+                order = (rank, term != prefix, len(term), manufacturer_id)
+                if manufacturer_id not in best or order < best[manufacturer_id][0]:
+                    best[manufacturer_id] = (order, field)
+        ranked = sorted(best.items(), key=lambda item: item[1][0])
+        return [(manufacturer_id, field) for manufacturer_id, (_, field) in ranked[:limit]]
+
+
+def build_manufacturer_index(csv_data):
+    index = ManufacturerIndex()
+    index.add_rows(csv_data.get("manufacturer", pd.DataFrame()))
+    return index
+
+
+def patch_manufacturer_index(index, event, csv_data):
+    """新增厂家行直接插入；编辑了已有厂家或行数减少时返回False全量重建"""
+    manufacturer_df = csv_data.get("manufacturer", pd.DataFrame())
+    if event.get("manufacturer_ids") or len(manufacturer_df) < index.row_count:
+        return False
+    if len(manufacturer_df) > index.row_count:
+        index.add_rows(manufacturer_df.iloc[index.row_count:])
+    return True
+
+
+index_manager.register("manufacturers", build_manufacturer_index, patch_manufacturer_index)
+
+
+def get_manufacturer_index():
+    """当前数据版本的厂家前缀索引（只读）"""
+    return index_manager.get("manufacturers")
+
+
+def suggest_manufacturers(query, field=None, limit=None):
+    """
+    厂家联想（入库/编辑表单输入框）
+    :param query: 输入的前缀（不区分大小写）
+    :param field: 只匹配指定字段（厂家/电话/厂家地址，None=全部）
+    :param limit: 返回条数（默认MANUFACTURER_SUGGEST_LIMIT，最多MANUFACTURER_SUGGEST_MAX）
+    """
+    try:
+        start_time = time.time()
+        if field not in (None, "") and field not in MANUFACTURER_FIELDS:
+            return {"status": "error", "message": f"field参数无效，可选值：{', '.join(MANUFACTURER_FIELDS)}"}, 400
+        if limit in (None, ""):
+            limit = MANUFACTURER_SUGGEST_LIMIT
+        try:
+            limit = max(1, min(int(limit), MANUFACTURER_SUGGEST_MAX))
+        except (ValueError, TypeError):
+            return {"status": "error", "message": "limit必须为整数"}, 400
+
+        index = get_manufacturer_index()
+        matches = index.suggest(query or "", [field] if field else None, limit)
+        data = []
+        for manufacturer_id, matched_field in matches:
+            name, address, phone, _ = index.records[manufacturer_id]
+            data.append({"厂家ID": manufacturer_id, "厂家": name, "厂家地址": address, "电话": phone,
+                         "匹配字段": matched_field})
+
+        return {
+            "status": "success",
+            "data": data,
+            "performance": {
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"厂家联想查询异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"厂家联想失败：{str(e)}"}, 500
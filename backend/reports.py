@@ -0,0 +1,261 @@
+"""
+出入库流水汇总报表：
+1. 按 (日期, 操作类型, 类型, 楼层, 厂家) 预聚合操作记录的 次数/数量，同时维护按日与按周（周一为起始）两级汇总
+2. 类型/楼层/厂家取操作记录关联库存的当前商品类型/位置楼层/厂家名称
+3. 新增操作记录（入库/出库/借/还）后增量累加；编辑可能改变维度取值，留待下次使用时按历史记录重建
+4. 查询任意日期范围时累加汇总桶：整周用周汇总，首尾不完整的周用日汇总，不再扫描操作记录
+"""
+import time
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, timedelta
+
+import numpy as np
+import pandas as pd
+
+from config import *
+from index_manager import index_manager
+from utils import parse_operation_times
+
+# 汇总维度（操作类型之外的维度来自关联表）
+ROLLUP_DIMENSIONS = ["操作类型", "类型", "楼层", "厂家"]
+# 追加操作记录的写入事件
+ROLLUP_APPEND_EVENTS = {"stock_in", "stock_out", "lend", "return"}
+REPORT_GRANULARITIES = ("day", "week", "month")
+
+
+def _dimension_values(series):
+    """维度取值统一为字符串：缺失值为空字符串，整数型数字去掉小数部分（如楼层 3.0 → "3"）"""
+    numeric = pd.to_numeric(series, errors="coerce")
+    is_int = numeric.notna() & (numeric == numeric.round())
+    values = series.astype(object).where(series.notna(), "").astype(str).str.strip()
+    values[is_int] = numeric[is_int].astype("int64").astype(str)
+    return values
+
+
+def _map_ids(ids, table_df, id_column, value_column):
+    """按ID向量化映射关联表的列（ID缺失或无对应记录时为NaN）"""
+    if table_df.empty or id_column not in table_df.columns or value_column not in table_df.columns:
+        return pd.Series(np.nan, index=ids.index, dtype=object)
+    table = table_df[[id_column, value_column]].copy()
+    table[id_column] = pd.to_numeric(table[id_column], errors="coerce")
+    mapping = table.dropna(subset=[id_column]).drop_duplicates(id_column).set_index(id_column)[value_column]
+    return ids.map(mapping)
+
+
+def operation_rollup_rows(operation_df, csv_data):
+    """
+    操作记录 → 汇总行：DataFrame[日期, 操作类型, 类型, 楼层, 厂家, 数量]（操作时间无法解析的记录不计入）
+    """
+    dates = parse_operation_times(operation_df["操作时间"]).dt.normalize()
+    inventory_ids = pd.to_numeric(operation_df["关联库存ID"], errors="coerce")
+
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    feature_ids = pd.to_numeric(_map_ids(inventory_ids, inventory_df, "库存ID", "关联商品特征ID"), errors="coerce")
+    product_ids = pd.to_numeric(_map_ids(feature_ids, csv_data.get("feature", pd.DataFrame()), "商品特征ID", "关联商品ID"),
+                                errors="coerce")
+    location_ids = pd.to_numeric(_map_ids(inventory_ids, inventory_df, "库存ID", "关联位置ID"), errors="coerce")
+    manufacturer_ids = pd.to_numeric(_map_ids(inventory_ids, inventory_df, "库存ID", "关联厂家ID"), errors="coerce")
+
+    rows = pd.DataFrame({
+        "日期": dates,
+        "操作类型": _dimension_values(operation_df["操作类型"]),
+        "类型": _dimension_values(_map_ids(product_ids, csv_data.get("product", pd.DataFrame()), "商品ID", "类型")),
+        "楼层": _dimension_values(_map_ids(location_ids, csv_data.get("location", pd.DataFrame()), "地址ID", "楼层")),
+        "厂家": _dimension_values(_map_ids(manufacturer_ids, csv_data.get("manufacturer", pd.DataFrame()), "厂家ID", "厂家")),
+        "数量": pd.to_numeric(operation_df["操作数量"], errors="coerce").fillna(0.0),
+    })
+    return rows[rows["日期"].notna()]
+
+
+def week_start(day):
+    """所在周的周一"""
+    return day - timedelta(days=day.weekday())
+
+
+class RollupTable:
+    """单一粒度的汇总表：桶日期 → {(操作类型, 类型, 楼层, 厂家): [次数, 数量]}，桶日期有序"""
+
+    def __init__(self):
+        self.buckets = {}
+        self.dates = []
+
+    def add(self, bucket_date, key, count, quantity):
+        bucket = self.buckets.get(bucket_date)
+        if bucket is None:
+            bucket = self.buckets[bucket_date] = {}
+            insort(self.dates, bucket_date)
+        totals = bucket.setdefault(key, [0, 0.0])
+        totals[0] += count
+        totals[1] += quantity
+
+    def range(self, start, end):
+        """[start, end] 内的 (桶日期, 桶)"""
+        lower = bisect_left(self.dates, start) if start else 0
+        upper = bisect_right(self.dates, end) if end else len(self.dates)
+        return [(bucket_date, self.buckets[bucket_date]) for bucket_date in self.dates[lower:upper]]
+
+
+class MovementRollup:
+    """按日/按周的出入库汇总"""
+
+    def __init__(self):
+        self.daily = RollupTable()
+        self.weekly = RollupTable()
+        self.operation_count = 0  # 已汇总的操作记录行数（含时间无法解析的行）
+        self.skipped = 0  # 操作时间无法解析、未计入汇总的记录数
+
+    def add_operations(self, operation_df, csv_data):
+        if operation_df.empty or "操作时间" not in operation_df.columns:
+            return
+        rows = operation_rollup_rows(operation_df, csv_data)
+        self.skipped += len(operation_df) - len(rows)
+        if rows.empty:
+            return
+        grouped = rows.groupby(["日期"] + ROLLUP_DIMENSIONS, sort=False)["数量"].agg(["size", "sum"])
+        for (day, *key), count, quantity in zip(grouped.index, grouped["size"].values, grouped["sum"].values):
+            day = day.date()
+            key = tuple(key)
+            self.daily.add(day, key, int(count), float(quantity))
+            self.weekly.add(week_start(day), key, int(count), float(quantity))
+
+    def buckets(self, start, end, use_weeks):
+        """
+        [start, end] 内的汇总桶：(桶日期, 桶)，start/end为None表示不限。
+        use_weeks为True时完整落在范围内的周取周汇总，首尾不完整的周取日汇总
+        """
+        if not self.daily.dates:
+            return []
+        start = max(start, self.daily.dates[0]) if start else self.daily.dates[0]
+        end = min(end, self.daily.dates[-1]) if end else self.daily.dates[-1]
+        if not use_weeks:
+            return self.daily.range(start, end)
+
+        # 首个完整周的周一、最后一个完整周的周一（范围两端超出数据时按数据边界所在周取整）
+        first_full = week_start(start) if start == self.daily.dates[0] or start.weekday() == 0 \
+            else week_start(start) + timedelta(days=7)
+        last_full = week_start(end) if end == self.daily.dates[-1] or end.weekday() == 6 \
+            else week_start(end) - timedelta(days=7)
+        if first_full > last_full:
+            return self.daily.range(start, end)
+        return (self.daily.range(start, first_full - timedelta(days=1))
+                + self.weekly.range(first_full, last_full)
+                + self.daily.range(last_full + timedelta(days=7), end))
+
+
+def build_movement_rollup(csv_data):
+    rollup = MovementRollup()
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    rollup.add_operations(operation_df, csv_data)
+    rollup.operation_count = len(operation_df)
+    return rollup
+
+
+def patch_movement_rollup(rollup, event, csv_data):
+    """新增操作记录直接累加；编辑（可能改变类型/楼层/厂家）等其他写入留待重建"""
+    if event.get("type") not in ROLLUP_APPEND_EVENTS:
+        return False
+    operation_df = csv_data.get("operation_record", pd.DataFrame())
+    if len(operation_df) < rollup.operation_count:
+        return False
+    rollup.add_operations(operation_df.iloc[rollup.operation_count:], csv_data)
+    rollup.operation_count = len(operation_df)
+    return True
+
+
+index_manager.register("movement_rollup", build_movement_rollup, patch_movement_rollup)
+
+
+def _parse_date(value, name):
+    if value in (None, ""):
+        return None
+    parsed = pd.to_datetime(value, errors="coerce")
+    if pd.isna(parsed):
+        raise ValueError(f"{name}格式不正确，请使用 YYYY-MM-DD")
+    return parsed.date()
+
+
+def _period_of(bucket_date, granularity):
+    if granularity == "week":
+        return week_start(bucket_date).isoformat()
+    if granularity == "month":
+        return bucket_date.strftime("%Y-%m")
+    return bucket_date.isoformat()
+
+
+def get_movement_report(start_date=None, end_date=None, granularity="day", group_by=None, filters=None):
+    """
+    出入库汇总报表
+    :param start_date/end_date: 日期范围（YYYY-MM-DD，含两端，未传表示不限）
+    :param granularity: 汇总周期 day / week（周一为起始） / month
+    :param group_by: 除周期外的分组维度（操作类型/类型/楼层/厂家，None=按操作类型）
+    :param filters: {维度: [取值, ...]}，同一维度多选为“或”
+    """
+    try:
+        start_time = time.time()
+        if granularity not in REPORT_GRANULARITIES:
+            return {"status": "error", "message": f"granularity参数无效，可选值：{', '.join(REPORT_GRANULARITIES)}"}, 400
+        group_by = ["操作类型"] if group_by is None else group_by
+        filters = {field: set(values) for field, values in (filters or {}).items() if values}
+        unknown = [field for field in list(group_by) + list(filters) if field not in ROLLUP_DIMENSIONS]
+        if unknown:
+            return {"status": "error",
+                    "message": f"不支持的维度: {', '.join(unknown)}，可选值：{', '.join(ROLLUP_DIMENSIONS)}"}, 400
+        try:
+            start = _parse_date(start_date, "start_date")
+            end = _parse_date(end_date, "end_date")
+        except ValueError as e:
+            return {"status": "error", "message": str(e)}, 400
+        if start and end and start > end:
+            return {"status": "error", "message": "start_date不能晚于end_date"}, 400
+
+        rollup = index_manager.get("movement_rollup")
+        positions = [ROLLUP_DIMENSIONS.index(field) for field in group_by]
+        filter_positions = [(ROLLUP_DIMENSIONS.index(field), values) for field, values in filters.items()]
+
+        totals = {}
+        bucket_count = 0
+        for bucket_date, bucket in rollup.buckets(start, end, use_weeks=granularity == "week"):
+            period = _period_of(bucket_date, granularity)
+            bucket_count += 1
+            for key, (count, quantity) in bucket.items():
+                if any(key[position] not in values for position, values in filter_positions):
+                    continue
+                group_key = (period,) + tuple(key[position] for position in positions)
+                group = totals.setdefault(group_key, [0, 0.0])
+                group[0] += count
+                group[1] += quantity
+
+        data = []
+        for group_key in sorted(totals):
+            count, quantity = totals[group_key]
+            item = {"period": group_key[0]}
+            item.update(zip(group_by, group_key[1:]))
+            item.update({"次数": count, "数量": round(quantity, 2)})
+            data.append(item)
+
+        return {
+            "status": "success",
+            "data": data,
+            "summary": {
+                "次数": sum(item["次数"] for item in data),
+                "数量": round(sum(item["数量"] for item in data), 2),
+                "未计入记录数": rollup.skipped
+            },
+            "query": {
+                "start_date": start.isoformat() if start else None,
+                "end_date": end.isoformat() if end else None,
+                "granularity": granularity,
+                "group_by": group_by,
+                "filters": {field: sorted(values) for field, values in filters.items()}
+            },
+            "performance": {
+                "buckets": bucket_count,
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"出入库汇总报表异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"报表查询失败：{str(e)}"}, 500
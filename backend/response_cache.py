@@ -0,0 +1,64 @@
+"""
+渲染结果缓存：
+1. 缓存读接口编码（及压缩）后的响应字节，键为 路径+查询参数+压缩算法，并记录生成时的数据版本号
+2. 按字节数限制总内存，超出时按LRU淘汰最久未使用的条目
+3. 数据写入时通过invalidate_cache的失效回调整体清空
+"""
+import threading
+from collections import OrderedDict
+
+from utils import register_invalidate_hook, get_data_version
+from config import *
+
+
+class ResponseCache:
+    """按字节数限容的LRU响应缓存（线程安全）"""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # key -> (数据版本号, 响应体, 响应头)
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        """命中且数据版本未变时返回(响应体, 响应头)，否则返回None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != get_data_version():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1], entry[2]
+
+    def put(self, key, version, body, headers):
+        """写入缓存；单条超过上限时不缓存"""
+        if len(body) > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old[1])
+            self._entries[key] = (version, body, headers)
+            self._size += len(body)
+            # 超出上限时淘汰最久未使用的条目
+            while self._size > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "bytes": self._size,
+                    "hits": self.hits, "misses": self.misses}
+
+
+response_cache = ResponseCache(RESPONSE_CACHE_MAX_BYTES)
+# 数据写入（invalidate_cache）时清空，避免旧版本条目占用内存
+register_invalidate_hook(response_cache.clear)
@@ -0,0 +1,278 @@
+"""
+库存全文检索：
+1. 以库存记录为文档，索引关联商品（货号/类型/用途/备注）、特征（材质/颜色/形状/风格/规格）、厂家名称
+2. 倒排索引的词元为单字+二元组（适配中文及货号片段），查询词按空格拆分，多个词需同时命中
+3. 按字段权重与匹配程度（完全相同 > 前缀 > 包含）排序，分页返回
+4. 入库/编辑后通过index_manager增量更新，其余写入不影响检索字段
+"""
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+
+import pandas as pd
+
+from config import *
+from index_manager import index_manager
+
+# 检索字段及权重（顺序即命中字段的展示顺序）
+SEARCH_FIELDS = [
+    ("货号", 5),
+    ("厂家", 3),
+    ("颜色", 2),
+    ("材质", 2),
+    ("形状", 2),
+    ("风格", 2),
+    ("规格", 2),
+    ("类型", 1),
+    ("用途", 1),
+    ("备注", 1),
+]
+# 不影响检索字段的写入事件（无需更新索引）
+SEARCH_NEUTRAL_EVENTS = {"stock_out", "lend", "return"}
+
+
+def normalize_search_text(value):
+    """检索文本归一化：全角转半角、去首尾空格、小写；缺失值返回空字符串"""
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ""
+    return unicodedata.normalize("NFKC", str(value)).strip().lower()
+
+
+def text_grams(text):
+    """拆分词元：单字 + 相邻二元组"""
+    grams = set(text)
+    grams.update(text[i:i + 2] for i in range(len(text) - 1))
+    return grams
+
+
+def query_grams(term):
+    """查询词的词元：单字查询用单字，否则用二元组（命中后再校验完整子串）"""
+    if len(term) == 1:
+        return {term}
+    return {term[i:i + 2] for i in range(len(term) - 1)}
+
+
+def build_search_documents(inventory_df, csv_data):
+    """关联库存→特征→商品/厂家，生成检索文档列表（仅处理传入的库存行）"""
+    feature_df = csv_data.get("feature", pd.DataFrame())
+    product_df = csv_data.get("product", pd.DataFrame())
+    manufacturer_df = csv_data.get("manufacturer", pd.DataFrame())
+
+    docs = pd.DataFrame({
+        "库存ID": pd.to_numeric(inventory_df["库存ID"], errors="coerce"),
+        "商品特征ID": pd.to_numeric(inventory_df["关联商品特征ID"], errors="coerce"),
+        "厂家ID": pd.to_numeric(inventory_df["关联厂家ID"], errors="coerce"),
+    }).dropna(subset=["库存ID"])
+
+    feature_cols = ["材质", "颜色", "形状", "风格", "规格", "图片路径"]
+    features = feature_df.reindex(columns=["商品特征ID", "关联商品ID"] + feature_cols).copy()
+    features["商品特征ID"] = pd.to_numeric(features["商品特征ID"], errors="coerce")
+    features["商品ID"] = pd.to_numeric(features.pop("关联商品ID"), errors="coerce")
+    docs = docs.merge(features.drop_duplicates("商品特征ID"), on="商品特征ID", how="left")
+
+    products = product_df.reindex(columns=["商品ID", "货号", "类型", "用途", "备注"]).copy()
+    products["商品ID"] = pd.to_numeric(products["商品ID"], errors="coerce")
+    docs = docs.merge(products.drop_duplicates("商品ID"), on="商品ID", how="left")
+
+    manufacturers = manufacturer_df.reindex(columns=["厂家ID", "厂家"]).copy()
+    manufacturers["厂家ID"] = pd.to_numeric(manufacturers["厂家ID"], errors="coerce")
+    docs = docs.merge(manufacturers.drop_duplicates("厂家ID"), on="厂家ID", how="left")
+
+    docs = docs.astype(object).where(docs.notna(), None)
+    return docs.to_dict("records")
+
+
+class SearchIndex:
+    """库存检索倒排索引：词元 → 库存ID集合"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.docs = {}  # 库存ID -> 展示用文档
+        self.texts = {}  # 库存ID -> 各检索字段归一化文本（与SEARCH_FIELDS顺序一致）
+        self.postings = defaultdict(set)
+        self.by_product = defaultdict(set)  # 商品ID -> 库存ID集合（商品信息编辑时定位受影响文档）
+        self.by_manufacturer = defaultdict(set)  # 厂家ID -> 库存ID集合
+
+    def add(self, record):
+        inventory_id = int(record["库存ID"])
+        self.remove(inventory_id)
+
+        texts = tuple(normalize_search_text(record.get(field)) for field, _ in SEARCH_FIELDS)
+        grams = set()
+        for text in texts:
+            grams |= text_grams(text)
+        for gram in grams:
+            self.postings[gram].add(inventory_id)
+
+        doc = {
+            "库存ID": inventory_id,
+            "商品ID": int(record["商品ID"]) if record.get("商品ID") is not None else None,
+            "商品特征ID": int(record["商品特征ID"]) if record.get("商品特征ID") is not None else None,
+            "厂家ID": int(record["厂家ID"]) if record.get("厂家ID") is not None else None,
+            "图片路径": record.get("图片路径") or "",
+        }
+        for field, _ in SEARCH_FIELDS:
+            value = record.get(field)
+            doc[field] = "" if value is None else str(value)
+        self.docs[inventory_id] = doc
+        self.texts[inventory_id] = texts
+        if doc["商品ID"] is not None:
+            self.by_product[doc["商品ID"]].add(inventory_id)
+        if doc["厂家ID"] is not None:
+            self.by_manufacturer[doc["厂家ID"]].add(inventory_id)
+
+    def remove(self, inventory_id):
+        texts = self.texts.pop(inventory_id, None)
+        if texts is None:
+            return
+        doc = self.docs.pop(inventory_id)
+        for text in texts:
+            for gram in text_grams(text):
+                posting = self.postings.get(gram)
+                if posting is not None:
+                    posting.discard(inventory_id)
+                    if not posting:
+                        del self.postings[gram]
+        if doc["商品ID"] is not None:
+            self.by_product[doc["商品ID"]].discard(inventory_id)
+        if doc["厂家ID"] is not None:
+            self.by_manufacturer[doc["厂家ID"]].discard(inventory_id)
+
+    def search(self, query):
+        """返回按相关度排序的 [(得分, 库存ID, 命中字段列表)]"""
+        terms = [normalize_search_text(term) for term in str(query).split()]
+        terms = [term for term in terms if term]
+        if not terms:
+            return []
+
+        with self.lock:
+            # 按倒排表长度从小到大求交集
+            postings = []
+            for term in terms:
+                for gram in query_grams(term):
+                    posting = self.postings.get(gram)
+                    if not posting:
+                        return []
+                    postings.append(posting)
+            postings.sort(key=len)
+            candidates = set(postings[0])
+            for posting in postings[1:]:
+                candidates &= posting
+                if not candidates:
+                    return []
+
+            results = []
+            for inventory_id in candidates:
+                texts = self.texts[inventory_id]
+                score = 0
+                matched_fields = []
+                for term in terms:
+                    term_score = 0
+                    for (field, weight), text in zip(SEARCH_FIELDS, texts):
+                        if term not in text:
+                            continue
+                        if text == term:
+                            term_score += weight * 3
+                        elif text.startswith(term):
+                            term_score += weight * 2
+                        else:
+                            term_score += weight
+                        if field not in matched_fields:
+                            matched_fields.append(field)
+                    # 二元组全部命中但不构成连续子串时排除
+                    if term_score == 0:
+                        break
+                    score += term_score
+                else:
+                    results.append((score, inventory_id, matched_fields))
+
+        # 得分高的在前，同分时新入库的在前
+        results.sort(key=lambda item: (-item[0], -item[1]))
+        return results
+
+
+def build_search_index(csv_data):
+    index = SearchIndex()
+    inventory_df = csv_data.get("inventory", pd.DataFrame())
+    if inventory_df.empty:
+        return index
+    for record in build_search_documents(inventory_df, csv_data):
+        index.add(record)
+    return index
+
+
+def patch_search_index(index, event, csv_data):
+    """增量更新：入库新增文档；编辑时重建该库存及共享同一商品/厂家的库存文档"""
+    event_type = event.get("type")
+    if event_type in SEARCH_NEUTRAL_EVENTS:
+        return True
+    if event_type not in ("stock_in", "edit"):
+        return False
+
+    with index.lock:
+        inventory_ids = set(event.get("inventory_ids", []))
+        for product_id in event.get("product_ids", []):
+            inventory_ids |= index.by_product.get(product_id, set())
+        for manufacturer_id in event.get("manufacturer_ids", []):
+            inventory_ids |= index.by_manufacturer.get(manufacturer_id, set())
+        if not inventory_ids:
+            return True
+
+        inventory_df = csv_data.get("inventory", pd.DataFrame())
+        ids = pd.to_numeric(inventory_df["库存ID"], errors="coerce")
+        for record in build_search_documents(inventory_df[ids.isin(inventory_ids)], csv_data):
+            index.add(record)
+    return True
+
+
+index_manager.register("search", build_search_index, patch_search_index)
+
+
+def search_inventory(query, page=1, page_size=DEFAULT_PAGE_SIZE):
+    """全文检索库存（货号/厂家/颜色/材质/形状等），返回分页结果"""
+    try:
+        start_time = time.time()
+        query = (query or "").strip()
+        if not query:
+            return {"status": "error", "message": "检索关键词不能为空"}, 400
+        try:
+            page = max(1, int(page))
+            page_size = max(1, min(int(page_size), MAX_PAGE_SIZE))
+        except (ValueError, TypeError):
+            return {"status": "error", "message": "page和page_size必须为整数"}, 400
+
+        index = index_manager.get("search")
+        results = index.search(query)
+        total = len(results)
+
+        items = []
+        for score, inventory_id, matched_fields in results[(page - 1) * page_size:page * page_size]:
+            doc = index.docs.get(inventory_id)
+            if doc is None:
+                continue
+            item = dict(doc)
+            item["score"] = score
+            item["matched_fields"] = matched_fields
+            items.append(item)
+
+        return {
+            "status": "success",
+            "data": items,
+            "query": query,
+            "pagination": {
+                "total": total,
+                "page": page,
+                "page_size": page_size,
+                "total_pages": (total + page_size - 1) // page_size
+            },
+            "performance": {
+                "total_time": f"{time.time() - start_time:.4f}秒"
+            }
+        }, 200
+
+    except Exception as e:
+        print(f"库存检索异常: {str(e)}")
+        import traceback
+        traceback.print_exc()
+        return {"status": "error", "message": f"检索失败：{str(e)}"}, 500
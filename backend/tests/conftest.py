@@ -0,0 +1,105 @@
+"""
+测试公共夹具：
+1. 每个用例在临时目录下使用一份小型CSV数据（工作目录切换到该目录，csv/ 为相对路径）
+2. 用例开始前清空数据缓存、派生索引、响应缓存、幂等键及变更日志，用例之间互不影响
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# 库存1：有出库记录；库存2：有借出记录（均不可删除）；库存3：独占特征3/位置3/厂家3；库存4与库存1共用位置1、厂家1
+FIXTURE_TABLES = {
+    "product": [
+        "商品ID,货号,类型,备注,用途",
+        "1,WJ001,样品,,",
+        "2,WJ002,原材料,,",
+        "3,HB003,HB,,",
+    ],
+    "feature": [
+        "商品特征ID,关联商品ID,单价,重量,规格,材质,颜色,形状,风格,图片路径",
+        "1,1,1.5,10,,铁,蓝色,圆,,",
+        "2,2,2,5,,铜,红色,方,,",
+        "3,3,,1,,铁,红色,,,",
+        "4,1,1.5,10,,铁,绿色,圆,,",
+    ],
+    "manufacturer": [
+        "厂家ID,厂家,厂家地址,电话",
+        "1,锦发五金,一楼A区,111",
+        "2,华美辅料,二楼B区,222",
+        "3,华盛纽扣,三楼C区,333",
+    ],
+    "location": [
+        "地址ID,地址类型,楼层,架号,框号,包号",
+        "1,1,1,A,1,1",
+        "2,1,1,A,1,2",
+        "3,2,2,B,3,1",
+    ],
+    "inventory": [
+        "库存ID,关联商品特征ID,关联厂家ID,关联位置ID,单位,库存数量,次品数量,批次,状态,版本",
+        "1,1,1,1,个,10,0,1,,0",
+        "2,2,2,2,个,5,0,1,,0",
+        "3,3,3,3,个,3,0,2,,0",
+        "4,4,1,1,个,8,0,1,,0",
+    ],
+    "operation_record": [
+        "操作ID,关联库存ID,操作类型,操作时间,操作数量,操作人,备注",
+        "1,1,入库,2025-11-20 10:00:00,10,系统,",
+        "2,2,入库,2025-11-20 11:00:00,5,系统,",
+        "3,3,入库,2025-11-21 09:00:00,3,系统,",
+        "4,4,入库,2025-11-21 09:30:00,8,系统,",
+        "5,1,出库,2025-11-22 10:00:00,2,张三,",
+        "6,2,借,2025-11-22 11:00:00,1,李四,",
+    ],
+    "capacity": ["楼层,楼层容量,楼层剩余容量"] + [f"{floor},100,100" for floor in range(1, 6)],
+}
+
+
+def write_fixture_tables(directory, tables=None):
+    """在directory/csv下写入测试数据（tables按表名覆盖默认内容）"""
+    csv_dir = os.path.join(directory, "csv")
+    os.makedirs(csv_dir, exist_ok=True)
+    for table, lines in {**FIXTURE_TABLES, **(tables or {})}.items():
+        with open(os.path.join(csv_dir, f"{table}.csv"), "w", encoding="utf-8-sig") as f:
+            f.write("\n".join(lines) + "\n")
+
+
+def reset_state():
+    """清空进程内的缓存与派生状态"""
+    from utils import invalidate_cache
+    from index_manager import index_manager
+    from idempotency import idempotency_store
+    from change_feed import change_log
+
+    invalidate_cache()
+    for entry in index_manager._entries.values():
+        entry.value = None
+        entry.version = None
+    with idempotency_store._lock:
+        idempotency_store._entries.clear()
+        idempotency_store._size = 0
+    with change_log._lock:
+        change_log._entries.clear()
+
+
+@pytest.fixture(autouse=True)
+def data_dir(tmp_path, monkeypatch):
+    write_fixture_tables(str(tmp_path))
+    monkeypatch.chdir(tmp_path)
+    reset_state()
+    yield tmp_path
+    reset_state()
+
+
+@pytest.fixture
+def app():
+    from app import app as flask_app
+    flask_app.config["TESTING"] = True
+    return flask_app
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
@@ -0,0 +1,42 @@
+import pytest
+
+
+def batch_detail(client, payload):
+    response = client.post("/api/inventory/batch-detail", json=payload)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_found_and_missing_ids_are_reported_separately(client):
+    body = batch_detail(client, {"inventory_ids": [3, 99, 1]})
+    assert sorted(body["data"]) == ["1", "3"]
+    assert body["not_found"] == [99]
+    assert body["total"] == 2
+    detail = body["data"]["3"]["data"]
+    assert (detail["product"]["货号"], detail["manufacturer"]["厂家"], detail["location"]["楼层"]) == \
+           ("HB003", "华盛纽扣", 2)
+    # 默认不返回操作记录明细，统计仍基于全部记录
+    assert detail["operations"] == []
+    assert body["data"]["1"]["data"]["operation_stats"]["current_stock"] == 8
+
+
+def test_only_missing_ids(client):
+    body = batch_detail(client, {"inventory_ids": [98, 99]})
+    assert (body["data"], body["not_found"], body["total"]) == ({}, [98, 99], 0)
+
+
+def test_matches_single_detail_when_operations_are_included(client):
+    body = batch_detail(client, {"inventory_ids": [1], "include_operations": True})
+    single = client.get("/api/inventory/1").get_json()
+    assert body["data"]["1"] == {"data": single["data"], "pagination": single["pagination"]}
+
+
+@pytest.mark.parametrize("payload, message", [
+    ({"inventory_ids": []}, "inventory_ids必须为非空列表"),
+    ({"inventory_ids": ["x"]}, "无效的库存ID"),
+    ({"inventory_ids": [1], "page": "x"}, "page和page_size必须为整数"),
+])
+def test_invalid_requests_return_400(client, payload, message):
+    response = client.post("/api/inventory/batch-detail", json=payload)
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
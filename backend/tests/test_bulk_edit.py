@@ -0,0 +1,98 @@
+from utils import get_data_version, read_csv_data
+
+
+def bulk_edit(client, body):
+    return client.post("/api/inventory/bulk-edit", json=body)
+
+
+def snapshot():
+    return {table: df.copy() for table, df in read_csv_data().items()}
+
+
+def assert_unchanged(before):
+    after = read_csv_data()
+    for table, df in before.items():
+        assert after[table].equals(df), f"{table} 表被修改"
+
+
+def feature_color(feature_id):
+    features = read_csv_data()["feature"]
+    return features.loc[features["商品特征ID"] == feature_id, "颜色"].iloc[0]
+
+
+def test_edits_apply_in_one_write_with_per_item_results(client):
+    version = get_data_version()
+    response = bulk_edit(client, {"edits": [{"库存ID": 3, "版本": 0, "颜色": "黑色"},
+                                            {"库存ID": 4, "版本": 0, "颜色": "白色"}]})
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert (data["success_count"], data["error_count"]) == (2, 0)
+    assert [(item["库存ID"], item["status"], item["version"]) for item in data["results"]] == \
+           [(3, "success", 1), (4, "success", 1)]
+    assert get_data_version() == version + 1
+    assert (feature_color(3), feature_color(4)) == ("黑色", "白色")
+
+
+def test_atomic_batch_with_one_stale_item_changes_nothing(client):
+    before = snapshot()
+    version = get_data_version()
+    response = bulk_edit(client, {"atomic": True, "edits": [{"库存ID": 3, "版本": 0, "颜色": "黑色"},
+                                                            {"库存ID": 4, "版本": 5, "颜色": "白色"}]})
+    assert response.status_code == 400
+    data = response.get_json()["data"]
+    assert data["success_count"] == 0
+    failed = next(item for item in data["results"] if item["status"] == "error")
+    assert (failed["库存ID"], failed["code"]) == (4, 409)
+    assert get_data_version() == version
+    assert_unchanged(before)
+
+
+def test_non_atomic_batch_saves_valid_items_only(client):
+    response = bulk_edit(client, {"edits": [{"库存ID": 3, "版本": 0, "颜色": "黑色"},
+                                            {"库存ID": 4, "版本": 5, "颜色": "白色"},
+                                            {"库存ID": 99, "版本": 0, "颜色": "灰色"},
+                                            {"库存ID": 3, "版本": 0, "颜色": "棕色"}]})
+    assert response.status_code == 200
+    results = response.get_json()["data"]["results"]
+    assert [(item["status"], item.get("code")) for item in results] == \
+           [("success", None), ("error", 409), ("error", 404), ("error", 400)]
+    assert (feature_color(3), feature_color(4)) == ("黑色", "绿色")
+
+
+def test_all_items_invalid_returns_400_without_writing(client):
+    before = snapshot()
+    response = bulk_edit(client, {"edits": [{"库存ID": 4, "颜色": "白色"}]})
+    assert response.status_code == 400
+    assert_unchanged(before)
+
+
+def test_shared_records_bump_each_inventory_version_once(client):
+    # 库存1、4共用厂家1：同一批次内两条都修改该厂家，各自只递增一次
+    response = bulk_edit(client, {"edits": [{"库存ID": 1, "版本": 0, "电话": "555"},
+                                            {"库存ID": 4, "版本": 0, "颜色": "白色"}]})
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert [item["version"] for item in data["results"]] == [1, 1]
+    assert data["versioned_count"] == 2
+
+
+def test_filter_patch_edits_matching_inventories(client):
+    response = bulk_edit(client, {"filter": {"颜色": ["红色"]}, "patch": {"材质": "不锈钢", "版本": 99}})
+    assert response.status_code == 200, response.get_json()
+    assert sorted(item["库存ID"] for item in response.get_json()["data"]["results"]) == [2, 3]
+    features = read_csv_data()["feature"].set_index("商品特征ID")
+    assert features.loc[[2, 3], "材质"].tolist() == ["不锈钢", "不锈钢"]
+    assert features.loc[[1, 4], "材质"].tolist() == ["铁", "铁"]
+
+
+def test_filter_without_matches_returns_404(client):
+    response = bulk_edit(client, {"filter": {"颜色": ["透明"]}, "patch": {"材质": "铜"}})
+    assert response.status_code == 404
+
+
+def test_request_shape_errors(client):
+    assert bulk_edit(client, {}).status_code == 400
+    assert bulk_edit(client, {"edits": []}).status_code == 400
+    assert bulk_edit(client, {"filter": {"颜色": ["红色"]}}).status_code == 400
+    assert bulk_edit(client, {"edits": [{"库存ID": 1, "版本": 0}], "filter": {"颜色": ["红色"]},
+                              "patch": {"材质": "铜"}}).status_code == 400
@@ -0,0 +1,112 @@
+import io
+import threading
+
+import pytest
+
+from utils import read_csv_data
+
+HEADER = "货号,类型,地址类型,楼层,入库数量,架号,框号,包号,颜色"
+
+
+def import_file(client, lines, filename="items.csv", encoding="utf-8-sig", **form):
+    content = ("\n".join(lines) + "\n").encode(encoding)
+    return client.post("/api/import", content_type="multipart/form-data",
+                       data={"file": (io.BytesIO(content), filename), "入库时间": "2025-11-25 10:00:00", **form})
+
+
+def inventory_count():
+    return len(read_csv_data()["inventory"])
+
+
+def test_rows_are_imported_in_chunks_with_file_row_numbers(client):
+    response = import_file(client, [
+        HEADER,
+        "I1,样品,1,1,5,A,1,1,红色",
+        "I2,未知,1,1,5,A,1,1,",
+        ",,,,,,,,",
+        "I3,样品,1,1,0,A,1,1,",
+        "I4,大货,1,2,3,B,2,1,蓝色",
+    ], chunk_size="2")
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert (data["total_rows"], data["success_count"], data["error_count"]) == (4, 2, 2)
+    # 行号按文件计（表头为第1行）；空行跳过但占行号，仍计入所在块的行数
+    assert [error.split("记录")[0] for error in data["errors"]] == ["第3条", "第5条"]
+    assert [(chunk["start_row"], chunk["end_row"], chunk["success_count"]) for chunk in data["chunks"]] == \
+           [(2, 3, 1), (5, 5, 0), (6, 6, 1)]
+    assert inventory_count() == 6
+    records = read_csv_data()["operation_record"]
+    assert set(records.loc[records["操作ID"] > 6, "操作时间"]) == {"2025-11-25 10:00:00"}
+
+
+def test_failed_chunk_does_not_roll_back_earlier_chunks(client):
+    response = import_file(client, [HEADER, "J1,样品,1,1,5,A,1,1,", "J2,未知,1,1,5,A,1,1,"], chunk_size="1")
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert [chunk["status"] for chunk in data["chunks"]] == ["success", "error"]
+    assert inventory_count() == 5
+
+
+def test_gb18030_csv_is_decoded(client):
+    response = import_file(client, [HEADER, "G1,样品,1,1,5,A,1,1,红色"], encoding="gb18030")
+    assert response.status_code == 200, response.get_json()
+    features = read_csv_data()["feature"]
+    assert features["颜色"].iloc[-1] == "红色"
+
+
+def test_xlsx_import(client):
+    openpyxl = pytest.importorskip("openpyxl")
+    workbook = openpyxl.Workbook()
+    sheet = workbook.active
+    sheet.append(HEADER.split(","))
+    sheet.append(["X1", "样品", 1, 1, 5, "A", 1, 1, "白色"])
+    sheet.append([None] * 9)
+    sheet.append(["X2", "样品", 1, 1, "abc", "A", 1, 1, None])
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    response = client.post("/api/import", content_type="multipart/form-data",
+                           data={"file": (io.BytesIO(buffer.getvalue()), "items.xlsx")})
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    assert (data["success_count"], data["error_count"]) == (1, 1)
+    assert data["errors"][0].startswith("第4条记录")
+
+
+@pytest.mark.parametrize("lines, filename, form, message", [
+    ([HEADER, "I1,样品,1,1,5,A,1,1,"], "items.txt", {}, "不支持的文件类型"),
+    (["货号,类型", "I1,样品"], "items.csv", {}, "文件缺少必需的列"),
+    ([HEADER], "items.csv", {}, "文件中没有入库数据"),
+    ([HEADER, "I1,样品,1,1,5,A,1,1,"], "items.csv", {"chunk_size": "x"}, "chunk_size"),
+    ([HEADER, "I1,样品,1,1,5,A,1,1,"], "items.csv", {"入库时间": "13:00"}, "时间格式不正确"),
+])
+def test_invalid_files_return_400(client, lines, filename, form, message):
+    response = import_file(client, lines, filename=filename, **form)
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
+    assert inventory_count() == 4
+
+
+def test_missing_file_returns_400(client):
+    response = client.post("/api/import", content_type="multipart/form-data", data={})
+    assert response.status_code == 400
+
+
+def test_concurrent_imports_keep_every_row(client, app):
+    barrier = threading.Barrier(4)
+    responses = []
+
+    def worker(batch):
+        lines = [HEADER] + [f"P{batch}-{index},样品,1,1,1,P{batch},{index},1," for index in range(20)]
+        with app.test_client() as worker_client:
+            barrier.wait()
+            responses.append(import_file(worker_client, lines, chunk_size="5"))
+
+    threads = [threading.Thread(target=worker, args=(batch,)) for batch in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.get_json()["data"]["success_count"] for response in responses] == [20] * 4
+    inventory_ids = read_csv_data()["inventory"]["库存ID"].astype(int)
+    assert len(inventory_ids) == 4 + 80 and inventory_ids.is_unique
@@ -0,0 +1,64 @@
+from utils import DATA_VERSION_BOOT_ID, get_data_version, invalidate_cache
+
+
+def changes(client, since, **params):
+    response = client.get("/api/changes", query_string={"since": since, "boot_id": DATA_VERSION_BOOT_ID, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_stock_out_returns_changed_rows_and_operations(client):
+    since = get_data_version()
+    assert client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 4, "out_quantity": 1}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}).status_code == 200
+
+    result = changes(client, since)
+    assert result["resync"] is False
+    assert result["version"] == since + 1
+    assert [row["库存ID"] for row in result["upserted"]] == [4]
+    assert [(op["关联库存ID"], op["操作类型"]) for op in result["operations"]] == [(4, "出库")]
+    assert result["deleted"] == []
+    # 已同步到最新版本时没有变更
+    latest = changes(client, result["version"])
+    assert (latest["upserted"], latest["deleted"], latest["operations"]) == ([], [], [])
+
+
+def test_shared_record_edit_returns_every_affected_row(client):
+    since = get_data_version()
+    assert client.post("/api/inventory/1/edit", json={"厂家地址": "五楼E区", "版本": 0}).status_code == 200
+    result = changes(client, since, fields="库存ID,版本")
+    assert sorted((row["库存ID"], row["版本"]) for row in result["upserted"]) == [(1, 1), (4, 1)]
+
+
+def test_delete_is_recorded_in_deleted(client):
+    since = get_data_version()
+    assert client.post("/api/inventory/batch-delete", json={"inventory_ids": [3]}).status_code == 200
+    assert client.delete("/api/inventory/4").status_code == 200
+    result = changes(client, since)
+    assert result["resync"] is False
+    assert result["deleted"] == [3, 4]
+    # 厂家1/位置1仍被库存1引用，删除库存4后其行不因孤立记录清理而变化
+    assert [row["库存ID"] for row in result["upserted"]] == []
+
+
+def test_unrecorded_writes_and_stale_clients_resync(client):
+    since = get_data_version()
+    invalidate_cache()
+    assert changes(client, since)["resync"] is True
+
+    assert changes(client, "")["resync"] is True
+    assert changes(client, get_data_version() + 5)["resync"] is True
+    other_boot = client.get("/api/changes", query_string={"since": get_data_version(), "boot_id": "other"})
+    assert other_boot.get_json()["resync"] is True
+    assert client.get("/api/changes?since=abc").status_code == 400
+
+
+def test_undo_forces_resync(client):
+    assert client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": "WJ001", "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 2,
+                            "架号": "A", "框号": "1", "包号": "1"}],
+        "入库时间": "2025-11-23 08:00:00"}).status_code == 200
+    since = get_data_version()
+    assert client.post("/api/undo-last-change", json={}).status_code == 200
+    assert changes(client, since)["resync"] is True
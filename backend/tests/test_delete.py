@@ -0,0 +1,76 @@
+from conftest import reset_state
+from utils import get_data_version, read_csv_data
+
+
+def batch_delete(client, inventory_ids, atomic=False):
+    return client.post("/api/inventory/batch-delete", json={"inventory_ids": inventory_ids, "atomic": atomic})
+
+
+def ids(table, column):
+    return sorted(read_csv_data()[table][column].astype(int).tolist())
+
+
+def test_batch_delete_removes_rows_and_orphans_only(client):
+    response = batch_delete(client, [3, 4])
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    # 特征3/4、位置3、厂家3不再被引用；位置1、厂家1仍被库存1引用
+    assert (data["deleted_feature_ids"], data["deleted_location_ids"], data["deleted_manufacturer_ids"]) == \
+           ([3, 4], [3], [3])
+    assert ids("inventory", "库存ID") == [1, 2]
+    assert ids("feature", "商品特征ID") == [1, 2]
+    assert ids("location", "地址ID") == [1, 2]
+    assert ids("manufacturer", "厂家ID") == [1, 2]
+    # 入库记录随库存保留在操作记录表中
+    assert len(read_csv_data()["operation_record"]) == 6
+
+
+def test_deleted_rows_stay_deleted_after_reload(client):
+    assert batch_delete(client, [3]).status_code == 200
+    reset_state()
+    assert ids("inventory", "库存ID") == [1, 2, 4]
+    assert client.get("/api/inventory/3").status_code == 404
+    assert 3 not in [row["库存ID"] for row in client.get("/api/inventory").get_json()["data"]]
+
+
+def test_atomic_batch_with_blocked_item_deletes_nothing(client):
+    version = get_data_version()
+    response = batch_delete(client, [3, 1], atomic=True)
+    assert response.status_code == 400
+    results = response.get_json()["data"]["results"]
+    assert [(item["库存ID"], item["status"]) for item in results] == [(3, "success"), (1, "error")]
+    assert get_data_version() == version
+    assert ids("inventory", "库存ID") == [1, 2, 3, 4]
+    assert ids("feature", "商品特征ID") == [1, 2, 3, 4]
+
+
+def test_non_atomic_batch_deletes_valid_items_and_reports_the_rest(client):
+    response = batch_delete(client, [3, 1, 2, 99, "x", 3])
+    assert response.status_code == 200
+    data = response.get_json()["data"]
+    assert [(item["status"], item.get("code")) for item in data["results"]] == \
+           [("success", None), ("error", 400), ("error", 400), ("error", 404), ("error", 400), ("error", 400)]
+    assert (data["success_count"], data["error_count"]) == (1, 5)
+    assert ids("inventory", "库存ID") == [1, 2, 4]
+
+
+def test_batch_with_no_deletable_items_returns_400(client):
+    assert batch_delete(client, [1, 2]).status_code == 400
+    assert batch_delete(client, []).status_code == 400
+    assert ids("inventory", "库存ID") == [1, 2, 3, 4]
+
+
+def test_single_delete_then_repeat_returns_404(client):
+    assert client.delete("/api/inventory/4").status_code == 200
+    # 位置1、厂家1仍被库存1引用，特征4被清理
+    assert ids("location", "地址ID") == [1, 2, 3]
+    assert ids("feature", "商品特征ID") == [1, 2, 3]
+    assert client.delete("/api/inventory/4").status_code == 404
+    assert client.delete("/api/inventory/abc").status_code == 400
+
+
+def test_inventory_with_non_stock_in_records_cannot_be_deleted(client):
+    for inventory_id in (1, 2):
+        response = client.delete(f"/api/inventory/{inventory_id}")
+        assert response.status_code == 400
+    assert ids("inventory", "库存ID") == [1, 2, 3, 4]
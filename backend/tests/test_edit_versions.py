@@ -0,0 +1,72 @@
+import threading
+
+from utils import read_csv_data
+
+
+def versions():
+    inventory = read_csv_data()["inventory"]
+    return dict(zip(inventory["库存ID"].astype(int), inventory["版本"].astype(int)))
+
+
+def edit(client, inventory_id, **fields):
+    return client.post(f"/api/inventory/{inventory_id}/edit", json=fields)
+
+
+def test_edit_bumps_version_and_stale_version_returns_409(client):
+    response = edit(client, 4, 颜色="黑色", 版本=0)
+    assert response.status_code == 200, response.get_json()
+    assert response.get_json()["data"]["version"] == 1
+
+    stale = edit(client, 4, 颜色="白色", 版本=0)
+    assert stale.status_code == 409
+    conflict = stale.get_json()["data"]
+    assert (conflict["submitted_version"], conflict["current_version"]) == (0, 1)
+    assert conflict["inventory"]["版本"] == 1
+
+    features = read_csv_data()["feature"]
+    assert features.loc[features["商品特征ID"] == 4, "颜色"].iloc[0] == "黑色"
+    assert edit(client, 4, 颜色="白色", 版本=1).status_code == 200
+    assert versions()[4] == 2
+
+
+def test_missing_or_invalid_version_returns_400(client):
+    assert edit(client, 4, 颜色="黑色").status_code == 400
+    assert edit(client, 4, 颜色="黑色", 版本="x").status_code == 400
+    assert versions() == {1: 0, 2: 0, 3: 0, 4: 0}
+
+
+def test_editing_shared_records_bumps_every_referencing_inventory(client):
+    # 库存1与库存4共用位置1、厂家1、商品1：修改共享记录后两者的详情都变化
+    assert edit(client, 1, 厂家地址="五楼E区", 版本=0).status_code == 200
+    assert versions() == {1: 1, 2: 0, 3: 0, 4: 1}
+    assert edit(client, 4, 颜色="黑色", 版本=0).status_code == 409
+
+    # 仅修改库存自身的特征（特征1只被库存1引用）不影响库存4
+    assert edit(client, 1, 颜色="黑色", 版本=1).status_code == 200
+    assert versions() == {1: 2, 2: 0, 3: 0, 4: 1}
+
+
+def test_concurrent_edits_with_same_version_only_one_wins(client, app):
+    results = []
+    barrier = threading.Barrier(4)
+
+    def worker(color):
+        with app.test_client() as worker_client:
+            barrier.wait()
+            results.append(edit(worker_client, 4, 颜色=color, 版本=0).status_code)
+
+    threads = [threading.Thread(target=worker, args=(color,)) for color in ["黑色", "白色", "灰色", "棕色"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(results) == [200, 409, 409, 409]
+    assert versions()[4] == 1
+
+
+def test_list_and_detail_expose_current_version(client):
+    assert edit(client, 4, 颜色="黑色", 版本=0).status_code == 200
+    item = next(row for row in client.get("/api/inventory").get_json()["data"] if row["库存ID"] == 4)
+    assert item["版本"] == 1
+    detail = client.get("/api/inventory/4").get_json()
+    assert detail["data"]["inventory"]["版本"] == 1
@@ -0,0 +1,77 @@
+import json
+import queue
+
+import pytest
+
+from event_stream import broker, format_sse, stream_events
+from utils import get_data_version, invalidate_cache
+
+
+@pytest.fixture
+def subscriber():
+    subscriber = broker.subscribe()
+    yield subscriber
+    broker.unsubscribe(subscriber)
+
+
+def drain(subscriber):
+    messages = []
+    while True:
+        try:
+            messages.append(subscriber.queue.get_nowait())
+        except queue.Empty:
+            return messages
+
+
+def test_stock_out_publishes_balances_and_operation_summary(client, subscriber):
+    assert client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 4, "out_quantity": 3}, {"inventory_id": 1, "out_quantity": 1}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}).status_code == 200
+
+    [(event_name, version, message)] = drain(subscriber)
+    assert (event_name, version, message["version"]) == ("change", get_data_version(), get_data_version())
+    assert message["type"] == "stock_out"
+    assert sorted((item["库存ID"], item["库存数量"]) for item in message["inventory"]) == [(1, 7.0), (4, 5.0)]
+    assert message["operations"] == {"出库": {"次数": 2, "数量": 4.0}}
+    assert "deleted" not in message
+
+
+def test_delete_publishes_deleted_ids(client, subscriber):
+    assert client.post("/api/inventory/batch-delete", json={"inventory_ids": [3, 4]}).status_code == 200
+    [(event_name, _, message)] = drain(subscriber)
+    assert (event_name, message["type"], message["deleted"]) == ("change", "delete", [3, 4])
+    assert message["inventory"] == []
+
+
+def test_undo_and_direct_invalidate_publish_resync(client, subscriber):
+    assert client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": "WJ001", "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 2,
+                            "架号": "A", "框号": "1", "包号": "1"}],
+        "入库时间": "2025-11-23 08:00:00"}).status_code == 200
+    drain(subscriber)
+
+    assert client.post("/api/undo-last-change", json={}).status_code == 200
+    messages = drain(subscriber)
+    assert messages and all(event_name == "resync" for event_name, _, _ in messages)
+    assert messages[-1][2]["version"] == get_data_version()
+
+    invalidate_cache()
+    assert [event_name for event_name, _, _ in drain(subscriber)] == ["resync"]
+
+
+def test_stream_sends_hello_then_events_and_resync_on_overflow(subscriber):
+    stream = stream_events(subscriber)
+    hello = next(stream)
+    assert hello.startswith("event: hello\n")
+    assert json.loads(hello.split("data: ", 1)[1])["version"] == get_data_version()
+
+    subscriber.offer(("change", 7, {"version": 7}))
+    assert next(stream) == format_sse("change", {"version": 7}, event_id=7)
+
+    for version in range(subscriber.queue.maxsize + 1):
+        subscriber.offer(("change", version, {"version": version}))
+    assert subscriber.overflowed
+    assert next(stream).startswith("event: resync\n")
+    assert subscriber.queue.empty()
+    stream.close()
+    assert broker.subscriber_count() == 0
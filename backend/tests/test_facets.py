@@ -0,0 +1,33 @@
+def facets(client, **params):
+    response = client.get("/api/inventory/facets", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    body = response.get_json()
+    return body, {field: {item["value"]: item["count"] for item in items} for field, items in body["data"].items()}
+
+
+def test_unfiltered_counts(client):
+    body, counts = facets(client)
+    assert body["total"] == 4
+    assert counts["颜色"] == {"红色": 2, "绿色": 1, "蓝色": 1}
+    assert counts["厂家"] == {"锦发五金": 2, "华美辅料": 1, "华盛纽扣": 1}
+    assert counts["楼层"] == {"1": 3, "2": 1}
+    # 按数量倒序
+    assert body["data"]["类型"][0] == {"value": "样品", "count": 2}
+
+
+def test_filter_applies_to_other_fields_but_not_its_own(client):
+    body, counts = facets(client, 颜色="红色")
+    assert body["total"] == 2
+    assert body["filters"] == {"颜色": ["红色"]}
+    assert counts["材质"] == {"铁": 1, "铜": 1}
+    assert counts["厂家"] == {"华美辅料": 1, "华盛纽扣": 1}
+    assert counts["楼层"] == {"1": 1, "2": 1}
+    # 自身字段不受本字段筛选影响，仍可切换其他颜色
+    assert counts["颜色"] == {"红色": 2, "绿色": 1, "蓝色": 1}
+
+
+def test_multiple_values_and_fields_combine(client):
+    body, counts = facets(client, 颜色="红色,绿色", 材质="铁")
+    assert body["total"] == 2
+    assert counts["类型"] == {"HB": 1, "样品": 1}
+    assert counts["颜色"] == {"红色": 1, "绿色": 1, "蓝色": 1}
@@ -0,0 +1,119 @@
+import io
+
+from idempotency import IDEMPOTENCY_KEY_MAX_LENGTH, IdempotencyStore
+from utils import read_csv_data
+
+STOCK_OUT = {"stock_out_items": [{"inventory_id": 4, "out_quantity": 1}],
+             "operator": "张三", "out_time": "2025-11-24 10:00:00"}
+IMPORT_HEADER = "货号,类型,地址类型,楼层,入库数量,架号,框号,包号\n"
+
+
+def stock_out(client, key, body=None):
+    return client.post("/api/batch-stock-out", json=body or STOCK_OUT, headers={"Idempotency-Key": key})
+
+
+def operation_count(inventory_id):
+    """出库/借出只追加操作记录，不修改库存数量"""
+    records = read_csv_data()["operation_record"]
+    return int((records["关联库存ID"] == inventory_id).sum())
+
+
+def import_csv(client, key, content, filename="a.csv", in_time="2025-11-25 10:00:00"):
+    return client.post("/api/import", content_type="multipart/form-data", headers={"Idempotency-Key": key},
+                       data={"file": (io.BytesIO(content.encode("utf-8-sig")), filename), "入库时间": in_time})
+
+
+def test_replay_returns_saved_response_without_writing_again(client):
+    first = stock_out(client, "out-1")
+    assert first.status_code == 200
+    assert operation_count(4) == 2
+
+    replay = stock_out(client, "out-1")
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert replay.get_data() == first.get_data()
+    assert operation_count(4) == 2
+
+
+def test_different_body_with_same_key_returns_422(client):
+    assert stock_out(client, "out-2").status_code == 200
+    other = {**STOCK_OUT, "stock_out_items": [{"inventory_id": 4, "out_quantity": 2}]}
+    response = stock_out(client, "out-2", other)
+    assert response.status_code == 422
+    assert operation_count(4) == 2
+
+
+def test_keys_are_scoped_by_path_and_requests_without_key_run_normally(client):
+    assert stock_out(client, "shared").status_code == 200
+    lend = client.post("/api/inventory/lend", headers={"Idempotency-Key": "shared"},
+                       json={"lend_items": [{"inventory_id": 4, "quantity": 1}], "operator": "王五",
+                             "out_time": "2025-11-24 11:00:00"})
+    assert lend.status_code == 200
+    assert "Idempotent-Replayed" not in lend.headers
+    assert client.post("/api/batch-stock-out", json=STOCK_OUT).status_code == 200
+    assert operation_count(4) == 4
+
+
+def test_error_responses_are_replayed_too(client):
+    body = {**STOCK_OUT, "stock_out_items": [{"inventory_id": 4, "out_quantity": 99}]}
+    first = stock_out(client, "too-many", body)
+    assert first.status_code == 400
+    replay = stock_out(client, "too-many", body)
+    assert replay.status_code == 400
+    assert replay.headers["Idempotent-Replayed"] == "true"
+
+
+def test_too_long_key_returns_400(client):
+    response = stock_out(client, "k" * (IDEMPOTENCY_KEY_MAX_LENGTH + 1))
+    assert response.status_code == 400
+    assert operation_count(4) == 1
+
+
+def test_multipart_replay_and_same_length_content_mismatch(client):
+    content = IMPORT_HEADER + "ZZ001,样品,1,1,5,A,1,1\n"
+    same_length = IMPORT_HEADER + "ZZ002,样品,1,1,5,A,1,1\n"
+    assert len(content) == len(same_length)
+
+    first = import_csv(client, "import-1", content)
+    assert first.status_code == 200, first.get_json()
+    inventory_rows = len(read_csv_data()["inventory"])
+
+    replay = import_csv(client, "import-1", content)
+    assert replay.status_code == 200
+    assert replay.headers["Idempotent-Replayed"] == "true"
+    assert len(read_csv_data()["inventory"]) == inventory_rows
+
+    assert import_csv(client, "import-1", same_length).status_code == 422
+    assert import_csv(client, "import-1", content, filename="b.csv").status_code == 422
+    assert import_csv(client, "import-1", content, in_time="2025-11-26 10:00:00").status_code == 422
+    assert len(read_csv_data()["inventory"]) == inventory_rows
+
+
+def test_store_expires_and_evicts_oldest_entries(monkeypatch):
+    store = IdempotencyStore(max_bytes=10, ttl=60)
+    now = [1000.0]
+    monkeypatch.setattr("idempotency.time.time", lambda: now[0])
+
+    assert store.begin("a", "fa") == ("new", None)
+    assert store.begin("a", "fa") == ("in_progress", None)
+    store.finish("a", 200, b"123456", "application/json")
+    assert store.begin("a", "fa") == ("replay", (200, b"123456", "application/json"))
+    assert store.begin("a", "other") == ("mismatch", None)
+
+    # 超出字节上限淘汰最早的条目
+    assert store.begin("b", "fb")[0] == "new"
+    store.finish("b", 200, b"123456", "application/json")
+    assert store.begin("a", "fa") == ("new", None)
+    store.release("a")
+    assert store.stats()["entries"] == 1
+
+    # 过期后同一键视为新请求
+    now[0] += 61
+    assert store.begin("b", "fb") == ("new", None)
+
+
+def test_store_skips_oversized_responses():
+    store = IdempotencyStore(max_bytes=10, ttl=60)
+    store.begin("a", "fa")
+    store.finish("a", 200, b"x" * 11, "application/json")
+    assert store.begin("a", "fa") == ("new", None)
@@ -0,0 +1,165 @@
+"""各类写入后，增量补丁得到的派生索引及读接口结果须与按写入后数据全量重建的一致"""
+import io
+import math
+import os
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from image import UPLOAD_FOLDER
+from index_manager import index_manager
+from response_cache import response_cache
+from utils import get_data_version
+
+STOCK_IN_TIME = "2025-11-23 08:00:00"
+
+WRITES = {
+    "stock_in_existing": ("POST", "/api/batch-stock-in", {
+        "stock_in_items": [{"货号": "WJ001", "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 3, "架号": "A",
+                            "框号": "1", "包号": "1", "颜色": "蓝色", "材质": "铁", "单价": 1.5, "重量": 10,
+                            "形状": "圆", "厂家": "锦发五金", "厂家地址": "一楼A区", "电话": "111"}],
+        "入库时间": STOCK_IN_TIME}),
+    "stock_in_new": ("POST", "/api/batch-stock-in", {
+        "stock_in_items": [{"货号": "NEW9", "类型": "大货", "地址类型": 2, "楼层": 3, "入库数量": 7, "架号": "C",
+                            "框号": "9", "包号": "1", "颜色": "紫色", "厂家": "华新五金", "电话": "999"},
+                           {"货号": "NEW9", "类型": "大货", "地址类型": 2, "楼层": 3, "入库数量": 2, "架号": "C",
+                            "框号": "9", "包号": "2", "颜色": "黄色", "厂家": "华新五金", "电话": "999"}],
+        # 早于已有记录的入库时间：时间索引需重新排序
+        "入库时间": "2025-11-19 08:00:00"}),
+    "stock_out": ("POST", "/api/batch-stock-out", {
+        "stock_out_items": [{"inventory_id": 4, "out_quantity": 1}, {"inventory_id": 1, "out_quantity": 2}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}),
+    "lend": ("POST", "/api/inventory/lend", {
+        "lend_items": [{"inventory_id": 4, "quantity": 2}], "operator": "王五", "out_time": "2025-11-24 11:00:00"}),
+    "return": ("POST", "/api/inventory/return", {
+        "return_items": [{"inventory_id": 2, "quantity": 1}], "operator": "李四", "return_time": "2025-11-24 12:00:00"}),
+    "edit": ("POST", "/api/inventory/4/edit", {
+        "颜色": "黑色", "楼层": 2, "架号": "B", "厂家": "华美辅料", "厂家地址": "二楼B区", "电话": "222", "版本": 0}),
+    "edit_product": ("POST", "/api/inventory/1/edit", {"类型": "大货", "备注": "改类型", "版本": 0}),
+    "bulk_edit": ("POST", "/api/inventory/bulk-edit", {
+        "filter": {"颜色": ["红色"]}, "patch": {"材质": "不锈钢", "状态": "待检"}}),
+    "delete": ("POST", "/api/inventory/batch-delete", {"inventory_ids": [3, 4]}),
+}
+
+READS = [
+    ("GET", "/api/inventory", None),
+    ("GET", "/api/inventory?fields=库存ID,库存数量,版本&expand=location,manufacturer", None),
+    ("GET", "/api/inventory/facets", None),
+    ("GET", "/api/inventory/facets?颜色=红色", None),
+    ("GET", "/api/search?q=WJ", None),
+    ("GET", "/api/search?q=华", None),
+    ("GET", "/api/locations/tree", None),
+    ("GET", "/api/reports/movements?granularity=day", None),
+    ("GET", "/api/reports/movements?granularity=week&group_by=类型", None),
+    ("GET", "/api/manufacturers/suggest?q=华", None),
+    ("GET", "/api/get_operation_records", None),
+    ("GET", "/api/get_operation_records?limit=3", None),
+    ("GET", "/api/get_operation_records?start_date=2025-11-21&end_date=2025-11-30", None),
+    ("POST", "/api/inventory/batch-detail", {"inventory_ids": [1, 2, 3, 4, 5, 6]}),
+    ("POST", "/api/inventory/last-address-info", {}),
+]
+
+VOLATILE_KEYS = {"performance", "total_time", "query_time", "查询耗时"}
+SKIPPED_ATTRIBUTES = {"lock", "_lock", "_rendered"}
+
+
+def comparable(value):
+    """把索引对象/接口结果转为可比较的结构（字典按键排序，忽略空集合与锁、渲染缓存等）"""
+    if isinstance(value, np.ndarray):
+        return [comparable(item) for item in value.tolist()]
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return comparable(value.to_dict())
+    if isinstance(value, dict):
+        return sorted((repr(key), comparable(item)) for key, item in value.items()
+                      if key not in VOLATILE_KEYS and not (isinstance(item, (set, list, dict)) and not item))
+    if isinstance(value, (set, frozenset)):
+        return sorted(repr(comparable(item)) for item in value)
+    if isinstance(value, (list, tuple)):
+        return [comparable(item) for item in value]
+    if isinstance(value, np.generic):
+        return comparable(value.item())
+    if isinstance(value, float) and math.isnan(value):
+        return "nan"
+    if hasattr(value, "__dict__") and not isinstance(value, type):
+        return comparable({key: item for key, item in vars(value).items()
+                           if key not in SKIPPED_ATTRIBUTES and not isinstance(item, type(threading.Lock()))})
+    return value
+
+
+def read_all(client):
+    response_cache.clear()
+    results = []
+    for method, url, body in READS:
+        response = client.open(url, method=method, json=body)
+        assert response.status_code == 200, (url, response.get_json())
+        results.append((url, comparable(response.get_json())))
+    for inventory_id in range(1, 7):
+        response = client.get(f"/api/inventory/{inventory_id}")
+        results.append((inventory_id, response.status_code, comparable(response.get_json())))
+    return results
+
+
+def build_all_indexes():
+    return {name: index_manager.get(name) for name in index_manager._entries}
+
+
+def drop_all_indexes():
+    for entry in index_manager._entries.values():
+        entry.value = None
+        entry.version = None
+
+
+@pytest.mark.parametrize("write", list(WRITES))
+def test_patched_indexes_match_rebuild(client, write):
+    read_all(client)
+    build_all_indexes()
+
+    method, url, body = WRITES[write]
+    response = client.open(url, method=method, json=body)
+    assert response.status_code == 200, response.get_json()
+
+    version = get_data_version()
+    patched_names = {name for name, entry in index_manager._entries.items() if entry.version == version}
+    patched = {name: comparable(index) for name, index in build_all_indexes().items()}
+    patched_reads = read_all(client)
+
+    drop_all_indexes()
+    rebuilt = {name: comparable(index) for name, index in build_all_indexes().items()}
+    assert patched_names, "写入后没有任何索引被增量更新"
+    for name in rebuilt:
+        assert patched[name] == rebuilt[name], f"{write}: 索引 {name} 增量更新结果与全量重建不一致"
+    assert read_all(client) == patched_reads
+
+
+def test_append_writes_are_patched_not_rebuilt(client):
+    build_all_indexes()
+    method, url, body = WRITES["stock_in_new"]
+    assert client.open(url, method=method, json=body).status_code == 200
+    version = get_data_version()
+    patched = {name for name, entry in index_manager._entries.items() if entry.version == version}
+    assert {"inventory_detail", "operation_times", "search", "lookups", "location_tree", "last_address",
+            "movement_rollup", "manufacturers"} <= patched
+
+
+def test_image_upload_updates_indexes_and_version(client):
+    build_all_indexes()
+    version = get_data_version()
+    png = b"\x89PNG\r\n\x1a\n" + b"0" * 64
+    response = client.post("/api/upload-image", data={"product_code": "WJ001", "featureId": "1",
+                                                      "file": (io.BytesIO(png), "a.png")},
+                           content_type="multipart/form-data")
+    assert response.status_code == 200
+    path = response.get_json()["data"]["relative_path"]
+    try:
+        assert get_data_version() == version + 1
+        item = next(row for row in client.get("/api/inventory").get_json()["data"] if row["库存ID"] == 1)
+        assert item["特征信息"]["图片路径"] == path
+        # 上传不递增库存版本号，前端随后带原版本号同步图片路径
+        assert item["版本"] == 0
+        patched = {name: comparable(index) for name, index in build_all_indexes().items()}
+        drop_all_indexes()
+        assert patched == {name: comparable(index) for name, index in build_all_indexes().items()}
+    finally:
+        os.remove(os.path.join(UPLOAD_FOLDER, os.path.basename(path)))
@@ -0,0 +1,87 @@
+import pytest
+
+
+def inventory(client, **params):
+    response = client.get("/api/inventory", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return {row["库存ID"]: row for row in response.get_json()["data"]}
+
+
+def test_default_rows_embed_related_objects_and_computed_quantities(client):
+    rows = inventory(client)
+    assert sorted(rows) == [1, 2, 3, 4]
+    row = rows[1]
+    assert row["商品信息"]["货号"] == "WJ001"
+    assert row["特征信息"]["颜色"] == "蓝色"
+    assert row["位置信息"]["地址ID"] == 1
+    assert row["厂家信息"]["厂家"] == "锦发五金"
+    assert (row["累计入库数量"], row["累计出库数量"], row["库存数量"]) == (10, 2, 8)
+    assert (rows[2]["累计借出数量"], rows[2]["库存数量"]) == (1, 4)
+    # 操作记录不再内嵌
+    assert "操作记录" not in row
+
+
+def test_fields_and_expand_projection(client):
+    rows = inventory(client, fields="库存数量,版本", expand="location")
+    assert set(rows[1]) == {"库存ID", "库存数量", "版本", "位置信息"}
+    assert rows[1]["库存数量"] == 8
+    assert rows[4]["位置信息"]["架号"] == "A"
+
+    rows = inventory(client, fields="批次", expand="")
+    assert set(rows[3]) == {"库存ID", "批次"}
+
+    # 中文名展开与英文名一致；只展开商品时不返回特征信息
+    rows = inventory(client, fields="库存ID", expand="商品信息")
+    assert set(rows[1]) == {"库存ID", "商品信息"} and rows[1]["商品信息"]["货号"] == "WJ001"
+
+
+def test_projected_rows_match_full_rows(client):
+    full = inventory(client)
+    projected = inventory(client, fields="库存数量,累计出库数量,单位", expand="manufacturer")
+    for inventory_id, row in projected.items():
+        assert row == {key: full[inventory_id][key] for key in row}
+
+
+@pytest.mark.parametrize("params, message", [
+    ({"fields": "不存在"}, "fields参数包含未知字段"),
+    ({"expand": "warehouse"}, "expand参数无效"),
+    ({"expand": "operations"}, "操作记录请通过"),
+])
+def test_invalid_projection_returns_400(client, params, message):
+    response = client.get("/api/inventory", query_string=params)
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
+
+
+def test_detail_pages_operation_records(client):
+    response = client.get("/api/inventory/1?page=1&page_size=1")
+    assert response.status_code == 200
+    body = response.get_json()
+    # 页大小下限为10；操作记录按时间倒序
+    assert body["pagination"] == {"total": 2, "page": 1, "page_size": 10, "total_pages": 1}
+    assert [operation["操作类型"] for operation in body["data"]["operations"]] == ["出库", "入库"]
+    assert client.get("/api/inventory/1?page=2").get_json()["data"]["operations"] == []
+    assert client.get("/api/inventory/99").status_code == 404
+
+
+def test_detail_joins_related_rows_and_stats(client):
+    data = client.get("/api/inventory/2").get_json()["data"]
+    assert (data["inventory"]["库存ID"], data["inventory"]["库存数量"], data["inventory"]["累计借出数量"]) == (2, 4, 1)
+    assert data["product"]["货号"] == "WJ002"
+    assert (data["feature"]["颜色"], data["feature"]["材质"]) == ("红色", "铜")
+    assert (data["location"]["地址ID"], data["location"]["包号"]) == (2, 2)
+    assert data["manufacturer"]["厂家"] == "华美辅料"
+    assert [operation["操作类型"] for operation in data["operations"]] == ["借", "入库"]
+    assert data["operation_stats"] == {
+        "total_in_quantity": 5, "total_out_quantity": 0, "total_lend_quantity": 1, "total_return_quantity": 0,
+        "current_stock": 4, "total_operations": 2, "other_operations": {},
+        "last_operation_time": "2025-11-22 11:00:00"}
+
+
+def test_detail_reflects_a_new_operation(client):
+    assert client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 3, "out_quantity": 1}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}).status_code == 200
+    data = client.get("/api/inventory/3").get_json()["data"]
+    assert data["operations"][0]["操作类型"] == "出库"
+    assert (data["operation_stats"]["current_stock"], data["operation_stats"]["total_operations"]) == (2, 2)
@@ -0,0 +1,36 @@
+def last_address(client, **payload):
+    response = client.post("/api/inventory/last-address-info", json=payload)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def address(地址类型, 楼层, 架号, 框号, 包号):
+    return {"地址类型": str(地址类型), "楼层": str(楼层), "架号": 架号, "框号": str(框号), "包号": str(包号)}
+
+
+def test_latest_inventory_address_and_recent_distinct_addresses(client):
+    body = last_address(client, recent=5)
+    # 库存4（地址1）为最近入库；最近地址按入库先后去重
+    assert body["data"] == address(1, 1, "A", 1, 1)
+    assert [entry.pop("地址ID") for entry in body["recent"]] == [1, 3, 2]
+    assert body["recent"] == [address(1, 1, "A", 1, 1), address(2, 2, "B", 3, 1), address(1, 1, "A", 1, 2)]
+    assert "recent" not in last_address(client)
+
+
+def test_pointer_follows_stock_in_and_delete(client):
+    response = client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": "NEW1", "类型": "样品", "地址类型": 1, "楼层": 3, "入库数量": 1,
+                            "架号": "C", "框号": "2", "包号": "5"}],
+        "入库时间": "2025-11-23 08:00:00"})
+    assert response.status_code == 200, response.get_json()
+    assert last_address(client)["data"] == address(1, 3, "C", 2, 5)
+
+    # 删除最近入库的库存后回退到剩余库存中ID最大者
+    assert client.post("/api/inventory/batch-delete", json={"inventory_ids": [5, 4]}).status_code == 200
+    assert last_address(client)["data"] == address(2, 2, "B", 3, 1)
+
+
+def test_invalid_recent_returns_400(client):
+    response = client.post("/api/inventory/last-address-info", json={"recent": "x"})
+    assert response.status_code == 400
+    assert response.get_json()["message"] == "recent必须为整数"
@@ -0,0 +1,38 @@
+def location_tree(client, **params):
+    response = client.get("/api/locations/tree", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def totals(node):
+    return node["库存条数"], node["总数量"]
+
+
+def test_floor_totals_and_leaf_addresses(client):
+    body = location_tree(client)
+    floors = {node["name"]: node for node in body["data"]}
+    # 有容量配置的楼层都会列出，空楼层计数为0
+    assert sorted(floors) == ["1", "2", "3", "4", "5"]
+    # 楼层1：库存1(8) + 库存2(4) + 库存4(8)；楼层2：库存3(3)
+    assert {name: totals(node) for name, node in floors.items()} == \
+           {"1": (3, 20), "2": (1, 3), "3": (0, 0), "4": (0, 0), "5": (0, 0)}
+    assert totals(body["summary"]) == (4, 23)
+
+    frame = floors["1"]["children"][0]["children"][0]
+    assert [(leaf["name"], totals(leaf), leaf["地址ID"]) for leaf in frame["children"]] == \
+           [("1", (2, 16), [1]), ("2", (1, 4), [2])]
+
+
+def test_floor_filter(client):
+    body = location_tree(client, floor="2")
+    assert [node["name"] for node in body["data"]] == ["2"]
+    assert [child["name"] for child in body["data"][0]["children"]] == ["B"]
+
+
+def test_totals_follow_stock_out(client):
+    assert client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 3, "out_quantity": 2}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}).status_code == 200
+    body = location_tree(client, floor="2")
+    assert totals(body["data"][0]) == totals(body["summary"]) == (1, 1)
+    assert totals(location_tree(client)["summary"]) == (4, 21)
@@ -0,0 +1,46 @@
+import pytest
+
+
+def suggest(client, query, **params):
+    response = client.get("/api/manufacturers/suggest", query_string={"q": query, **params})
+    assert response.status_code == 200, response.get_json()
+    return [(item["厂家ID"], item["匹配字段"]) for item in response.get_json()["data"]]
+
+
+def test_name_prefix_matches(client):
+    assert suggest(client, "华") == [(2, "厂家"), (3, "厂家")]
+    assert suggest(client, "华盛") == [(3, "厂家")]
+    assert suggest(client, "华", limit=1) == [(2, "厂家")]
+    assert suggest(client, "盛") == []
+
+
+def test_phone_and_address_prefixes(client):
+    assert suggest(client, "22") == [(2, "电话")]
+    assert suggest(client, "三楼") == [(3, "厂家地址")]
+    # 限定字段后不再匹配厂家名称
+    assert suggest(client, "华", field="电话") == []
+
+
+def test_returns_manufacturer_details(client):
+    response = client.get("/api/manufacturers/suggest", query_string={"q": "锦发"})
+    assert response.get_json()["data"] == [
+        {"厂家ID": 1, "厂家": "锦发五金", "厂家地址": "一楼A区", "电话": "111", "匹配字段": "厂家"}]
+
+
+def test_new_manufacturer_is_suggested_after_stock_in(client):
+    response = client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": "NEW1", "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 1,
+                            "架号": "A", "框号": "1", "包号": "1", "厂家": "华丰包装", "电话": "444"}],
+        "入库时间": "2025-11-23 08:00:00"})
+    assert response.status_code == 200, response.get_json()
+    assert suggest(client, "华") == [(2, "厂家"), (3, "厂家"), (4, "厂家")]
+
+
+@pytest.mark.parametrize("params, message", [
+    ({"field": "传真"}, "field参数无效"),
+    ({"limit": "x"}, "limit必须为整数"),
+])
+def test_invalid_parameters_return_400(client, params, message):
+    response = client.get("/api/manufacturers/suggest", query_string={"q": "华", **params})
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
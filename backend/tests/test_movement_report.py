@@ -0,0 +1,60 @@
+import pytest
+
+
+def report(client, **params):
+    response = client.get("/api/reports/movements", query_string=params)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def rows(body, *dimensions):
+    return {(item["period"],) + tuple(item[field] for field in dimensions): (item["次数"], item["数量"])
+            for item in body["data"]}
+
+
+def stock_out_next_week(client):
+    assert client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 4, "out_quantity": 3}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}).status_code == 200
+
+
+def test_weekly_sums_by_operation_type(client):
+    stock_out_next_week(client)
+    body = report(client, granularity="week")
+    # 2025-11-17为周一；新出库记录落在下一周
+    assert rows(body, "操作类型") == {
+        ("2025-11-17", "入库"): (4, 26), ("2025-11-17", "出库"): (1, 2), ("2025-11-17", "借"): (1, 1),
+        ("2025-11-24", "出库"): (1, 3)}
+    assert (body["summary"]["次数"], body["summary"]["数量"]) == (7, 32)
+
+
+def test_partial_weeks_use_daily_buckets(client):
+    stock_out_next_week(client)
+    body = report(client, granularity="week", start_date="2025-11-21", end_date="2025-11-24")
+    # 11-20的两条入库不在范围内
+    assert rows(body, "操作类型") == {
+        ("2025-11-17", "入库"): (2, 11), ("2025-11-17", "出库"): (1, 2), ("2025-11-17", "借"): (1, 1),
+        ("2025-11-24", "出库"): (1, 3)}
+
+
+def test_daily_group_by_floor_with_manufacturer_filter(client):
+    body = report(client, group_by="楼层,类型", 厂家="锦发五金")
+    # 锦发五金：库存1（入库10、出库2）与库存4（入库8），均在楼层1
+    assert rows(body, "楼层", "类型") == {
+        ("2025-11-20", "1", "样品"): (1, 10), ("2025-11-21", "1", "样品"): (1, 8), ("2025-11-22", "1", "样品"): (1, 2)}
+    assert body["query"]["filters"] == {"厂家": ["锦发五金"]}
+
+
+def test_monthly_total(client):
+    assert rows(report(client, granularity="month", group_by="")) == {("2025-11",): (6, 29)}
+
+
+@pytest.mark.parametrize("params, message", [
+    ({"granularity": "year"}, "granularity参数无效"),
+    ({"group_by": "颜色"}, "不支持的维度"),
+    ({"start_date": "2025-11-22", "end_date": "2025-11-21"}, "start_date不能晚于end_date"),
+])
+def test_invalid_parameters_return_400(client, params, message):
+    response = client.get("/api/reports/movements", query_string=params)
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
@@ -0,0 +1,119 @@
+import csv
+import io
+
+import pandas as pd
+import pytest
+
+from utils import parse_operation_times
+
+
+def stock_in(client, in_time, code="WJ001"):
+    response = client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": code, "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 1,
+                            "架号": "A", "框号": "1", "包号": "1"}],
+        "入库时间": in_time})
+    assert response.status_code == 200, response.get_json()
+
+
+def operation_ids(records):
+    return [int(record["operation"]["操作ID"]) for record in records]
+
+
+def sort_key(record):
+    operation = record["operation"]
+    return parse_operation_times(pd.Series([operation["操作时间"]])).iloc[0], int(operation["操作ID"])
+
+
+def fetch_page(client, after=None, limit=2, **params):
+    query = {"limit": limit, **params}
+    if after:
+        query["after"] = after
+    response = client.get("/api/get_operation_records", query_string=query)
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_cursor_pages_are_descending_without_duplicates(client):
+    everything = client.get("/api/get_operation_records").get_json()["data"]
+    collected, cursor = [], None
+    while True:
+        page = fetch_page(client, cursor)
+        collected.extend(page["data"])
+        if not page["has_more"]:
+            assert page["next_cursor"] is None
+            break
+        cursor = page["next_cursor"]
+    ids = operation_ids(collected)
+    assert len(ids) == len(set(ids)) == len(everything) == 6
+    keys = [sort_key(record) for record in collected]
+    assert keys == sorted(keys, reverse=True)
+
+
+def test_cursor_survives_back_dated_and_new_inserts(client):
+    original = set(operation_ids(client.get("/api/get_operation_records").get_json()["data"]))
+    first = fetch_page(client)
+    seen = operation_ids(first["data"])
+
+    # 翻页期间：一条早于所有记录的补录（应出现在后续页）、一条最新记录（在游标之前，不应出现）
+    stock_in(client, "2025-11-01 08:00:00")
+    stock_in(client, "2025-12-31 08:00:00", code="WJ002")
+    all_now = client.get("/api/get_operation_records").get_json()["data"]
+    operations = [record["operation"] for record in all_now]
+    back_dated = next(int(op["操作ID"]) for op in operations if op["操作时间"].startswith("2025-11-01"))
+    newest = next(int(op["操作ID"]) for op in operations if op["操作时间"].startswith("2025-12-31"))
+
+    cursor = first["next_cursor"]
+    while cursor:
+        page = fetch_page(client, cursor)
+        seen.extend(operation_ids(page["data"]))
+        cursor = page["next_cursor"]
+
+    assert len(seen) == len(set(seen))
+    assert set(seen) == original | {back_dated}
+    assert newest not in seen
+
+
+def test_cursor_with_filters_and_total(client):
+    page = fetch_page(client, limit=1, operation_type="入库", inventory_id=1)
+    assert page["total"] == 1
+    assert page["has_more"] is False
+    assert [record["operation"]["操作类型"] for record in page["data"]] == ["入库"]
+
+
+@pytest.mark.parametrize("query, message", [
+    ("limit=abc", "limit"),
+    ("after=not-a-cursor", "游标"),
+    ("inventory_id=abc", "inventory_id"),
+    ("inventory_id=-1", "inventory_id"),
+])
+def test_invalid_parameters_return_400(client, query, message):
+    response = client.get(f"/api/get_operation_records?{query}")
+    assert response.status_code == 400
+    assert message in response.get_json()["message"]
+
+
+def test_export_rejects_invalid_inventory_id(client):
+    response = client.get("/api/export_operation_records?inventory_id=1x")
+    assert response.status_code == 400
+    assert client.get("/api/export_operation_records?inventory_id=1").status_code == 200
+
+
+def exported_ids(client, **params):
+    response = client.get("/api/export_operation_records", query_string=params)
+    assert response.status_code == 200
+    return [int(row["操作ID"]) for row in csv.DictReader(io.StringIO(response.get_data(as_text=True)))]
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({}, [1, 2, 3, 4, 5, 6]),
+    # 起止时间均为闭区间
+    ({"start_date": "2025-11-21 09:00:00", "end_date": "2025-11-22 10:00:00"}, [3, 4, 5]),
+    ({"start_date": "2025-11-21 09:00:01", "end_date": "2025-11-22 09:59:59"}, [4]),
+    # 只传日期时按当天0点计
+    ({"start_date": "2025-11-21", "end_date": "2025-11-22"}, [3, 4]),
+    ({"start_date": "2025-11-21", "end_date": "2025-11-21"}, []),
+    ({"start_date": "2025-11-22", "operation_type": "借"}, [6]),
+    ({"end_date": "2025-11-21 23:59:59", "inventory_id": "4"}, [4]),
+])
+def test_export_slices_by_time_window(client, params, expected):
+    assert exported_ids(client, **params) == expected
@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+
+from conftest import reset_state, write_fixture_tables
+from utils import migrate_operation_times, normalize_operation_time, parse_operation_times, read_csv_data
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("2025-11-20 13:05:06", "2025-11-20 13:05:06"),
+    ("2025-11-20", "2025-11-20 00:00:00"),
+    ("2025-11-20 13", "2025-11-20 13:00:00"),
+    ("2025-11-20 13:05", "2025-11-20 13:05:00"),
+    ("2025-11-20T13:05", "2025-11-20 13:05:00"),
+    ("2025/11/20 13:05", "2025-11-20 13:05:00"),
+    ("2025-11-20 13：05：06", "2025-11-20 13:05:06"),
+    ("2025-1-2 3:04:05", "2025-01-02 03:04:05"),
+    (" 2025-11-20 13:05 ", "2025-11-20 13:05:00"),
+])
+def test_accepted_formats_are_normalized(value, expected):
+    assert normalize_operation_time(value) == expected
+
+
+@pytest.mark.parametrize("value", ["13:00", "13:00:00", "abc", "2025-02-30", "", None, "20251120"])
+def test_values_without_a_valid_date_are_rejected(value):
+    assert normalize_operation_time(value) is None
+
+
+def test_parse_keeps_positions_and_marks_time_only_values_nat():
+    times = parse_operation_times(pd.Series(["2025-11-20 10:00:00", "13:00", None, "2025/11/21 08:00"], dtype=object))
+    assert times.isna().tolist() == [False, True, True, False]
+    assert times.iloc[3] == pd.Timestamp("2025-11-21 08:00:00")
+
+
+def test_write_endpoints_reject_time_only_input(client):
+    response = client.post("/api/batch-stock-out", json={
+        "stock_out_items": [{"inventory_id": 4, "out_quantity": 1}], "operator": "张三", "out_time": "13:00"})
+    assert response.status_code == 400
+    assert len(read_csv_data()["operation_record"]) == 6
+
+
+def test_migration_rewrites_legacy_times_once(data_dir):
+    write_fixture_tables(str(data_dir), {"operation_record": [
+        "操作ID,关联库存ID,操作类型,操作时间,操作数量,操作人,备注",
+        "1,1,入库,2025/11/20 10:58,10,系统,",
+        "2,2,入库,2025-11-20 11:00:00,5,系统,",
+        "3,3,入库,2025-11-21,3,系统,",
+    ]})
+    reset_state()
+    assert migrate_operation_times() == 2
+    assert read_csv_data()["operation_record"]["操作时间"].tolist() == \
+           ["2025-11-20 10:58:00", "2025-11-20 11:00:00", "2025-11-21 00:00:00"]
+    assert migrate_operation_times() == 0
@@ -0,0 +1,134 @@
+import gzip
+import json
+
+import numpy as np
+import pandas as pd
+
+from config import COMPRESS_MIN_SIZE
+from json_response import encode_json
+from response_cache import ResponseCache, response_cache
+from utils import get_data_version, invalidate_cache
+
+STOCK_OUT = {"stock_out_items": [{"inventory_id": 4, "out_quantity": 1}],
+             "operator": "张三", "out_time": "2025-11-24 10:00:00"}
+
+
+def test_etag_tracks_data_version_and_returns_304(client):
+    first = client.get("/api/inventory")
+    etag = first.headers["ETag"]
+    assert str(get_data_version()) in etag
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    not_modified = client.get("/api/inventory", headers={"If-None-Match": etag})
+    assert not_modified.status_code == 304
+    assert not_modified.get_data() == b""
+    assert not_modified.headers["ETag"] == etag
+
+    assert client.post("/api/batch-stock-out", json=STOCK_OUT).status_code == 200
+    changed = client.get("/api/inventory", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+
+
+def test_if_modified_since_alone_never_returns_304(client):
+    first = client.get("/api/inventory/1")
+    last_modified = first.headers["Last-Modified"]
+    assert client.get("/api/inventory/1", headers={"If-Modified-Since": last_modified}).status_code == 200
+
+
+def test_write_in_the_same_second_is_not_hidden_by_if_modified_since(client):
+    first = client.get("/api/inventory/4")
+    last_modified = first.headers["Last-Modified"]
+    # 写入与上次读取在同一秒内，Last-Modified（精确到秒）不变
+    assert client.post("/api/batch-stock-out", json=STOCK_OUT).status_code == 200
+    second = client.get("/api/inventory/4", headers={"If-Modified-Since": last_modified})
+    assert second.status_code == 200
+    assert second.headers["ETag"] != first.headers["ETag"]
+    assert second.get_json()["data"]["inventory"]["库存数量"] == 7
+
+
+def test_error_responses_have_no_etag(client):
+    response = client.get("/api/inventory/99")
+    assert response.status_code == 404
+    assert "ETag" not in response.headers
+
+
+def test_direct_invalidate_changes_etag(client):
+    etag = client.get("/api/inventory").headers["ETag"]
+    invalidate_cache()
+    assert client.get("/api/inventory", headers={"If-None-Match": etag}).status_code == 200
+
+
+def test_large_json_is_gzip_compressed_when_accepted(client):
+    plain = client.get("/api/inventory")
+    assert len(plain.get_data()) >= COMPRESS_MIN_SIZE
+    assert "Content-Encoding" not in plain.headers
+
+    compressed = client.get("/api/inventory", headers={"Accept-Encoding": "gzip"})
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert json.loads(gzip.decompress(compressed.get_data())) == plain.get_json()
+
+
+def test_small_responses_are_not_compressed(client):
+    response = client.get("/api/health", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in response.headers
+
+
+def test_encode_json_keeps_chinese_and_numpy_values():
+    payload = {"货号": "WJ001", "数量": np.int64(3), "单价": np.float64(1.5), "时间": pd.Timestamp("2025-11-20 10:00"),
+               "缺失": pd.NaT}
+    assert json.loads(encode_json(payload)) == {"货号": "WJ001", "数量": 3, "单价": 1.5,
+                                                "时间": "2025-11-20 10:00:00", "缺失": ""}
+    # 中文不转义
+    assert "货号".encode("utf-8") in encode_json(payload)
+
+
+def test_inventory_list_is_served_from_cache_until_a_write(client):
+    response_cache.clear()
+    hits = response_cache.stats()["hits"]
+    first = client.get("/api/inventory?fields=库存数量")
+    second = client.get("/api/inventory?fields=库存数量")
+    assert second.get_data() == first.get_data()
+    assert response_cache.stats()["hits"] == hits + 1
+
+    # 查询参数不同为不同条目
+    client.get("/api/inventory?fields=版本")
+    assert response_cache.stats()["entries"] == 2
+
+    assert client.post("/api/batch-stock-out", json=STOCK_OUT).status_code == 200
+    assert response_cache.stats()["entries"] == 0
+    row = next(row for row in client.get("/api/inventory?fields=库存数量").get_json()["data"] if row["库存ID"] == 4)
+    assert row["库存数量"] == 7
+
+
+def test_cache_keys_include_negotiated_encoding(client):
+    response_cache.clear()
+    plain = client.get("/api/inventory")
+    compressed = client.get("/api/inventory", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    cached = client.get("/api/inventory", headers={"Accept-Encoding": "gzip"})
+    assert cached.get_data() == compressed.get_data()
+    assert cached.headers["Content-Encoding"] == "gzip"
+
+
+def test_error_responses_are_not_cached(client):
+    response_cache.clear()
+    assert client.get("/api/inventory?fields=不存在").status_code == 400
+    assert response_cache.stats()["entries"] == 0
+
+
+def test_cache_evicts_least_recently_used_and_skips_stale_versions():
+    cache = ResponseCache(max_bytes=10)
+    version = get_data_version()
+    cache.put("a", version, b"1234", [])
+    cache.put("b", version, b"1234", [])
+    assert cache.get("a") is not None
+    cache.put("c", version, b"1234", [])
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    cache.put("big", version, b"x" * 11, [])
+    assert cache.get("big") is None
+    cache.put("old", version - 1, b"1", [])
+    assert cache.get("old") is None
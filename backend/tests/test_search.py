@@ -0,0 +1,27 @@
+def search(client, query, **params):
+    response = client.get("/api/search", query_string={"q": query, **params})
+    assert response.status_code == 200, response.get_json()
+    return response.get_json()
+
+
+def test_manufacturer_prefix_hits(client):
+    body = search(client, "华")
+    assert sorted(row["库存ID"] for row in body["data"]) == [2, 3]
+    assert {row["厂家"] for row in body["data"]} == {"华美辅料", "华盛纽扣"}
+    assert all(row["matched_fields"] == ["厂家"] for row in body["data"])
+    assert body["pagination"]["total"] == 2
+
+
+def test_product_code_and_color_hits(client):
+    assert sorted(row["库存ID"] for row in search(client, "WJ001")["data"]) == [1, 4]
+    assert sorted(row["库存ID"] for row in search(client, "红色")["data"]) == [2, 3]
+    assert search(client, "不存在的词")["data"] == []
+
+
+def test_new_stock_in_is_searchable(client):
+    response = client.post("/api/batch-stock-in", json={
+        "stock_in_items": [{"货号": "ZZ900", "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 1,
+                            "架号": "A", "框号": "1", "包号": "1"}],
+        "入库时间": "2025-11-25 10:00:00"})
+    assert response.status_code == 200, response.get_json()
+    assert [row["库存ID"] for row in search(client, "ZZ900")["data"]] == [5]
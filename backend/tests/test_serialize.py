@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+
+from utils import convert_to_serializable, df_to_serializable_list
+
+
+def per_cell(df):
+    """原实现：逐列map逐单元格转换"""
+    if df.empty:
+        return []
+    return df.reset_index(drop=True).apply(lambda col: col.map(convert_to_serializable)).to_dict("records")
+
+
+def typed(records):
+    return [[(key, type(value), value) for key, value in record.items()] for record in records]
+
+
+def assert_same_as_per_cell(df):
+    assert typed(df_to_serializable_list(df)) == typed(per_cell(df))
+
+
+def test_float_columns_map_nan_to_empty_and_keep_int_like_values():
+    df = pd.DataFrame({"库存数量": [4.0, np.nan, 2.5], "次品数量": [0.0, 1.0, np.nan]})
+    assert_same_as_per_cell(df)
+    assert df_to_serializable_list(df)[1] == {"库存数量": "", "次品数量": 1.0}
+
+
+def test_integer_and_bool_columns():
+    df = pd.DataFrame({"库存ID": [1, 2, 3], "版本": np.array([0, 5, 7], dtype="int32"), "有效": [True, False, True]})
+    assert_same_as_per_cell(df)
+    assert df_to_serializable_list(df)[0] == {"库存ID": 1, "版本": 0, "有效": 1}
+
+
+def test_object_columns_string_empty_and_mixed():
+    df = pd.DataFrame({
+        "货号": ["WJ001", None, "HB003"],
+        "备注": pd.Series([None, None, None], dtype=object),
+        "批次": pd.Series([1, "A", np.nan], dtype=object),
+        "单价": pd.Series([1.5, None, "2"], dtype=object),
+    })
+    assert_same_as_per_cell(df)
+    assert df_to_serializable_list(df)[1]["货号"] == ""
+
+
+def test_datetime_columns_and_nat():
+    df = pd.DataFrame({"操作时间": pd.to_datetime(["2025-11-20 10:58:00", None, "2025-11-21 00:00:00"])})
+    assert_same_as_per_cell(df)
+    assert [row["操作时间"] for row in df_to_serializable_list(df)] == ["2025-11-20 10:58:00", "", "2025-11-21 00:00:00"]
+
+
+def test_non_default_index_and_column_order():
+    df = pd.DataFrame({"b": [1.0, np.nan], "a": ["x", None]}, index=[10, 3])
+    assert_same_as_per_cell(df)
+    assert list(df_to_serializable_list(df)[0]) == ["b", "a"]
+
+
+def test_fixture_tables_match_per_cell():
+    from utils import read_csv_data
+
+    csv_data = read_csv_data()
+    for table, df in csv_data.items():
+        assert_same_as_per_cell(df)
+    joined = csv_data["operation_record"].merge(csv_data["inventory"], left_on="关联库存ID", right_on="库存ID", how="left")
+    assert_same_as_per_cell(joined)
+
+
+def test_empty_frame():
+    assert df_to_serializable_list(pd.DataFrame(columns=["a"])) == []
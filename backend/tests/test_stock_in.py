@@ -0,0 +1,130 @@
+import threading
+
+from utils import get_data_version, read_csv_data
+
+IN_TIME = "2025-11-23 08:00:00"
+
+
+def item(code="NEW1", **fields):
+    return {"货号": code, "类型": "样品", "地址类型": 1, "楼层": 1, "入库数量": 2, "架号": "A", "框号": "1",
+            "包号": "1", **fields}
+
+
+def stock_in(client, items, in_time=IN_TIME):
+    return client.post("/api/batch-stock-in", json={"stock_in_items": items, "入库时间": in_time})
+
+
+def table_ids(table, column):
+    return sorted(read_csv_data()[table][column].astype(int).tolist())
+
+
+def test_new_ids_follow_existing_maxima_and_reuse_matching_records(client):
+    response = stock_in(client, [
+        item("WJ001", 厂家="锦发五金", 厂家地址="一楼A区", 电话="111"),
+        item("NEW1", 架号="Z", 厂家="新厂", 电话="999"),
+        item("NEW1", 架号="Z", 厂家="新厂", 电话="999"),
+        item("NEW2"),
+    ])
+    assert response.status_code == 200, response.get_json()
+    data = response.get_json()["data"]
+    details = data["success_details"]
+
+    assert [row["库存ID"] for row in details] == [5, 6, 7, 8]
+    assert [row["操作ID"] for row in details] == [7, 8, 9, 10]
+    assert [row["商品特征ID"] for row in details] == [5, 6, 7, 8]
+    # 已有货号/地址/厂家复用原ID；同一批次内相同的新货号/地址/厂家只分配一次
+    assert [row["商品ID"] for row in details] == [1, 4, 4, 5]
+    assert [row["位置ID"] for row in details] == [1, 4, 4, 1]
+    assert [row["厂家ID"] for row in details] == [1, 4, 4, None]
+    assert data["product_mapping"] == {"NEW1": 4, "NEW2": 5}
+
+    assert table_ids("product", "商品ID") == [1, 2, 3, 4, 5]
+    assert table_ids("location", "地址ID") == [1, 2, 3, 4]
+    assert table_ids("manufacturer", "厂家ID") == [1, 2, 3, 4]
+    records = read_csv_data()["operation_record"]
+    new_records = records[records["操作ID"] >= 7]
+    assert set(new_records["操作时间"]) == {IN_TIME}
+    assert set(new_records["操作类型"]) == {"入库"}
+
+
+def test_invalid_rows_are_reported_per_row_and_valid_rows_saved(client):
+    response = stock_in(client, [
+        item("OK1"),
+        item("BAD1", 类型="未知"),
+        item("BAD2", 楼层=9),
+        item("BAD3", 入库数量=0),
+        item("BAD4", 地址类型=2, 框号=""),
+        {"货号": "BAD5", "类型": "样品"},
+        item("BAD6", 单价="abc"),
+    ])
+    assert response.status_code == 200
+    data = response.get_json()
+    assert (data["data"]["success_count"], data["data"]["error_count"]) == (1, 6)
+    errors = data["error_details"]
+    assert [message.split("记录")[0] for message in errors] == [f"第{row}条" for row in range(2, 8)]
+    assert "类型无效" in errors[0] and "楼层无效" in errors[1] and "入库数量必须大于0" in errors[2]
+    assert "框号" in errors[3] and "缺少必填字段: 地址类型, 楼层, 入库数量" in errors[4] and "单价格式错误" in errors[5]
+    assert table_ids("inventory", "库存ID") == [1, 2, 3, 4, 5]
+
+
+def test_all_rows_invalid_writes_nothing(client):
+    version = get_data_version()
+    response = stock_in(client, [item(类型="未知"), item(入库数量=-1)])
+    assert response.status_code == 400
+    assert len(response.get_json()["error_details"]) == 2
+    assert get_data_version() == version
+
+
+def test_numeric_strings_behave_like_numbers(client):
+    response = stock_in(client, [item("S1", 楼层="1", 地址类型="1", 入库数量="2.5"), item("S2")])
+    assert response.status_code == 200, response.get_json()
+    assert [row["位置ID"] for row in response.get_json()["data"]["success_details"]] == [1, 1]
+
+
+def test_floor_capacity_is_checked_for_the_whole_batch(client):
+    # 每层容量100框：一批新增101个框时整批拒绝
+    version = get_data_version()
+    response = stock_in(client, [item(f"C{box}", 楼层=4, 框号=str(box)) for box in range(101)])
+    assert response.status_code == 400
+    assert "容量不足" in response.get_json()["message"]
+    assert get_data_version() == version
+    assert stock_in(client, [item(f"C{box}", 楼层=4, 框号=str(box)) for box in range(100)]).status_code == 200
+
+
+def test_request_shape_and_time_errors(client):
+    assert client.post("/api/batch-stock-in", json={}).status_code == 400
+    assert stock_in(client, []).status_code == 400
+    assert stock_in(client, ["x"]).status_code == 400
+    assert stock_in(client, [item()], in_time="13:00").status_code == 400
+
+
+def test_concurrent_batches_keep_every_row_with_unique_ids(client, app):
+    threads_count, batch_size = 6, 30
+    responses = []
+    barrier = threading.Barrier(threads_count)
+
+    def worker(batch):
+        items = [item(f"T{batch}-{index}", 架号=f"T{batch}", 框号=str(index)) for index in range(batch_size)]
+        with app.test_client() as worker_client:
+            barrier.wait()
+            responses.append(stock_in(worker_client, items))
+
+    threads = [threading.Thread(target=worker, args=(batch,)) for batch in range(threads_count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * threads_count
+    assert all(response.get_json()["data"]["success_count"] == batch_size for response in responses)
+    total = 4 + threads_count * batch_size
+    for table, column in [("inventory", "库存ID"), ("feature", "商品特征ID"), ("product", "商品ID")]:
+        ids = table_ids(table, column)
+        assert len(ids) == len(set(ids)), f"{table} 表ID重复"
+    assert len(table_ids("inventory", "库存ID")) == total
+    assert len(table_ids("operation_record", "操作ID")) == 6 + threads_count * batch_size
+    assert len(table_ids("product", "商品ID")) == 3 + threads_count * batch_size
+    # 响应中的库存ID与保存的一致
+    returned = sorted(row["库存ID"] for response in responses
+                      for row in response.get_json()["data"]["success_details"])
+    assert returned == list(range(5, total + 1))
@@ -0,0 +1,79 @@
+import threading
+
+import pytest
+
+from utils import read_csv_data
+
+OPERATIONS = {
+    "stock_out": ("/api/batch-stock-out", lambda inventory_id, quantity: {
+        "stock_out_items": [{"inventory_id": inventory_id, "out_quantity": quantity}],
+        "operator": "张三", "out_time": "2025-11-24 10:00:00"}),
+    "lend": ("/api/inventory/lend", lambda inventory_id, quantity: {
+        "lend_items": [{"inventory_id": inventory_id, "quantity": quantity}],
+        "operator": "王五", "out_time": "2025-11-24 11:00:00"}),
+    "return": ("/api/inventory/return", lambda inventory_id, quantity: {
+        "return_items": [{"inventory_id": inventory_id, "quantity": quantity}],
+        "operator": "李四", "return_time": "2025-11-24 12:00:00"}),
+}
+
+
+def post(client, operation, inventory_id, quantity):
+    url, body = OPERATIONS[operation]
+    return client.post(url, json=body(inventory_id, quantity))
+
+
+def operations_of(inventory_id, op_type):
+    records = read_csv_data()["operation_record"]
+    return records[(records["关联库存ID"] == inventory_id) & (records["操作类型"] == op_type)]
+
+
+def run_concurrently(app, operation, inventory_id, quantity, count):
+    barrier = threading.Barrier(count)
+    status_codes = []
+
+    def worker():
+        with app.test_client() as worker_client:
+            barrier.wait()
+            status_codes.append(post(worker_client, operation, inventory_id, quantity).status_code)
+
+    threads = [threading.Thread(target=worker) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(status_codes)
+
+
+def test_each_operation_appends_a_record(client):
+    assert post(client, "stock_out", 4, 3).status_code == 200
+    assert post(client, "lend", 4, 2).status_code == 200
+    assert post(client, "return", 4, 1).status_code == 200
+    assert [len(operations_of(4, op_type)) for op_type in ["出库", "借", "还"]] == [1, 1, 1]
+    row = next(row for row in client.get("/api/inventory").get_json()["data"] if row["库存ID"] == 4)
+    assert row["库存数量"] == 8 - 3 - 2 + 1
+
+
+@pytest.mark.parametrize("operation, inventory_id, quantity", [
+    ("stock_out", 4, 9),  # 库存8
+    ("lend", 3, 4),  # 库存3
+    ("return", 2, 2),  # 未还1
+])
+def test_quantity_limits(client, operation, inventory_id, quantity):
+    response = post(client, operation, inventory_id, quantity)
+    assert response.status_code == 400
+    assert len(read_csv_data()["operation_record"]) == 6
+
+
+@pytest.mark.parametrize("operation, inventory_id, op_type, allowed", [
+    ("stock_out", 4, "出库", 4),  # 库存8，每次出库2
+    ("lend", 3, "借", 3),  # 库存3，每次借出1
+    ("return", 2, "还", 1),  # 未还1，每次归还1
+])
+def test_concurrent_writes_respect_quantity_and_unique_ids(app, operation, inventory_id, op_type, allowed):
+    quantity = 2 if operation == "stock_out" else 1
+    status_codes = run_concurrently(app, operation, inventory_id, quantity, count=8)
+    assert status_codes == [200] * allowed + [400] * (8 - allowed)
+    assert len(operations_of(inventory_id, op_type)) == allowed
+    operation_ids = read_csv_data()["operation_record"]["操作ID"].astype(int)
+    assert operation_ids.is_unique
+    assert len(operation_ids) == 6 + allowed
@@ -6,6 +6,8 @@ import numpy as np
 from datetime import datetime
 from functools import lru_cache
 import glob
+import threading
+import uuid
 
 # 注意：确保config.py中定义了 REQUIRED_TABLES、CACHE_TIMEOUT、FLOOR_CAPACITY
 # 示例config.py配置（可根据实际调整）：
@@ -142,6 +144,17 @@ def get_cached_csv_data():
     return data
 
 
+# 缓存失效回调（响应缓存等派生缓存在此注册，随数据缓存一起失效）
+_invalidate_hooks = []
+
+
+def register_invalidate_hook(hook):
+    """注册缓存失效回调，invalidate_cache时依次调用"""
+    if hook not in _invalidate_hooks:
+        _invalidate_hooks.append(hook)
+    return hook
+
+
 def invalidate_cache():
     """失效缓存（数据更新时调用）"""
     get_cached_csv_data.cache_clear()
@@ -149,6 +162,41 @@ def invalidate_cache():
     global _data_cache, _cache_timestamp
     _data_cache = {}
     _cache_timestamp = None
+    # 所有写入路径最终都经过这里，统一递增数据版本号
+    bump_data_version()
+    for hook in _invalidate_hooks:
+        try:
+            hook()
+        except Exception as e:
+            print(f"缓存失效回调执行失败: {str(e)}")
+
+
+# ------------------- 数据版本号 -------------------
+# 全局单调递增，每次数据变更（缓存失效）+1；读接口据此生成ETag，版本未变时无需重新计算
+# 进程启动标识拼入ETag，避免服务重启后版本号从0开始导致客户端误命中304
+DATA_VERSION_BOOT_ID = uuid.uuid4().hex[:8]
+_data_version = 0
+_data_version_time = datetime.now()
+_data_version_lock = threading.Lock()
+
+
+def bump_data_version():
+    """递增数据版本号，返回新版本号"""
+    global _data_version, _data_version_time
+    with _data_version_lock:
+        _data_version += 1
+        _data_version_time = datetime.now()
+        return _data_version
+
+
+def get_data_version():
+    """获取当前数据版本号"""
+    return _data_version
+
+
+def get_data_version_time():
+    """获取当前数据版本的生成时间（用于Last-Modified）"""
+    return _data_version_time
 
 
 def normalize_id_columns(df, table_name):
@@ -173,6 +221,10 @@ def normalize_id_columns(df, table_name):
         if col in df.columns:
             df[col] = pd.to_numeric(df[col], errors='coerce').fillna(-1).astype(int)
 
+    # 库存行版本号（编辑时的乐观并发校验）：旧数据无该列或为空时视为0
+    if table_name == 'inventory':
+        df["版本"] = pd.to_numeric(df["版本"], errors='coerce').fillna(0).astype(int) if "版本" in df.columns else 0
+
     return df
 
 
@@ -192,6 +244,9 @@ def safe_read_csv_files():
                     else:
                         # 修复：标准化ID列类型
                         data[table] = normalize_id_columns(df.fillna(""), table)
+                        # 操作时间在加载时统一为标准格式，读接口无需再逐次兼容解析
+                        if table == "operation_record" and "操作时间" in data[table].columns:
+                            data[table]["操作时间"] = normalize_operation_times(data[table]["操作时间"])
                     print(f"✅ 成功读取 {table} 数据，行数: {len(data[table])}")
                 except Exception as e:
                     print(f"⚠️ 读取 {table} 文件失败: {str(e)}，尝试从备份恢复")
@@ -225,6 +280,7 @@ def safe_write_csv_files(data, force_override=False):
         create_single_backup()  # 先备份
 
         write_success = True
+        existing_data = None  # 合并写入时的现有数据（所有表只读取一次）
         for table, filepath in CSV_FILES.items():
             df = data.get(table, pd.DataFrame())
             # 终极清理：删除全空行、Unnamed列
@@ -241,7 +297,9 @@ def safe_write_csv_files(data, force_override=False):
                 shutil.move(temp_path, filepath)
             else:
                 # 原有合并逻辑（保留）
-                existing_df = safe_read_csv_files().get(table, pd.DataFrame())
+                if existing_data is None:
+                    existing_data = safe_read_csv_files()
+                existing_df = existing_data.get(table, pd.DataFrame())
                 existing_df = existing_df.dropna(how='all')
                 existing_df = existing_df.loc[:, ~existing_df.columns.str.contains('^Unnamed')]
 
@@ -288,7 +346,7 @@ def get_empty_dataframe_template(table_name):
         ]),
         'inventory': pd.DataFrame(columns=[
             "库存ID", "关联商品特征ID", "关联位置ID", "关联厂家ID",
-            "单位", "库存数量", "次品数量", "批次", "状态"
+            "单位", "库存数量", "次品数量", "批次", "状态", "版本"
         ]),
         'location': pd.DataFrame(columns=[
             "地址ID", "地址类型", "楼层", "架号", "框号", "包号"
@@ -669,9 +727,9 @@ def read_csv_data():
     return get_cached_csv_data()
 
 
-def write_csv_data(data):
-    """写入CSV数据 - 安全的写入流程"""
-    return safe_write_csv_files(data)
+def write_csv_data(data, force_override=False):
+    """写入CSV数据 - 安全的写入流程（删除记录时需force_override，否则被删的行会从现有文件合并回来）"""
+    return safe_write_csv_files(data, force_override=force_override)
 
 
 def add_data_to_csv(new_data_dict):
@@ -775,15 +833,110 @@ def convert_to_serializable(value):
         return ""
 
 
+# 兼容解析的操作时间须以日期开头（YYYY-MM-DD，月日可为一位）
+OPERATION_DATE_PREFIX = r"\d{4}-\d{1,2}-\d{1,2}(?:$|[ T])"
+
+
+def parse_operation_times(time_series):
+    """
+    批量解析操作时间列，无法解析的为NaT：
+    标准格式（YYYY-MM-DD HH:MM:SS）按固定格式快速解析，
+    其余历史写法（'2025-11-20 10:58'、斜杠、全角冒号等）再逐个兼容解析；
+    必须以 年-月-日 开头，只有时间（如'13:00'）的值为NaT，不补当天日期
+    """
+    times = pd.to_datetime(time_series, errors="coerce", format=OPERATION_TIME_FORMAT)
+    text = time_series.astype(str).str.strip()
+    pending = times.isna() & time_series.notna() & (text != "")
+    if pending.any():
+        cleaned = text[pending].str.replace("：", ":").str.replace("/", "-")
+        cleaned = cleaned[cleaned.str.match(OPERATION_DATE_PREFIX)]
+        times.loc[cleaned.index] = pd.to_datetime(cleaned, errors="coerce", format="mixed")
+    return times
+
+
+def normalize_operation_times(time_series):
+    """操作时间列统一为标准格式字符串（YYYY-MM-DD HH:MM:SS），无法解析的值保持原样"""
+    times = parse_operation_times(time_series)
+    return times.dt.strftime(OPERATION_TIME_FORMAT).where(times.notna(), time_series)
+
+
+def normalize_operation_time(value):
+    """
+    单个操作时间规范化（写接口使用）：兼容 YYYY-MM-DD、YYYY-MM-DD HH、YYYY-MM-DD HH:MM、
+    YYYY-MM-DDTHH:MM、斜杠、全角冒号等写法；空值或无法解析时返回None
+    """
+    if value is None or str(value).strip() == "":
+        return None
+    normalized = normalize_operation_times(pd.Series([str(value)], dtype=object)).iloc[0]
+    return normalized if parse_operation_times(pd.Series([normalized], dtype=object)).notna().iloc[0] else None
+
+
+def migrate_operation_times():
+    """
+    一次性迁移：把operation_record.csv中的历史操作时间改写为标准格式（已全部为标准格式时不写入），
+    返回改写的行数；之后读取与写入都只会出现标准格式
+    """
+    filepath = CSV_FILES.get("operation_record")
+    if not filepath or not os.path.exists(filepath):
+        return 0
+    try:
+        df = pd.read_csv(filepath, header=0, encoding='utf-8-sig', dtype={"操作时间": object})
+        if df.empty or "操作时间" not in df.columns:
+            return 0
+
+        normalized = normalize_operation_times(df["操作时间"])
+        changed = int((df["操作时间"].notna() & (normalized != df["操作时间"])).sum())
+        if changed == 0:
+            return 0
+
+        create_single_backup()
+        df["操作时间"] = normalized
+        df.to_csv(filepath, index=False, encoding='utf-8-sig')
+        invalidate_cache()
+        print(f"🕒 操作时间迁移完成：{changed} 行改写为 {OPERATION_TIME_FORMAT} 格式")
+        return changed
+    except Exception as e:
+        print(f"❌ 操作时间迁移失败: {str(e)}")
+        restore_from_backup()
+        return 0
+
+
+def serialize_column(series):
+    """
+    按列dtype整列转换为可序列化的值列表，结果与逐单元格调用 convert_to_serializable 一致：
+    整数列 → int；浮点列 → float，NaN → ""；布尔列 → int（与逐单元格时 bool 命中 int 分支一致）；
+    datetime64列 → "%Y-%m-%d %H:%M:%S"，NaT → ""；纯字符串的object列 → 原字符串，缺失值 → ""；
+    其余（混合类型object列、扩展类型等）仍逐单元格转换
+    """
+    dtype = series.dtype
+    if isinstance(dtype, np.dtype):
+        if dtype.kind in "iu":
+            return series.tolist()
+        if dtype.kind == "b":
+            return series.astype("int64").tolist()
+        if dtype.kind == "f":
+            values = series.to_numpy(dtype=object)
+            values[np.isnan(series.to_numpy())] = ""
+            return values.tolist()
+        if dtype.kind == "O":
+            inferred = pd.api.types.infer_dtype(series, skipna=True)
+            if inferred == "empty":
+                return [""] * len(series)
+            if inferred == "string":
+                return series.where(series.notna(), "").tolist()
+    if pd.api.types.is_datetime64_any_dtype(dtype):
+        return series.dt.strftime("%Y-%m-%d %H:%M:%S").fillna("").tolist()
+    return series.map(convert_to_serializable).tolist()
+
+
 def df_to_serializable_list(df):
-    """批量转换DataFrame为可序列化的字典列表"""
+    """批量转换DataFrame为可序列化的字典列表（逐列向量化转换后按行组装）"""
     if df.empty:
         return []
-    # 替换 applymap：逐列（Series）调用 map，等价原 applymap 逻辑
-    df_serialized = df.reset_index(drop=True).apply(
-        lambda col: col.map(convert_to_serializable)  # 每一列（Series）用 map 处理每个元素
-    )
-    return df_serialized.to_dict('records')
+    columns = list(df.columns)
+    values = [serialize_column(df.iloc[:, position]) for position in range(len(columns))]
+    return [dict(zip(columns, row)) for row in zip(*values)]
+
 
 def get_unit_by_addr_type(addr_type):
     """根据地址类型获取单位"""
@@ -1,15 +1,10 @@
-import pandas as pd
-
-inp = "/Users/sh23/Desktop/dev/12.4/operation_record.csv"
-
-df = pd.read_csv(inp)
-
-# 替换操作时间列中的/为-
-df['操作时间'] = df['操作时间'].str.replace('/', '-')
-print("\n替换指定列（操作时间）后的DataFrame：")
-print(df['操作时间'])
-
-# 新增：保存修改后的文件（默认覆盖原文件，index=False不保存多余的索引列）
-df.to_csv(inp, index=False, encoding='utf-8')
-print(f"\n修改后的文件已保存至：{inp}")
-
+"""
+一次性迁移：将 operation_record.csv 中的操作时间统一改写为标准格式（YYYY-MM-DD HH:MM:SS）
+兼容斜杠、全角冒号、缺少秒/分等历史写法；服务启动时也会自动执行，已迁移过的数据不会重复写入
+用法：python w.py
+"""
+from utils import migrate_operation_times
+
+if __name__ == "__main__":
+    changed = migrate_operation_times()
+    print(f"操作时间迁移完成，改写 {changed} 行")
@@ -146,6 +146,7 @@ interface InventoryDisplayData {
   productType: string;
   status: string;
   batch: number; // 数字类型，无undefined
+  version: number; // 库存版本号（编辑时回传，用于冲突检测）
   defectiveQuantity: number;
   stockQuantity: number;
   totalInQuantity: number;
@@ -204,6 +205,7 @@ interface FormattedEditInventoryData {
   批次: number;
   状态: string;
   次品数量: number;
+  版本: number;
   用途: string;
   规格: string;
   备注: string;
@@ -289,6 +291,40 @@ interface LendReturnOutFormData {
 }
 
 // ===================== 通用工具函数（优化适配图片添加） =====================
+/** 网络异常（Failed to fetch）时的最大重试次数 */
+const NETWORK_RETRY_LIMIT = 2;
+
+/** 生成幂等键（非安全上下文下没有crypto.randomUUID时退化为时间戳+随机数） */
+function newIdempotencyKey(): string {
+  if (typeof crypto !== 'undefined' && typeof crypto.randomUUID === 'function') {
+    return crypto.randomUUID();
+  }
+  return `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}-${Math.random().toString(36).slice(2)}`;
+}
+
+/**
+ * 带网络重试的fetch：写请求（POST/PUT/DELETE）携带Idempotency-Key，重试沿用同一个键，
+ * 服务端对重试直接返回首次执行的结果，不会重复入库/出库/借出
+ * @param url 请求地址
+ * @param init fetch选项
+ */
+async function fetchWithRetry(url: string, init: RequestInit = {}): Promise<Response> {
+  const method = (init.method || 'GET').toUpperCase();
+  const headers = { ...(init.headers as Record<string, string> | undefined) };
+  if (method !== 'GET' && !headers['Idempotency-Key']) {
+    headers['Idempotency-Key'] = newIdempotencyKey();
+  }
+  for (let attempt = 0; ; attempt++) {
+    try {
+      return await fetch(url, { ...init, headers });
+    } catch (error) {
+      // 仅网络异常（TypeError: Failed to fetch）重试
+      if (!(error instanceof TypeError) || attempt >= NETWORK_RETRY_LIMIT) throw error;
+      await new Promise((resolve) => setTimeout(resolve, 500 * (attempt + 1)));
+    }
+  }
+}
+
 /**
  * 通用请求函数（核心增强：支持图片Blob返回 + 兼容null/undefined序列化）
  * @param endpoint 接口路径
@@ -319,7 +355,7 @@ async function request<T = ApiSuccessResponse>(
       }
     }
 
-    const response = await fetch(`${API_BASE}${endpoint}`, fetchOptions);
+    const response = await fetchWithRetry(`${API_BASE}${endpoint}`, fetchOptions);
 
     // 检查响应状态
     if (!response.ok) {
@@ -429,7 +465,7 @@ async function uploadFileRequest<T = ApiSuccessResponse>(
   formData: FormData
 ): Promise<T> {
   try {
-    const response = await fetch(`${API_BASE}${endpoint}`, {
+    const response = await fetchWithRetry(`${API_BASE}${endpoint}`, {
       method: 'POST',
       body: formData,
     });
@@ -627,6 +663,18 @@ export const api = {
     body: data,
   }),
 
+  // 入库文件导入（CSV/XLSX，表头为入库字段名），服务端按块校验写入并返回逐行错误
+  importStockInFile: (
+    file: File,
+    params: { 入库时间?: string; chunk_size?: number } = {}
+  ): Promise<ApiSuccessResponse> => {
+    const formData = new FormData();
+    formData.append('file', file);
+    if (params.入库时间) formData.append('入库时间', params.入库时间);
+    if (params.chunk_size) formData.append('chunk_size', String(params.chunk_size));
+    return uploadFileRequest('/import', formData);
+  },
+
   // 库存借出（批量）
   batchLendInventory: (data: any): Promise<ApiSuccessResponse> => request('/inventory/lend', {
     method: 'POST',
@@ -657,6 +705,29 @@ export const api = {
     return request(`/inventory${queryString ? `?${queryString}` : ''}`);
   },
 
+  // 库存增量同步：since/boot_id 取上次响应中的 version/boot_id；返回 resync=true 时需重新获取完整列表
+  getInventoryChanges: (params: {
+    since?: number;
+    boot_id?: string;
+    fields?: string;
+    expand?: string;
+  } = {}): Promise<ApiSuccessResponse> => {
+    const queryString = buildQueryParams(params);
+    return request(`/changes${queryString ? `?${queryString}` : ''}`);
+  },
+
+  // 订阅库存变更事件（SSE）：onChange 收到 {version, type, inventory: [{库存ID, 库存数量}], operations}，
+  // type 为 delete 时另有 deleted: [库存ID]；onResync 表示有事件丢失或撤销等未记录的写入，需重新同步；返回关闭订阅的函数
+  subscribeInventoryEvents: (
+    onChange: (change: any) => void,
+    onResync?: (info: { version: number; boot_id: string }) => void
+  ): (() => void) => {
+    const source = new EventSource(`${API_BASE}/events`);
+    source.addEventListener('change', (event) => onChange(JSON.parse((event as MessageEvent).data)));
+    source.addEventListener('resync', (event) => onResync?.(JSON.parse((event as MessageEvent).data)));
+    return () => source.close();
+  },
+
   // 库存详情
   getInventoryDetail: (
     inventoryId: number | string,
@@ -671,11 +742,66 @@ export const api = {
     return request(`/inventory/${inventoryIdNum}${queryString ? `?${queryString}` : ''}`);
   },
 
+  // 批量库存详情（多选场景一次请求），include_operations 为 false 时只返回操作统计
+  getInventoryDetails: (
+    inventoryIds: (number | string)[],
+    params: { include_operations?: boolean; page?: number; page_size?: number } = {}
+  ): Promise<ApiSuccessResponse> => request('/inventory/batch-detail', {
+    method: 'POST',
+    body: { inventory_ids: inventoryIds.map(Number), ...params },
+  }),
+
+  // 库存分面统计：filters 为 { 类型: [...], 楼层: [...], 材质: [...], 颜色: [...], 厂家: [...] }
+  getInventoryFacets: (filters: Record<string, (string | number)[]> = {}): Promise<ApiSuccessResponse> => {
+    const queryString = buildQueryParams(
+      Object.fromEntries(Object.entries(filters).map(([field, values]) => [field, values.join(',')]))
+    );
+    return request(`/inventory/facets${queryString ? `?${queryString}` : ''}`);
+  },
+
+  // 库位层级树（楼层→架号→框号→包号，含各节点库存条数/总数量），floor 为空时返回全部楼层
+  getLocationTree: (floor?: number | string): Promise<ApiSuccessResponse> => {
+    const queryString = buildQueryParams(floor !== undefined && floor !== '' ? { floor } : {});
+    return request(`/locations/tree${queryString ? `?${queryString}` : ''}`);
+  },
+
+  // 出入库汇总报表（granularity: day/week/month；group_by: 操作类型/类型/楼层/厂家；filters 同分面统计）
+  getMovementReport: (
+    params: { start_date?: string; end_date?: string; granularity?: 'day' | 'week' | 'month'; group_by?: string[] } = {},
+    filters: Record<string, (string | number)[]> = {}
+  ): Promise<ApiSuccessResponse> => {
+    const { group_by, ...rest } = params;
+    const queryString = buildQueryParams({
+      ...rest,
+      ...(group_by ? { group_by: group_by.join(',') } : {}),
+      ...Object.fromEntries(Object.entries(filters).map(([field, values]) => [field, values.join(',')]))
+    });
+    return request(`/reports/movements${queryString ? `?${queryString}` : ''}`);
+  },
+
+  // 厂家联想（按 厂家/电话/厂家地址 前缀匹配），field 为空时匹配全部字段
+  suggestManufacturers: (
+    query: string,
+    params: { field?: '厂家' | '电话' | '厂家地址'; limit?: number } = {}
+  ): Promise<ApiSuccessResponse> => {
+    const queryString = buildQueryParams({ q: query, ...params });
+    return request(`/manufacturers/suggest${queryString ? `?${queryString}` : ''}`);
+  },
+
+  // 全文检索库存（货号/厂家/颜色/材质/形状等）
+  searchInventory: (
+    query: string,
+    params: { page?: number; page_size?: number } = {}
+  ): Promise<ApiSuccessResponse> => {
+    const queryString = buildQueryParams({ q: query, ...params });
+    return request(`/search${queryString ? `?${queryString}` : ''}`);
+  },
+
   // 兼容旧函数名
   updateInventory: (inventoryId: number | string, data: any): Promise<ApiSuccessResponse> =>
     api.editInventory(inventoryId, data),
 
-  // 库存编辑
+  // 库存编辑（data须包含读取时的 版本，已被他人修改时后端返回409）
   editInventory: (inventoryId: number | string, data: any): Promise<ApiSuccessResponse> => {
     // 确保inventoryId是数字（排除undefined）
     const inventoryIdNum = Number(inventoryId);
@@ -688,6 +814,20 @@ export const api = {
     });
   },
 
+  // 批量编辑库存：edits 为 [{库存ID, 版本, ...编辑字段}]，或 filter（同分面统计）+ patch 按条件修改；
+  // atomic 为 true 时任一条不通过则全部不保存
+  bulkEditInventory: (
+    params: {
+      edits?: Array<{ 库存ID: number | string; 版本: number; [field: string]: any }>;
+      filter?: Record<string, (string | number)[]>;
+      patch?: Record<string, any>;
+      atomic?: boolean;
+    }
+  ): Promise<ApiSuccessResponse> => request('/inventory/bulk-edit', {
+    method: 'POST',
+    body: params,
+  }),
+
   // 删除库存记录
   deleteInventory: (inventoryId: number | string): Promise<ApiSuccessResponse> => {
     // 确保inventoryId是数字（排除undefined）
@@ -700,12 +840,24 @@ export const api = {
     });
   },
 
+  // 批量删除库存记录：仅无操作记录/只有入库记录的库存可删除，不再被引用的特征/位置/厂家一并删除；
+  // atomic 为 true 时任一条不能删除则全部不删除
+  batchDeleteInventory: (
+    inventoryIds: (number | string)[],
+    atomic: boolean = false
+  ): Promise<ApiSuccessResponse> => request('/inventory/batch-delete', {
+    method: 'POST',
+    body: { inventory_ids: inventoryIds.map(Number), atomic },
+  }),
+
   // 操作记录查询
   getOperationRecords: (params: {
     operationType?: string;
     inventoryId?: number | string;
     startDate?: string;
     endDate?: string;
+    after?: string; // 游标分页：上一页返回的 next_cursor
+    limit?: number;
   } = {}): Promise<ApiSuccessResponse> => {
     // 格式化参数：排除undefined
     const queryString = buildQueryParams({
@@ -713,6 +865,8 @@ export const api = {
       inventory_id: params.inventoryId ? Number(params.inventoryId) : undefined,
       start_date: params.startDate,
       end_date: params.endDate,
+      after: params.after,
+      limit: params.limit,
     });
     return request(`/get_operation_records${queryString ? `?${queryString}` : ''}`);
   },
@@ -856,7 +1010,7 @@ export const api = {
     });
   },
 
-  // 获取最后地址信息
+  // 获取最后地址信息（params.recent=N 时同时返回最近N个不同的入库地址）
   getLastAddressInfo: (params: Record<string, any>): Promise<ApiSuccessResponse> =>
     request('/inventory/last-address-info', {
       method: 'POST',
@@ -1005,6 +1159,7 @@ export const formatInventoryForDisplay = (
     productType: product.类型 || '',
     status: inventory.状态 || '正常',
     batch: Number(inventory.批次) || 1, // 兜底为1，确保是数字
+    version: Number(inventory.版本) || 0,
     defectiveQuantity: Number(inventory.次品数量) || 0,
     stockQuantity: Number(operationStats.current_stock || inventory.库存数量) || 0,
     totalInQuantity: Number(operationStats.total_in_quantity) || 0,
@@ -1062,6 +1217,7 @@ export const formatEditInventoryData = (
     批次: Number(formData.batch) || 1,
     状态: formData.status || '正常',
     次品数量: Number(formData.defectiveQuantity) || 0,
+    版本: Number(formData.version) || 0,
     用途: formData.usage || '',
     规格: formData.specification || '',
     备注: formData.remark || '',